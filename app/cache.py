@@ -0,0 +1,135 @@
+"""
+Cache dos resultados de consulta de viabilidade.
+
+Cache LRU com expiração (TTL) na frente de ``EnderecoService.consultar_viabilidade``,
+com chave ``(cep, n_fachada)`` já normalizada. Guarda tanto endereços
+encontrados quanto não encontrados.
+
+Cada entrada pertence a uma geração do conjunto de dados (ver
+``Database.get_generation``, conferida no banco a cada consulta). Quando a
+geração muda, após qualquer alteração dos dados, feita por este ou por outro
+processo, todo o cache é descartado, então um resultado antigo nunca é servido.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Hashable
+import threading
+import time
+
+from .config import settings
+
+# Sentinela retornada quando a chave não está no cache
+AUSENTE = object()
+
+
+class LookupCache:
+    """Cache LRU/TTL limitado, invalidado pela geração do conjunto de dados."""
+
+    def __init__(self, max_itens: int, ttl: float):
+        """
+        Args:
+            max_itens: Número máximo de entradas (0 desativa o cache)
+            ttl: Tempo de vida de cada entrada, em segundos (0 = sem expiração)
+        """
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._dados: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._geracao = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expiracoes = 0
+        self.invalidacoes = 0
+
+    @property
+    def ativo(self) -> bool:
+        """True se o cache está habilitado."""
+        return self.max_itens > 0
+
+    def _conferir_geracao(self, geracao: int):
+        """Descarta o cache se a geração do conjunto de dados mudou."""
+        if geracao != self._geracao:
+            if self._dados:
+                self.invalidacoes += 1
+            self._dados.clear()
+            self._geracao = geracao
+
+    def get(self, chave: Hashable, geracao: int) -> Any:
+        """
+        Busca uma chave no cache.
+
+        Args:
+            chave: Chave normalizada
+            geracao: Geração atual do conjunto de dados
+
+        Returns:
+            Valor guardado (pode ser None) ou AUSENTE
+        """
+        with self._lock:
+            self._conferir_geracao(geracao)
+            item = self._dados.get(chave)
+            if item is None:
+                self.misses += 1
+                return AUSENTE
+
+            expira_em, valor = item
+            if expira_em and expira_em < time.monotonic():
+                del self._dados[chave]
+                self.expiracoes += 1
+                self.misses += 1
+                return AUSENTE
+
+            self._dados.move_to_end(chave)
+            self.hits += 1
+            return valor
+
+    def put(self, chave: Hashable, valor: Any, geracao: int):
+        """
+        Guarda um valor no cache, removendo o menos usado se estiver cheio.
+
+        Args:
+            chave: Chave normalizada
+            valor: Valor a guardar (None para endereço não encontrado)
+            geracao: Geração do conjunto de dados em que o valor foi obtido
+        """
+        if not self.ativo:
+            return
+        expira_em = time.monotonic() + self.ttl if self.ttl > 0 else 0
+        with self._lock:
+            self._conferir_geracao(geracao)
+            self._dados[chave] = (expira_em, valor)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.max_itens:
+                self._dados.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Descarta todas as entradas."""
+        with self._lock:
+            self._dados.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna os contadores do cache."""
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                'ativo': self.ativo,
+                'itens': len(self._dados),
+                'max_itens': self.max_itens,
+                'ttl_s': self.ttl,
+                'geracao': self._geracao,
+                'hits': self.hits,
+                'misses': self.misses,
+                'taxa_acerto': round(self.hits / consultas, 4) if consultas else 0.0,
+                'evictions': self.evictions,
+                'expiracoes': self.expiracoes,
+                'invalidacoes': self.invalidacoes,
+            }
+
+
+# Instância global do cache de consultas
+lookup_cache = LookupCache(
+    max_itens=settings.lookup_cache_size,
+    ttl=settings.lookup_cache_ttl
+)
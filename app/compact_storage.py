@@ -0,0 +1,350 @@
+"""
+Layout compacto de armazenamento para a consulta de viabilidade.
+
+Com ``COMPACT_STORAGE_ENABLED=true``, as consultas por (CEP, número) são
+respondidas pela tabela ``enderecos_compacto`` em vez de ``enderecos``:
+
+- o CEP é guardado como INTEGER e a tabela é ``WITHOUT ROWID``, agrupada
+  pela chave de consulta ``(cep, n_fachada, seq)``: uma consulta é uma única
+  descida na B-tree, que já traz a linha inteira (sem índice secundário e
+  sem a segunda busca pelo rowid);
+- as colunas de texto repetidas (viabilidade, UF, município, bairro,
+  logradouro...) guardam só um código inteiro; os textos ficam em
+  ``enderecos_compacto_valores`` e são decodificados em memória.
+
+A tabela é uma segunda cópia, derivada, de ``enderecos`` (que continua sendo a
+fonte dos dados, da exportação, da busca e das estatísticas): o layout troca
+espaço em disco, que aumenta, por consultas que leem menos páginas. Por isso
+fica desativado por padrão. Ela é reconstruída na mesma transação de cada
+carga, então as duas mudam juntas (inserções avulsas e cargas
+incrementais só regravam as chaves que tocaram). Os códigos nunca são reutilizados
+(o dicionário só cresce), então um dicionário em memória de uma carga
+anterior continua válido: basta recarregá-lo quando aparecer um código novo.
+"""
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import logging
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Colunas de texto codificadas por dicionário
+COLUNAS_CODIFICADAS = (
+    'viabilidade_atual', 'uf', 'municipio', 'localidade', 'bairro',
+    'logradouro', 'cod_logradouro', 'comp_1', 'comp_2', 'comp_3', 'regiao'
+)
+
+_COLUNAS_TABELA = ", ".join(('cep', 'n_fachada', 'seq') + COLUNAS_CODIFICADAS + ('total_hps',))
+
+# Linhas inseridas por executemany durante a reconstrução
+_LOTE_INSERCAO = 10000
+
+
+class CompactStorage:
+    """Mantém e consulta a tabela ``enderecos_compacto``."""
+
+    def __init__(self, ativo: bool = False):
+        """
+        Args:
+            ativo: Se as consultas usam o layout compacto
+        """
+        self.ativo = ativo
+        # valores[coluna][codigo] -> texto (código 0 não é usado)
+        self._valores: Dict[str, List[Optional[str]]] = {}
+        self._lock = threading.Lock()
+
+    def reconstruir(self, conn: sqlite3.Connection) -> int:
+        """
+        Reconstrói a tabela compacta a partir de ``enderecos``, sem fazer commit.
+
+        Deve ser chamado dentro da transação de escrita que alterou os
+        endereços. Com o layout desativado, só esvazia a tabela, que deixa
+        de ser mantida.
+
+        Args:
+            conn: Conexão de escrita, com a transação aberta
+
+        Returns:
+            Número de linhas gravadas
+        """
+        conn.execute("DELETE FROM enderecos_compacto")
+        if not self.ativo:
+            conn.execute("DELETE FROM dataset_meta WHERE chave = 'compacto_construido'")
+            return 0
+
+        # Mesma ordem do índice (cep, n_fachada) com desempate pelo id: seq 0
+        # é o registro que a consulta no layout padrão retornaria
+        cursor = conn.execute(f"""
+            SELECT cep, n_fachada, {", ".join(COLUNAS_CODIFICADAS)}, total_hps
+            FROM enderecos
+            WHERE n_fachada IS NOT NULL
+            ORDER BY cep, n_fachada, id
+        """)
+        total, novos = self._codificar_e_gravar(conn, cursor, lambda cep, n_fachada: 0)
+        logger.info(f"Layout compacto reconstruído: {total} registros, {novos} valores novos")
+        return total
+
+    def acrescentar(self, conn: sqlite3.Connection, desde_id: int) -> int:
+        """
+        Acrescenta à tabela compacta os endereços com id maior que ``desde_id``, sem fazer commit.
+
+        Para inserções que só acrescentam linhas a ``enderecos`` (ids novos são
+        sempre maiores): cada linha recebe o ``seq`` seguinte ao último da sua
+        chave, a mesma posição que teria na reconstrução completa. Se o layout
+        está desativado ou a tabela ainda não foi construída, faz a
+        reconstrução completa.
+
+        Args:
+            conn: Conexão de escrita, com a transação aberta
+            desde_id: Maior id de ``enderecos`` antes da inserção
+
+        Returns:
+            Número de linhas gravadas
+        """
+        if not self.ativo or not self.construido(conn):
+            return self.reconstruir(conn)
+
+        def proximo_seq(cep: str, n_fachada: str) -> int:
+            ultimo = conn.execute(
+                "SELECT MAX(seq) FROM enderecos_compacto WHERE cep = ? AND n_fachada = ?",
+                (int(cep), n_fachada)
+            ).fetchone()[0]
+            return 0 if ultimo is None else ultimo + 1
+
+        cursor = conn.execute(f"""
+            SELECT cep, n_fachada, {", ".join(COLUNAS_CODIFICADAS)}, total_hps
+            FROM enderecos
+            WHERE id > ? AND n_fachada IS NOT NULL
+            ORDER BY cep, n_fachada, id
+        """, (desde_id,))
+        total, novos = self._codificar_e_gravar(conn, cursor, proximo_seq)
+        logger.info(f"Layout compacto: {total} registros acrescentados, {novos} valores novos")
+        return total
+
+    def atualizar_chaves(self, conn: sqlite3.Connection, chaves: Iterable[Tuple[Any, Any]]) -> int:
+        """
+        Regrava na tabela compacta só as chaves (cep, n_fachada) informadas, sem fazer commit.
+
+        Para cargas incrementais: as linhas de cada chave são apagadas e
+        gravadas de novo a partir de ``enderecos``, com ``seq`` refeito. Se o
+        layout está desativado ou a tabela ainda não foi construída, faz a
+        reconstrução completa.
+
+        Args:
+            conn: Conexão de escrita, com a transação aberta
+            chaves: Pares (cep, n_fachada) com endereços inseridos, alterados ou removidos
+
+        Returns:
+            Número de linhas gravadas
+        """
+        if not self.ativo or not self.construido(conn):
+            return self.reconstruir(conn)
+
+        validas = sorted(
+            (cep, n_fachada) for cep, n_fachada in set(chaves)
+            if cep and n_fachada is not None and len(cep) == 8 and cep.isdigit()
+        )
+        conn.executemany(
+            "DELETE FROM enderecos_compacto WHERE cep = ? AND n_fachada = ?",
+            [(int(cep), n_fachada) for cep, n_fachada in validas]
+        )
+
+        def linhas() -> Iterator[Tuple[Any, ...]]:
+            for chave in validas:
+                yield from conn.execute(f"""
+                    SELECT cep, n_fachada, {", ".join(COLUNAS_CODIFICADAS)}, total_hps
+                    FROM enderecos
+                    WHERE cep = ? AND n_fachada = ?
+                    ORDER BY id
+                """, chave).fetchall()
+
+        total, novos = self._codificar_e_gravar(conn, linhas(), lambda cep, n_fachada: 0)
+        logger.info(f"Layout compacto: {len(validas)} chaves regravadas, {total} registros, {novos} valores novos")
+        return total
+
+    def _codificar_e_gravar(
+        self,
+        conn: sqlite3.Connection,
+        cursor: Iterable[Tuple[Any, ...]],
+        primeiro_seq: Callable[[str, str], int]
+    ) -> Tuple[int, int]:
+        """
+        Codifica as linhas do cursor (ordenadas por cep, n_fachada, id) e as grava.
+
+        Args:
+            conn: Conexão de escrita, com a transação aberta
+            cursor: Linhas (cep, n_fachada, colunas codificadas..., total_hps)
+            primeiro_seq: Retorna o ``seq`` da primeira linha de cada chave
+
+        Returns:
+            Linhas gravadas e valores novos acrescentados ao dicionário
+        """
+        codigos: Dict[str, Dict[str, int]] = {coluna: {} for coluna in COLUNAS_CODIFICADAS}
+        for coluna, codigo, valor in conn.execute(
+            "SELECT coluna, codigo, valor FROM enderecos_compacto_valores"
+        ):
+            if coluna in codigos:
+                codigos[coluna][valor] = codigo
+        proximos = {coluna: max(mapa.values(), default=0) + 1 for coluna, mapa in codigos.items()}
+        novos_valores: List[Tuple[str, int, str]] = []
+
+        linhas: List[Tuple[Any, ...]] = []
+        total = 0
+        chave_anterior = None
+        seq = 0
+
+        for row in cursor:
+            cep = row[0]
+            # CEPs fora do formato nunca seriam encontrados por uma consulta válida
+            if not cep or len(cep) != 8 or not cep.isdigit():
+                continue
+            chave = (cep, row[1])
+            seq = seq + 1 if chave == chave_anterior else primeiro_seq(*chave)
+            chave_anterior = chave
+
+            valores = []
+            for coluna, valor in zip(COLUNAS_CODIFICADAS, row[2:-1]):
+                if valor is None:
+                    valores.append(None)
+                    continue
+                valor = str(valor)
+                codigo = codigos[coluna].get(valor)
+                if codigo is None:
+                    codigo = proximos[coluna]
+                    proximos[coluna] += 1
+                    codigos[coluna][valor] = codigo
+                    novos_valores.append((coluna, codigo, valor))
+                valores.append(codigo)
+
+            linhas.append((int(cep), row[1], seq, *valores, row[-1]))
+            if len(linhas) >= _LOTE_INSERCAO:
+                total += self._gravar(conn, linhas)
+                linhas = []
+
+        total += self._gravar(conn, linhas)
+        conn.executemany(
+            "INSERT INTO enderecos_compacto_valores (coluna, codigo, valor) VALUES (?, ?, ?)",
+            novos_valores
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO dataset_meta (chave, valor) VALUES ('compacto_construido', '1')"
+        )
+        return total, len(novos_valores)
+
+    @staticmethod
+    def _gravar(conn: sqlite3.Connection, linhas: List[Tuple[Any, ...]]) -> int:
+        marcadores = ", ".join("?" * (len(COLUNAS_CODIFICADAS) + 4))
+        conn.executemany(
+            f"INSERT INTO enderecos_compacto ({_COLUNAS_TABELA}) VALUES ({marcadores})",
+            linhas
+        )
+        return len(linhas)
+
+    @staticmethod
+    def construido(conn: sqlite3.Connection) -> bool:
+        """True se a tabela compacta foi construída e está em dia com ``enderecos``."""
+        row = conn.execute(
+            "SELECT 1 FROM dataset_meta WHERE chave = 'compacto_construido'"
+        ).fetchone()
+        return row is not None
+
+    def _carregar_valores(self, conn: sqlite3.Connection):
+        """Recarrega os dicionários de valores a partir do banco."""
+        with self._lock:
+            valores: Dict[str, List[Optional[str]]] = {coluna: [None] for coluna in COLUNAS_CODIFICADAS}
+            for coluna, codigo, valor in conn.execute(
+                "SELECT coluna, codigo, valor FROM enderecos_compacto_valores ORDER BY coluna, codigo"
+            ):
+                lista = valores.setdefault(coluna, [None])
+                lista.extend([None] * (codigo + 1 - len(lista)))
+                lista[codigo] = valor
+            self._valores = valores
+
+    def _decodificar(self, conn: sqlite3.Connection, row: sqlite3.Row) -> Dict[str, Any]:
+        """Converte uma linha da tabela compacta para o formato de ``enderecos``."""
+        for tentativa in range(2):
+            valores = self._valores
+            try:
+                endereco = {
+                    coluna: None if row[coluna] is None else valores[coluna][row[coluna]]
+                    for coluna in COLUNAS_CODIFICADAS
+                }
+                break
+            except (KeyError, IndexError):
+                # Código criado por uma carga mais recente que o dicionário em memória
+                if tentativa:
+                    raise
+                self._carregar_valores(conn)
+
+        endereco['n_fachada'] = row['n_fachada']
+        endereco['cep'] = f"{row['cep']:08d}"
+        endereco['total_hps'] = row['total_hps']
+        return endereco
+
+    def consultar(self, conn: sqlite3.Connection, cep: str, n_fachada: str) -> Optional[Dict[str, Any]]:
+        """
+        Consulta um endereço na tabela compacta.
+
+        Args:
+            conn: Conexão de leitura
+            cep: CEP normalizado (8 dígitos)
+            n_fachada: Número da fachada normalizado
+
+        Returns:
+            Dicionário com dados do endereço (mesmas colunas de ``enderecos``) ou None
+        """
+        if len(cep) != 8 or not cep.isdigit():
+            return None
+        row = conn.execute(
+            f"SELECT {_COLUNAS_TABELA} FROM enderecos_compacto WHERE cep = ? AND n_fachada = ? LIMIT 1",
+            (int(cep), n_fachada)
+        ).fetchone()
+        return self._decodificar(conn, row) if row else None
+
+    def consultar_lote(
+        self,
+        conn: sqlite3.Connection,
+        chaves: List[Tuple[str, str]]
+    ) -> List[Optional[Dict[str, Any]]]:
+        """
+        Consulta vários endereços na tabela compacta com uma única junção.
+
+        Args:
+            conn: Conexão de leitura
+            chaves: Lista de pares (cep, n_fachada) já normalizados
+
+        Returns:
+            Lista com o registro de cada par (ou None), na mesma ordem
+        """
+        resultados: List[Optional[Dict[str, Any]]] = [None] * len(chaves)
+        colunas = ", ".join(f"c.{coluna}" for coluna in _COLUNAS_TABELA.split(", "))
+
+        conn.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS consulta_lote_compacto (
+                pos INTEGER PRIMARY KEY,
+                cep INTEGER,
+                n_fachada TEXT
+            )
+        """)
+        try:
+            conn.executemany(
+                "INSERT INTO consulta_lote_compacto (pos, cep, n_fachada) VALUES (?, ?, ?)",
+                (
+                    (pos, int(cep), n_fachada)
+                    for pos, (cep, n_fachada) in enumerate(chaves)
+                    if len(cep) == 8 and cep.isdigit()
+                )
+            )
+            cursor = conn.execute(f"""
+                SELECT l.pos, {colunas}
+                FROM consulta_lote_compacto l
+                CROSS JOIN enderecos_compacto c ON c.cep = l.cep AND c.n_fachada = l.n_fachada
+                WHERE c.seq = 0
+                ORDER BY l.pos
+            """)
+            for row in cursor:
+                resultados[row['pos']] = self._decodificar(conn, row)
+        finally:
+            conn.rollback()
+
+        return resultados
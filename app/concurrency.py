@@ -0,0 +1,76 @@
+"""
+Execução das operações síncronas de banco fora do event loop.
+
+O acesso ao SQLite é síncrono; chamado direto de um endpoint ``async def``
+ele bloquearia o event loop do uvicorn e todas as requisições concorrentes.
+Cada tipo de operação roda em um executor próprio com concorrência limitada,
+para que uploads e estatísticas não ocupem as threads das consultas:
+
+- consultas: ``DB_POOL_SIZE`` threads (uma por conexão de leitura)
+- estatísticas/health/lotes: ``DB_STATS_WORKERS`` threads
+- escrita (upload, limpeza): uma única thread, já que o SQLite serializa
+  os escritores; as cargas de planilha (ver ``jobs``) também rodam nela
+"""
+import asyncio
+import contextvars
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from . import timing
+from .config import settings
+
+T = TypeVar("T")
+
+_executor_consultas = ThreadPoolExecutor(
+    max_workers=max(1, settings.db_pool_size),
+    thread_name_prefix="db-consulta"
+)
+_executor_estatisticas = ThreadPoolExecutor(
+    max_workers=max(1, settings.db_stats_workers),
+    thread_name_prefix="db-estatisticas"
+)
+_executor_escrita = ThreadPoolExecutor(
+    max_workers=1,
+    thread_name_prefix="db-escrita"
+)
+
+
+async def _executar(executor: ThreadPoolExecutor, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    loop = asyncio.get_running_loop()
+    # A thread roda com o contexto da requisição (fases do Server-Timing, ver
+    # app/timing.py); a espera por uma thread livre conta como "fila"
+    contexto = contextvars.copy_context()
+    enviado = time.perf_counter()
+
+    def rodar() -> T:
+        timing.registrar("fila", time.perf_counter() - enviado)
+        return func(*args, **kwargs)
+
+    return await loop.run_in_executor(executor, contexto.run, rodar)
+
+
+async def executar_consulta(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Executa uma consulta rápida (lookup) no executor de consultas."""
+    return await _executar(_executor_consultas, func, *args, **kwargs)
+
+
+async def executar_estatisticas(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Executa uma leitura pesada (agregações, health, lotes) no executor de estatísticas."""
+    return await _executar(_executor_estatisticas, func, *args, **kwargs)
+
+
+async def executar_escrita(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Executa uma operação de escrita no executor de escrita (uma por vez)."""
+    return await _executar(_executor_escrita, func, *args, **kwargs)
+
+
+def agendar_escrita(func: Callable[..., T], *args: Any, **kwargs: Any) -> "Future[T]":
+    """Agenda uma operação de escrita sem aguardar o resultado (tarefas em segundo plano)."""
+    return _executor_escrita.submit(func, *args, **kwargs)
+
+
+def encerrar():
+    """Encerra os executores, aguardando as tarefas em andamento."""
+    for executor in (_executor_consultas, _executor_estatisticas, _executor_escrita):
+        executor.shutdown(wait=True)
@@ -0,0 +1,88 @@
+"""
+Configurações da API, lidas de variáveis de ambiente ou do arquivo .env.
+"""
+from pathlib import Path
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+# Diretório raiz do projeto
+BASE_DIR = Path(__file__).parent.parent
+
+
+class Settings(BaseSettings):
+    """Configurações da aplicação (ver .env.example)."""
+
+    model_config = SettingsConfigDict(
+        env_file=BASE_DIR / ".env",
+        env_file_encoding="utf-8",
+        extra="ignore"
+    )
+
+    # Banco de dados
+    database_path: Path = BASE_DIR / "data" / "enderecos.db"
+
+    # Pool de conexões e PRAGMAs do SQLite
+    db_pool_size: int = 4                 # conexões/threads para consultas
+    db_stats_workers: int = 1             # threads para estatísticas e health
+    db_pool_timeout: float = 30.0
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_cache_size: int = -16000       # negativo = tamanho em KiB por conexão
+    sqlite_mmap_size: int = 268435456     # 256 MiB
+    sqlite_temp_store: str = "MEMORY"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_read_only_queries: bool = True
+    sqlite_warmup: bool = False           # lê tabela e índice de consulta em segundo plano na inicialização
+
+    # Carga da planilha
+    ingest_batch_size: int = 5000         # linhas lidas e inseridas por lote
+    ingest_workers: int = 1               # processos para ler as abas (1 = sem paralelismo)
+    reload_min_ratio: float = 0.5         # nova carga precisa ter ao menos essa fração da atual
+
+    # Layout compacto (tabela agrupada por CEP/número, textos codificados).
+    # Cópia derivada de enderecos: aumenta o .db em troca de consultas mais leves
+    compact_storage_enabled: bool = False
+
+    # Índice de consulta em memória (carregado na inicialização e a cada upload)
+    memory_index_enabled: bool = False
+
+    # Cache de resultados de consulta (0 desativa)
+    lookup_cache_size: int = 10000
+    lookup_cache_ttl: float = 3600.0
+
+    # Consulta em lote
+    batch_max_itens: int = 50000
+    bulk_chunk_size: int = 5000           # linhas por bloco na verificação de arquivo
+
+    # Exportação do conjunto de dados
+    export_chunk_size: int = 5000         # linhas lidas por transação de leitura
+
+    # Logging
+    log_level: str = "INFO"
+
+    # Rastreamento (diagnóstico) das consultas
+    trace_sample_rate: float = 0.0
+
+    # Cache HTTP (ETag / 304) das respostas de leitura
+    http_cache_enabled: bool = True
+    http_cache_max_age: int = 0           # segundos em Cache-Control (0 = no-cache, sempre revalidar)
+
+    # Tempo por fase das requisições (header Server-Timing) e log de lentas
+    server_timing_enabled: bool = True
+    slow_request_ms: float = 500.0        # requisições acima disso vão para o log (0 desativa)
+
+    def resolver_caminho(self, caminho: Path) -> Path:
+        """
+        Resolve caminhos relativos a partir da raiz do projeto.
+
+        Args:
+            caminho: Caminho absoluto ou relativo
+
+        Returns:
+            Caminho absoluto
+        """
+        return caminho if caminho.is_absolute() else BASE_DIR / caminho
+
+
+# Instância global das configurações
+settings = Settings()
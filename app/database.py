@@ -2,86 +2,338 @@
 Módulo de gerenciamento do banco de dados SQLite.
 """
 import sqlite3
+import queue
+import re
+import secrets
+from collections import defaultdict
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable, Iterable, Iterator, Tuple
 import logging
 
+from . import search, timing
+from .compact_storage import CompactStorage
+from .config import settings
+from .metrics import medir_banco
+from .migrations import aplicar_migracoes, versao_atual
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Caminho do banco de dados
-DB_PATH = Path(__file__).parent.parent / "data" / "enderecos.db"
+DB_PATH = settings.resolver_caminho(settings.database_path)
+
+# Tabelas da troca blue/green: a nova carga é montada em TABELA_NOVA e a
+# carga substituída fica em TABELA_ANTERIOR para rollback
+TABELA_NOVA = "enderecos_novo"
+TABELA_ANTERIOR = "enderecos_anterior"
+
+# Colunas retornadas nas consultas de endereço
+COLUNAS_ENDERECO = """
+    viabilidade_atual,
+    uf,
+    municipio,
+    localidade,
+    bairro,
+    logradouro,
+    cod_logradouro,
+    n_fachada,
+    comp_1,
+    comp_2,
+    comp_3,
+    regiao,
+    cep,
+    total_hps
+"""
+
+# Colunas das quais as tabelas derivadas dependem (estatísticas, chave do
+# layout compacto e trecho de logradouro da busca)
+_COLUNAS_DERIVADAS = (
+    "viabilidade_atual, municipio, cep, n_fachada, cod_logradouro, logradouro, bairro, localidade, uf"
+)
+
+# Colunas aceitas como filtro na exportação
+COLUNAS_FILTRO_EXPORTACAO = ('uf', 'municipio', 'viabilidade_atual')
+
+
+def conectar(db_path: Path, read_only: bool = False) -> sqlite3.Connection:
+    """
+    Abre uma conexão SQLite com os PRAGMAs de desempenho configurados.
+
+    Args:
+        db_path: Caminho para o arquivo do banco de dados
+        read_only: Se True, abre em modo somente leitura (URI mode=ro)
+
+    Returns:
+        Conexão SQLite
+    """
+    if read_only:
+        conn = sqlite3.connect(
+            f"{db_path.resolve().as_uri()}?mode=ro",
+            uri=True,
+            check_same_thread=False
+        )
+    else:
+        conn = sqlite3.connect(str(db_path), check_same_thread=False)
+
+    conn.row_factory = sqlite3.Row  # Permite acessar colunas por nome
+    conn.execute(f"PRAGMA busy_timeout = {int(settings.sqlite_busy_timeout_ms)}")
+    conn.execute(f"PRAGMA cache_size = {int(settings.sqlite_cache_size)}")
+    conn.execute(f"PRAGMA mmap_size = {int(settings.sqlite_mmap_size)}")
+    conn.execute(f"PRAGMA temp_store = {settings.sqlite_temp_store}")
+    if not read_only:
+        conn.execute(f"PRAGMA synchronous = {settings.sqlite_synchronous}")
+    return conn
+
+
+class ConnectionPool:
+    """
+    Pool limitado de conexões SQLite reutilizáveis.
+
+    As conexões são criadas sob demanda até o limite ``size``; acima disso,
+    quem pede uma conexão espera até outra ser devolvida.
+    """
+
+    def __init__(self, db_path: Path, size: int, read_only: bool = False):
+        """
+        Inicializa o pool (sem abrir conexões).
+
+        Args:
+            db_path: Caminho para o arquivo do banco de dados
+            size: Número máximo de conexões abertas
+            read_only: Se True, as conexões são somente leitura
+        """
+        self.db_path = db_path
+        self.size = max(1, size)
+        self.read_only = read_only
+        # LIFO: reaproveita a conexão mais recente, com cache mais quente
+        self._livres: queue.LifoQueue = queue.LifoQueue()
+        self._criadas = 0
+        self._lock = threading.Lock()
+
+    def _obter(self) -> sqlite3.Connection:
+        """Retira uma conexão livre do pool, criando uma se houver espaço."""
+        try:
+            return self._livres.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._criadas < self.size:
+                self._criadas += 1
+                criar = True
+            else:
+                criar = False
+
+        if criar:
+            try:
+                return conectar(self.db_path, read_only=self.read_only)
+            except Exception:
+                with self._lock:
+                    self._criadas -= 1
+                raise
+
+        try:
+            return self._livres.get(timeout=settings.db_pool_timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"Tempo esgotado aguardando uma conexão livre do pool ({self.size} conexões)"
+            )
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Empresta uma conexão do pool durante o bloco ``with``.
+
+        Transações deixadas abertas (por exemplo, após uma exceção) são
+        desfeitas antes de a conexão voltar ao pool.
+        """
+        with timing.medir("conexao"):
+            conn = self._obter()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._livres.put(conn)
+
+    def close_all(self):
+        """Fecha as conexões livres do pool."""
+        while True:
+            try:
+                conn = self._livres.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._criadas -= 1
 
 
 class Database:
     """Classe para gerenciar conexões e operações no banco de dados SQLite."""
 
-    def __init__(self, db_path: Path = DB_PATH):
+    def __init__(self, db_path: Path = DB_PATH, compacto: Optional[bool] = None):
         """
-        Inicializa a conexão com o banco de dados.
+        Prepara o acesso ao banco de dados, sem abrir o arquivo.
+
+        O esquema é criado ou atualizado por ``inicializar``, chamado na
+        inicialização da API ou, se ninguém o chamou antes, no primeiro
+        acesso ao banco. Assim importar o módulo não faz nenhum I/O.
 
         Args:
             db_path: Caminho para o arquivo do banco de dados
+            compacto: Se as consultas usam o layout compacto (padrão:
+                ``COMPACT_STORAGE_ENABLED``)
         """
         self.db_path = db_path
-        self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        self._create_tables()
+        self.compacto = CompactStorage(
+            settings.compact_storage_enabled if compacto is None else compacto
+        )
+
+        # Consultas usam um pool de conexões somente leitura (uma para cada
+        # thread de consulta e de estatísticas, ver app/concurrency.py);
+        # escritas passam por uma única conexão, já que o SQLite serializa
+        # os escritores. Os pools só abrem conexões quando usados.
+        self._pool_leitura = ConnectionPool(
+            db_path,
+            settings.db_pool_size + settings.db_stats_workers,
+            read_only=settings.sqlite_read_only_queries
+        )
+        self._pool_escrita = ConnectionPool(db_path, 1)
+        # Geração e versão dos dados, relidas do banco só quando ele muda
+        # (ver _conferir_versao), por uma conexão própria que nunca grava
+        self._versao: Tuple[int, str] = (0, "")
+        self._conn_versao: Optional[sqlite3.Connection] = None
+        self._data_version: Optional[int] = None
+        self._lock_versao = threading.Lock()
+        self._inicializado = False
+        self._lock_inicializacao = threading.Lock()
+
+    def inicializar(self):
+        """
+        Cria ou atualiza o esquema e reconstrói as tabelas derivadas pendentes.
+
+        Idempotente: só a primeira chamada acessa o banco.
+        """
+        with self._lock_inicializacao:
+            if self._inicializado:
+                return
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._create_tables()
+
+            # Layout compacto recém-ativado (ou dados alterados com ele desativado)
+            # e índice de busca de bancos anteriores à busca por texto. Pool
+            # acessado direto: write_connection chamaria este método de novo
+            with self._pool_escrita.connection() as conn:
+                self._garantir_versao_id(conn)
+
+                reconstruir_compacto = self.compacto.ativo and not CompactStorage.construido(conn)
+                reconstruir_busca = search.fts_disponivel(conn) and not search.indice_construido(conn)
+                if reconstruir_compacto or reconstruir_busca:
+                    conn.execute("BEGIN IMMEDIATE")
+                    try:
+                        if reconstruir_compacto:
+                            self.compacto.reconstruir(conn)
+                        if reconstruir_busca:
+                            search.reconstruir_indice(conn)
+                        conn.commit()
+                    except Exception:
+                        conn.rollback()
+                        raise
+
+            self._inicializado = True
+
+    def aquecer_cache(self) -> int:
+        """
+        Lê as páginas usadas pelas consultas, para que as primeiras
+        requisições depois de uma partida a frio não esperem pelo disco.
+
+        Percorre a tabela e o índice do layout de consulta em uso. As páginas
+        ficam no cache do sistema operacional, compartilhado por todas as
+        conexões (e pelo mmap), e no cache da conexão que fez a leitura.
+
+        Returns:
+            Número de registros percorridos
+        """
+        with self.read_connection() as conn:
+            if self.compacto.ativo:
+                return conn.execute("SELECT COUNT(*) FROM enderecos_compacto").fetchone()[0]
+            # Índice (cep, n_fachada) coberto pela consulta, depois a tabela
+            conn.execute("SELECT COUNT(n_fachada) FROM enderecos WHERE cep > ''").fetchone()
+            return conn.execute("SELECT COUNT(total_hps) FROM enderecos").fetchone()[0]
 
     def get_connection(self) -> sqlite3.Connection:
         """
-        Cria e retorna uma conexão com o banco de dados.
+        Cria e retorna uma nova conexão (fora do pool) com o banco de dados.
+
+        Prefira ``read_connection``/``write_connection``, que reutilizam
+        conexões; quem chama este método é responsável por fechá-la.
 
         Returns:
             Conexão SQLite
         """
-        conn = sqlite3.connect(str(self.db_path))
-        conn.row_factory = sqlite3.Row  # Permite acessar colunas por nome
-        return conn
+        if not self._inicializado:
+            self.inicializar()
+        return conectar(self.db_path)
 
-    def _create_tables(self):
-        """Cria as tabelas necessárias se não existirem."""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
+    def read_connection(self):
+        """
+        Empresta uma conexão de leitura do pool.
 
-            # Criar tabela de endereços
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS enderecos (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    viabilidade_atual TEXT,
-                    uf TEXT,
-                    municipio TEXT,
-                    localidade TEXT,
-                    bairro TEXT,
-                    logradouro TEXT,
-                    cod_logradouro TEXT,
-                    n_fachada TEXT,
-                    comp_1 TEXT,
-                    comp_2 TEXT,
-                    comp_3 TEXT,
-                    regiao TEXT,
-                    cep TEXT,
-                    total_hps INTEGER
-                )
-            """)
+        Usage:
+            with db.read_connection() as conn:
+                ...
+        """
+        if not self._inicializado:
+            self.inicializar()
+        return self._pool_leitura.connection()
 
-            # Criar índices para performance
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_cep_cod
-                ON enderecos(cep, cod_logradouro)
-            """)
+    def write_connection(self):
+        """
+        Empresta a conexão de escrita. Quem escreve deve chamar ``commit``.
 
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_cep
-                ON enderecos(cep)
-            """)
+        Usage:
+            with db.write_connection() as conn:
+                ...
+                conn.commit()
+        """
+        if not self._inicializado:
+            self.inicializar()
+        return self._pool_escrita.connection()
 
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_cod_logradouro
-                ON enderecos(cod_logradouro)
-            """)
+    def checkpoint(self):
+        """
+        Transfere o conteúdo do WAL para o arquivo principal do banco.
 
-            conn.commit()
-            logger.info("Tabelas e índices criados com sucesso")
+        Necessário antes de copiar ou versionar o arquivo ``.db``, já que no
+        modo WAL as escritas recentes ficam no arquivo ``-wal``.
+        """
+        with self.write_connection() as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        """Fecha as conexões abertas pelos pools e a de conferência da versão."""
+        self._pool_leitura.close_all()
+        self._pool_escrita.close_all()
+        with self._lock_versao:
+            if self._conn_versao is not None:
+                self._conn_versao.close()
+                self._conn_versao = None
+                self._data_version = None
+
+    def _create_tables(self):
+        """Cria ou atualiza o esquema aplicando as migrações pendentes."""
+        conn = conectar(self.db_path)
+        try:
+            # WAL permite leituras concorrentes com a escrita; a configuração
+            # fica gravada no arquivo do banco
+            conn.execute(f"PRAGMA journal_mode = {settings.sqlite_journal_mode}")
+            aplicar_migracoes(conn)
+            logger.info(f"Esquema do banco na versão {versao_atual(conn)}")
+        finally:
+            conn.close()
 
     def insert_enderecos(self, enderecos: List[Dict[str, Any]]) -> int:
         """
@@ -93,44 +345,429 @@ class Database:
         Returns:
             Número de registros inseridos
         """
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
+        with self.write_connection() as conn:
+            ultimo_id = conn.execute("SELECT IFNULL(MAX(id), 0) FROM enderecos").fetchone()[0]
+            inserted_count = self._inserir(conn, enderecos)
+            # Tabelas derivadas atualizadas só com as linhas novas: inserções
+            # em lotes seguidos não reprocessam a tabela inteira a cada lote
+            self._somar_estatisticas(conn, enderecos)
+            self.compacto.acrescentar(conn, ultimo_id)
+            search.atualizar_indice(conn, ultimo_id)
+            self._avancar_geracao(conn)
+            conn.commit()
+            logger.info(f"{inserted_count} endereços inseridos com sucesso")
+            return inserted_count
+
+    def _inserir(
+        self,
+        conn: sqlite3.Connection,
+        enderecos: List[Dict[str, Any]],
+        tabela: str = "enderecos"
+    ) -> int:
+        """Insere endereços na conexão (e tabela) informada, sem fazer commit."""
+        insert_query = f"""
+            INSERT INTO {tabela} (
+                viabilidade_atual, uf, municipio, localidade, bairro,
+                logradouro, cod_logradouro, n_fachada, comp_1, comp_2,
+                comp_3, regiao, cep, total_hps, aba
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """
+
+        data = [
+            (
+                e.get('viabilidade_atual'),
+                e.get('uf'),
+                e.get('municipio'),
+                e.get('localidade'),
+                e.get('bairro'),
+                e.get('logradouro'),
+                e.get('cod_logradouro'),
+                e.get('n_fachada'),
+                e.get('comp_1'),
+                e.get('comp_2'),
+                e.get('comp_3'),
+                e.get('regiao'),
+                e.get('cep'),
+                e.get('total_hps'),
+                e.get('aba')
+            )
+            for e in enderecos
+        ]
+
+        cursor = conn.cursor()
+        cursor.executemany(insert_query, data)
+        return cursor.rowcount
+
+    def _criar_tabela_nova(self, conn: sqlite3.Connection):
+        """Cria a tabela sombra vazia, com a mesma estrutura de ``enderecos``."""
+        row = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'enderecos'"
+        ).fetchone()
+        # Após um RENAME o SQLite grava o nome entre aspas
+        sql = re.sub(r'^CREATE TABLE\s+"?\w+"?', f"CREATE TABLE {TABELA_NOVA}", row['sql'])
+        conn.execute(f"DROP TABLE IF EXISTS {TABELA_NOVA}")
+        conn.execute(sql)
+
+    def _criar_indices_tabela_nova(self, conn: sqlite3.Connection):
+        """
+        Cria na tabela sombra os mesmos índices de ``enderecos``.
+
+        Os nomes de índice são únicos no banco inteiro e não podem ser
+        alterados, então cada carga usa um sufixo novo (``_v<n>``).
+        """
+        indices = conn.execute(
+            "SELECT name, sql FROM sqlite_master "
+            "WHERE type = 'index' AND tbl_name = 'enderecos' AND sql IS NOT NULL"
+        ).fetchall()
+        sufixos = [
+            int(m.group(1))
+            for (nome,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+            for m in [re.search(r'_v(\d+)$', nome)] if m
+        ]
+        sufixo = max(sufixos, default=0) + 1
 
-            insert_query = """
-                INSERT INTO enderecos (
-                    viabilidade_atual, uf, municipio, localidade, bairro,
-                    logradouro, cod_logradouro, n_fachada, comp_1, comp_2,
-                    comp_3, regiao, cep, total_hps
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        for indice in indices:
+            base = re.sub(r'_v\d+$', '', indice['name'])
+            nome = f"{base}_v{sufixo}"
+            sql = re.sub(
+                r'^CREATE (UNIQUE )?INDEX\s+"?\w+"?\s+ON\s+"?\w+"?',
+                lambda m: f"CREATE {m.group(1) or ''}INDEX {nome} ON {TABELA_NOVA}",
+                indice['sql']
+            )
+            conn.execute(sql)
+
+    def _validar_tabela_nova(self, conn: sqlite3.Connection) -> int:
+        """
+        Confere a tabela sombra antes da troca.
+
+        Raises:
+            ValueError: Se a nova carga estiver vazia ou muito menor que a atual
+
+        Returns:
+            Número de registros da nova carga
+        """
+        novos = conn.execute(f"SELECT COUNT(*) FROM {TABELA_NOVA}").fetchone()[0]
+        if novos == 0:
+            raise ValueError("Nenhum registro na nova carga")
+
+        atuais = conn.execute("SELECT COUNT(*) FROM enderecos").fetchone()[0]
+        minimo = int(atuais * settings.reload_min_ratio)
+        if novos < minimo:
+            raise ValueError(
+                f"Nova carga com {novos} registros, abaixo do mínimo de {minimo} "
+                f"({settings.reload_min_ratio:.0%} dos {atuais} atuais)"
+            )
+
+        validos = conn.execute(
+            f"SELECT COUNT(*) FROM {TABELA_NOVA} WHERE length(cep) = 8 AND n_fachada IS NOT NULL"
+        ).fetchone()[0]
+        if validos == 0:
+            raise ValueError("Nenhum registro da nova carga tem CEP e número de fachada válidos")
+        return novos
+
+    @medir_banco("carga_completa")
+    def replace_all(
+        self,
+        lotes: Iterable[List[Dict[str, Any]]],
+        progresso: Optional[Callable[[int], None]] = None,
+        abas: Optional[Callable[[], List[Dict[str, Any]]]] = None
+    ) -> int:
+        """
+        Substitui todos os endereços pelos lotes informados (blue/green).
+
+        A nova carga é gravada em uma tabela sombra, indexada e validada
+        enquanto as consultas continuam usando ``enderecos``. Só então as
+        tabelas são trocadas com ``ALTER TABLE ... RENAME`` em uma única
+        transação: as consultas veem a carga antiga completa ou a nova
+        completa. A carga anterior fica em ``enderecos_anterior`` para
+        ``rollback_dataset``.
+
+        Se a leitura dos lotes ou a validação falhar, a tabela sombra é
+        descartada e os dados atuais não são alterados.
+
+        Args:
+            lotes: Iterável de listas de dicionários com dados dos endereços
+            progresso: Função chamada com o total inserido após cada lote
+            abas: Função chamada depois da leitura dos lotes que retorna as
+                abas carregadas (ver ``gravar_abas``), gravadas junto com a troca
+
+        Returns:
+            Número de registros inseridos
+        """
+        with self.write_connection() as conn:
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                self._criar_tabela_nova(conn)
+                total = 0
+                for lote in lotes:
+                    total += self._inserir(conn, lote, TABELA_NOVA)
+                    if progresso:
+                        progresso(total)
+                # Índices criados depois da carga: bem mais rápido que mantê-los
+                # atualizados a cada INSERT
+                self._criar_indices_tabela_nova(conn)
+                self._validar_tabela_nova(conn)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                conn.execute(f"DROP TABLE IF EXISTS {TABELA_NOVA}")
+                conn.commit()
+                raise
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(f"DROP TABLE IF EXISTS {TABELA_ANTERIOR}")
+                self._guardar_como_anterior(conn, "enderecos")
+                conn.execute(f"ALTER TABLE {TABELA_NOVA} RENAME TO enderecos")
+                # Hashes das abas descrevem a carga atual: trocados junto com ela
+                conn.execute("DELETE FROM planilha_abas")
+                if abas:
+                    self._gravar_abas(conn, abas())
+                self._atualizar_derivados(conn)
+                self._avancar_geracao(conn)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        logger.info(f"{total} endereços inseridos com sucesso")
+        return total
+
+    @staticmethod
+    def _guardar_como_anterior(conn: sqlite3.Connection, tabela: str):
+        """
+        Renomeia a carga substituída para ``enderecos_anterior``, sem fazer commit.
+
+        Uma carga vazia (banco novo ou limpo) é descartada em vez de guardada:
+        o rollback para ela apagaria todos os dados.
+        """
+        if conn.execute(f"SELECT 1 FROM {tabela} LIMIT 1").fetchone() is None:
+            conn.execute(f"DROP TABLE {tabela}")
+        else:
+            conn.execute(f"ALTER TABLE {tabela} RENAME TO {TABELA_ANTERIOR}")
+
+    @medir_banco("rollback")
+    def rollback_dataset(self) -> int:
+        """
+        Volta para a carga anterior, trocando ``enderecos`` e ``enderecos_anterior``.
+
+        A troca é só de nomes (instantânea) e pode ser desfeita chamando o
+        método de novo.
+
+        Se a carga atual estiver vazia (ex.: depois de ``/limpar``), ela é
+        descartada e a troca não pode ser desfeita.
+
+        Raises:
+            ValueError: Se não houver carga anterior, ou se ela estiver vazia
+
+        Returns:
+            Número de registros da carga restaurada
+        """
+        with self.write_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if not self._tabela_existe(conn, TABELA_ANTERIOR):
+                    raise ValueError("Não há carga anterior para restaurar")
+                if conn.execute(f"SELECT 1 FROM {TABELA_ANTERIOR} LIMIT 1").fetchone() is None:
+                    raise ValueError("A carga anterior está vazia e não pode ser restaurada")
+                conn.execute(f"ALTER TABLE enderecos RENAME TO {TABELA_NOVA}")
+                conn.execute(f"ALTER TABLE {TABELA_ANTERIOR} RENAME TO enderecos")
+                self._guardar_como_anterior(conn, TABELA_NOVA)
+                # Os hashes eram da carga substituída; a próxima carga
+                # incremental compara todas as abas
+                conn.execute("DELETE FROM planilha_abas")
+                total = self._atualizar_derivados(conn)
+                self._avancar_geracao(conn)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        logger.info(f"Carga anterior restaurada: {total} registros")
+        return total
+
+    def descartar_anterior(self, compactar: bool = False):
+        """
+        Remove a carga anterior (o rollback deixa de ser possível).
+
+        Args:
+            compactar: Se True, executa VACUUM para devolver o espaço ao disco
+        """
+        with self.write_connection() as conn:
+            conn.execute(f"DROP TABLE IF EXISTS {TABELA_ANTERIOR}")
+            conn.commit()
+            if compactar:
+                conn.execute("VACUUM")
+        logger.info("Carga anterior descartada")
+
+    def info_cargas(self) -> Dict[str, Any]:
+        """Retorna o número de registros da carga atual e da anterior (se houver)."""
+        with self.read_connection() as conn:
+            atual = conn.execute("SELECT COUNT(*) FROM enderecos").fetchone()[0]
+            anterior = None
+            if self._tabela_existe(conn, TABELA_ANTERIOR):
+                anterior = conn.execute(f"SELECT COUNT(*) FROM {TABELA_ANTERIOR}").fetchone()[0]
+        return {
+            'registros_atual': atual,
+            'registros_anterior': anterior,
+            'rollback_disponivel': bool(anterior),
+            'geracao': self.get_generation(),
+        }
+
+    @staticmethod
+    def _gravar_abas(conn: sqlite3.Connection, abas: List[Dict[str, Any]]):
+        """Grava (ou atualiza) os hashes das abas carregadas, sem fazer commit."""
+        agora = datetime.now(timezone.utc).isoformat()
+        conn.executemany(
             """
+            INSERT INTO planilha_abas (aba, hash_bruto, hash_conteudo, registros, atualizada_em)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(aba) DO UPDATE SET
+                hash_bruto = excluded.hash_bruto,
+                hash_conteudo = excluded.hash_conteudo,
+                registros = excluded.registros,
+                atualizada_em = excluded.atualizada_em
+            """,
+            [
+                (a['aba'], a.get('hash_bruto'), a.get('hash_conteudo'), a.get('registros'), agora)
+                for a in abas
+            ]
+        )
+
+    def hashes_abas(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Retorna os hashes das abas da carga atual.
+
+        Returns:
+            Dicionário {aba: {hash_bruto, hash_conteudo, registros}}
+        """
+        with self.read_connection() as conn:
+            rows = conn.execute(
+                "SELECT aba, hash_bruto, hash_conteudo, registros FROM planilha_abas"
+            ).fetchall()
+        return {row['aba']: dict(row) for row in rows}
+
+    def possui_enderecos_sem_aba(self) -> bool:
+        """True se há endereços sem aba de origem (carregados antes da carga incremental)."""
+        with self.read_connection() as conn:
+            row = conn.execute("SELECT 1 FROM enderecos WHERE aba IS NULL LIMIT 1").fetchone()
+        return row is not None
+
+    def abas_carregadas(self) -> List[str]:
+        """Lista as abas da carga atual (registradas em ``planilha_abas``, sem varrer os endereços)."""
+        with self.read_connection() as conn:
+            rows = conn.execute("SELECT aba FROM planilha_abas").fetchall()
+        return [row['aba'] for row in rows]
+
+    def enderecos_da_aba(self, aba: str) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        Lista os endereços vindos de uma aba, com o id de cada um.
+
+        Args:
+            aba: Nome da aba
+
+        Returns:
+            Lista de (id, dicionário com os dados do endereço), na ordem de inserção
+        """
+        with self.read_connection() as conn:
+            cursor = conn.execute(
+                f"SELECT id, {COLUNAS_ENDERECO} FROM enderecos WHERE aba = ? ORDER BY id",
+                (aba,)
+            )
+            return [(row['id'], {**dict(row), 'aba': aba}) for row in cursor]
+
+    @medir_banco("carga_incremental")
+    def aplicar_delta(
+        self,
+        insercoes: List[Dict[str, Any]],
+        atualizacoes: List[Tuple[int, Dict[str, Any]]],
+        remocoes: List[int],
+        abas_removidas: List[str],
+        abas: List[Dict[str, Any]]
+    ) -> int:
+        """
+        Aplica uma carga incremental em uma única transação.
+
+        Args:
+            insercoes: Endereços novos
+            atualizacoes: Lista de (id, dados novos) dos endereços alterados
+            remocoes: Ids dos endereços removidos
+            abas_removidas: Abas que saíram da planilha (todos os seus endereços são removidos)
+            abas: Abas lidas, com os hashes a gravar (ver ``_gravar_abas``)
 
-            data = [
-                (
-                    e.get('viabilidade_atual'),
-                    e.get('uf'),
-                    e.get('municipio'),
-                    e.get('localidade'),
-                    e.get('bairro'),
-                    e.get('logradouro'),
-                    e.get('cod_logradouro'),
-                    e.get('n_fachada'),
-                    e.get('comp_1'),
-                    e.get('comp_2'),
-                    e.get('comp_3'),
-                    e.get('regiao'),
-                    e.get('cep'),
-                    e.get('total_hps')
+        Returns:
+            Número de endereços removidos junto com as abas removidas
+        """
+        with self.write_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Estado anterior dos endereços alterados e removidos, para
+                # atualizar só a parte das tabelas derivadas que eles tocam
+                antes = self._linhas_por_id(conn, [id_ for id_, _ in atualizacoes] + list(remocoes))
+                for aba in abas_removidas:
+                    antes += conn.execute(
+                        f"SELECT {_COLUNAS_DERIVADAS} FROM enderecos WHERE aba = ?", (aba,)
+                    ).fetchall()
+                ultimo_id = conn.execute("SELECT IFNULL(MAX(id), 0) FROM enderecos").fetchone()[0]
+
+                self._inserir(conn, insercoes)
+                conn.executemany(
+                    """
+                    UPDATE enderecos SET
+                        viabilidade_atual = ?, uf = ?, municipio = ?, localidade = ?,
+                        bairro = ?, logradouro = ?, cod_logradouro = ?, n_fachada = ?,
+                        comp_1 = ?, comp_2 = ?, comp_3 = ?, regiao = ?, cep = ?,
+                        total_hps = ?
+                    WHERE id = ?
+                    """,
+                    [
+                        (
+                            e.get('viabilidade_atual'), e.get('uf'), e.get('municipio'),
+                            e.get('localidade'), e.get('bairro'), e.get('logradouro'),
+                            e.get('cod_logradouro'), e.get('n_fachada'), e.get('comp_1'),
+                            e.get('comp_2'), e.get('comp_3'), e.get('regiao'), e.get('cep'),
+                            e.get('total_hps'), id_
+                        )
+                        for id_, e in atualizacoes
+                    ]
                 )
-                for e in enderecos
-            ]
+                conn.executemany("DELETE FROM enderecos WHERE id = ?", [(id_,) for id_ in remocoes])
 
-            cursor.executemany(insert_query, data)
-            conn.commit()
+                removidos_abas = 0
+                for aba in abas_removidas:
+                    removidos_abas += conn.execute("DELETE FROM enderecos WHERE aba = ?", (aba,)).rowcount
+                    conn.execute("DELETE FROM planilha_abas WHERE aba = ?", (aba,))
 
-            inserted_count = cursor.rowcount
-            logger.info(f"{inserted_count} endereços inseridos com sucesso")
-            return inserted_count
+                depois = self._linhas_por_id(conn, [id_ for id_, _ in atualizacoes])
+                depois += conn.execute(
+                    f"SELECT {_COLUNAS_DERIVADAS} FROM enderecos WHERE id > ?", (ultimo_id,)
+                ).fetchall()
+
+                self._gravar_abas(conn, abas)
+                self._atualizar_derivados_alterados(conn, antes, depois)
+                # Sem alterações nos endereços (só hashes das abas), a
+                # geração é mantida e o cache de consultas continua válido
+                if insercoes or atualizacoes or remocoes or removidos_abas:
+                    self._avancar_geracao(conn)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        logger.info(
+            f"Carga incremental aplicada: {len(insercoes)} inseridos, "
+            f"{len(atualizacoes)} atualizados, {len(remocoes) + removidos_abas} removidos"
+        )
+        return removidos_abas
+
+    @staticmethod
+    def _tabela_existe(conn: sqlite3.Connection, tabela: str) -> bool:
+        row = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (tabela,)
+        ).fetchone()
+        return row is not None
 
+    @medir_banco("consulta")
     def consultar_viabilidade(
         self,
         cep: str,
@@ -139,6 +776,9 @@ class Database:
         """
         Consulta a viabilidade de um endereço pelo CEP e número da fachada.
 
+        Executa uma única query indexada. Para investigar consultas sem
+        resultado, use ``diagnosticar_consulta``.
+
         Args:
             cep: CEP (com ou sem hífen)
             n_fachada: Número da fachada
@@ -150,9 +790,341 @@ class Database:
         cep_normalizado = cep.replace('-', '').replace('.', '').strip()
         n_fachada_normalizado = str(n_fachada).strip()
 
+        with self.read_connection() as conn, timing.medir("consulta"):
+            if self.compacto.ativo:
+                return self.compacto.consultar(conn, cep_normalizado, n_fachada_normalizado)
+
+            cursor = conn.cursor()
+
+            query = f"""
+                SELECT {COLUNAS_ENDERECO}
+                FROM enderecos
+                WHERE cep = ? AND n_fachada = ?
+                LIMIT 1
+            """
+
+            cursor.execute(query, (cep_normalizado, n_fachada_normalizado))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+
+    @medir_banco("consulta_lote")
+    def consultar_lote(self, chaves: List[Tuple[str, str]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Consulta vários endereços com uma única junção.
+
+        Os pares são gravados em uma tabela temporária e resolvidos com um
+        JOIN contra ``enderecos`` usando o índice (cep, n_fachada), em vez de
+        uma consulta por par.
+
+        Args:
+            chaves: Lista de pares (cep, n_fachada) já normalizados
+
+        Returns:
+            Lista com o registro de cada par (ou None), na mesma ordem
+        """
+        resultados: List[Optional[Dict[str, Any]]] = [None] * len(chaves)
+        if not chaves:
+            return resultados
+
+        colunas = ", ".join(f"e.{c.strip()}" for c in COLUNAS_ENDERECO.split(","))
+
+        with self.read_connection() as conn:
+            if self.compacto.ativo:
+                return self.compacto.consultar_lote(conn, chaves)
+
+            conn.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS consulta_lote (
+                    pos INTEGER PRIMARY KEY,
+                    cep TEXT,
+                    n_fachada TEXT
+                )
+            """)
+            try:
+                conn.executemany(
+                    "INSERT INTO consulta_lote (pos, cep, n_fachada) VALUES (?, ?, ?)",
+                    ((pos, cep, n_fachada) for pos, (cep, n_fachada) in enumerate(chaves))
+                )
+                # CROSS JOIN fixa a ordem: percorre o lote e busca cada par no índice
+                cursor = conn.execute(f"""
+                    SELECT l.pos, {colunas}
+                    FROM consulta_lote l
+                    CROSS JOIN enderecos e ON e.cep = l.cep AND e.n_fachada = l.n_fachada
+                    ORDER BY l.pos
+                """)
+                for row in cursor:
+                    pos = row['pos']
+                    # Mesmo critério da consulta individual: o primeiro registro
+                    if resultados[pos] is None:
+                        registro = dict(row)
+                        del registro['pos']
+                        resultados[pos] = registro
+            finally:
+                # Desfaz a inserção: a tabela temporária fica vazia para o próximo lote
+                conn.rollback()
+
+        return resultados
+
+    @medir_banco("numeros_proximos")
+    def numeros_proximos(self, cep: str, n_fachada: str, limite: int = 1) -> List[Dict[str, Any]]:
+        """
+        Busca os números de fachada mais próximos, abaixo e acima, no mesmo CEP e logradouro.
+
+        Usa a coluna gerada ``n_fachada_num`` e o índice
+        (cep, cod_logradouro, n_fachada_num): para cada logradouro do CEP são
+        duas buscas por faixa, uma em cada sentido, que leem só as linhas
+        retornadas. Números sem parte numérica (ex.: "S/N") não têm vizinhos.
+
+        Args:
+            cep: CEP (com ou sem hífen)
+            n_fachada: Número da fachada
+            limite: Máximo de endereços em cada sentido, por logradouro
+
+        Returns:
+            Lista de endereços, cada um com ``posicao`` ("abaixo"/"acima") e
+            ``distancia`` (diferença absoluta entre os números)
+        """
+        cep_normalizado = cep.replace('-', '').replace('.', '').strip()
+        n_fachada_normalizado = str(n_fachada).strip()
+        # Mesma regra da coluna gerada: parte numérica inicial do texto
+        m = re.match(r'\d+', n_fachada_normalizado)
+        if not m or limite <= 0:
+            return []
+        numero = int(m.group())
+
+        proximos: List[Dict[str, Any]] = []
+        with self.read_connection() as conn:
+            logradouros = [
+                row[0] for row in conn.execute(
+                    "SELECT DISTINCT cod_logradouro FROM enderecos WHERE cep = ?", (cep_normalizado,)
+                )
+            ]
+            for cod_logradouro in logradouros:
+                # <= abaixo: "144A" é vizinho de "144"; a própria fachada é excluída
+                for posicao, filtro, ordem in (
+                    ("abaixo", "n_fachada_num <= ?", "DESC"),
+                    ("acima", "n_fachada_num > ?", "ASC"),
+                ):
+                    cursor = conn.execute(f"""
+                        SELECT {COLUNAS_ENDERECO}, n_fachada_num
+                        FROM enderecos
+                        WHERE cep = ? AND cod_logradouro IS ? AND {filtro} AND n_fachada != ?
+                        ORDER BY n_fachada_num {ordem}
+                        LIMIT ?
+                    """, (cep_normalizado, cod_logradouro, numero, n_fachada_normalizado, limite))
+                    for row in cursor:
+                        endereco = dict(row)
+                        endereco['posicao'] = posicao
+                        endereco['distancia'] = abs(endereco.pop('n_fachada_num') - numero)
+                        proximos.append(endereco)
+
+        proximos.sort(key=lambda e: (e['distancia'], e['posicao'] == "acima"))
+        return proximos
+
+    @medir_banco("listagem_logradouro")
+    def listar_logradouro(
+        self,
+        cod_logradouro: str,
+        cep: Optional[str] = None,
+        limite: int = 100,
+        apos: Optional[Tuple[str, int, int]] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[str, int, int]]]:
+        """
+        Lista os endereços de um logradouro, em páginas, por ordem de CEP e número.
+
+        Paginação por cursor (keyset): a página seguinte começa logo depois da
+        chave (cep, número, id) do último endereço retornado, com uma busca
+        por faixa no índice ``idx_logradouro_listagem``. O custo de uma página
+        não depende da posição dela na listagem, ao contrário de OFFSET.
+        Sem filtro de CEP, a listagem passa para o próximo CEP do logradouro
+        quando o atual termina.
+
+        Args:
+            cod_logradouro: Código do logradouro
+            cep: CEP normalizado, para listar só esse trecho do logradouro
+            limite: Máximo de endereços na página
+            apos: Chave (cep, número, id) do último endereço da página anterior
+
+        Returns:
+            Tupla (endereços da página, chave para a próxima página ou None)
+        """
+        chave_sql = "IFNULL(n_fachada_num, -1)"
+        itens: List[Dict[str, Any]] = []
+        ultima_chave: Optional[Tuple[str, int, int]] = None
+
+        with self.read_connection() as conn:
+            if apos:
+                cep_atual, numero, id_ = apos
+            else:
+                # -2/0: antes de qualquer chave (números começam em -1)
+                numero, id_ = -2, 0
+                cep_atual = cep or conn.execute(
+                    "SELECT MIN(cep) FROM enderecos WHERE cod_logradouro = ?", (cod_logradouro,)
+                ).fetchone()[0]
+
+            # Uma linha além do limite indica se há próxima página
+            while cep_atual is not None and len(itens) <= limite:
+                cursor = conn.execute(f"""
+                    SELECT {COLUNAS_ENDERECO}, id, {chave_sql} AS chave
+                    FROM enderecos
+                    WHERE cod_logradouro = ? AND cep = ?
+                      AND {chave_sql} >= ? AND ({chave_sql}, id) > (?, ?)
+                    ORDER BY {chave_sql}, id
+                    LIMIT ?
+                """, (cod_logradouro, cep_atual, numero, numero, id_, limite + 1 - len(itens)))
+                for row in cursor:
+                    endereco = dict(row)
+                    chave = (cep_atual, endereco.pop('chave'), endereco.pop('id'))
+                    if len(itens) == limite:
+                        return itens, ultima_chave
+                    itens.append(endereco)
+                    ultima_chave = chave
+
+                if cep:
+                    break
+                numero, id_ = -2, 0
+                cep_atual = conn.execute(
+                    "SELECT MIN(cep) FROM enderecos WHERE cod_logradouro = ? AND cep > ?",
+                    (cod_logradouro, cep_atual)
+                ).fetchone()[0]
+
+        return itens, None
+
+    def exportar_enderecos(
+        self,
+        filtros: Optional[Dict[str, str]] = None,
+        tamanho_bloco: int = 5000
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Percorre a tabela de endereços em blocos, em ordem de id (keyset).
+
+        Cada bloco é lido em uma transação curta própria (``id > último id``),
+        e a conexão volta ao pool entre os blocos: a memória usada não depende
+        do tamanho da tabela e a exportação não segura um snapshot aberto que
+        impeça o checkpoint do WAL durante uma recarga.
+
+        Se os dados forem trocados no meio (nova carga, carga incremental,
+        rollback ou limpeza), os blocos seguintes viriam de outro conjunto de
+        dados; nesse caso a exportação é interrompida.
+
+        Args:
+            filtros: Igualdades por coluna, entre COLUNAS_FILTRO_EXPORTACAO
+            tamanho_bloco: Linhas por bloco
+
+        Raises:
+            ValueError: Se um filtro usar uma coluna não permitida
+            RuntimeError: Se os dados mudarem durante a exportação
+
+        Yields:
+            Lista de endereços (dicionários) de cada bloco
+        """
+        filtros = {coluna: valor for coluna, valor in (filtros or {}).items() if valor is not None}
+        invalidas = set(filtros) - set(COLUNAS_FILTRO_EXPORTACAO)
+        if invalidas:
+            raise ValueError(f"Filtros não permitidos: {', '.join(sorted(invalidas))}")
+        condicoes = "".join(f" AND {coluna} = ?" for coluna in filtros)
+
+        query = f"""
+            SELECT id, {COLUNAS_ENDERECO}
+            FROM enderecos
+            WHERE id > ?{condicoes}
+            ORDER BY id
+            LIMIT ?
+        """
+        assinatura = None
+        ultimo_id = 0
+
+        while True:
+            with self.read_connection() as conn:
+                # Assinatura e bloco lidos no mesmo snapshot. A raiz da tabela
+                # muda na troca blue/green; a geração, nas demais alterações.
+                conn.execute("BEGIN")
+                atual = conn.execute("""
+                    SELECT
+                        (SELECT rootpage FROM sqlite_master WHERE type = 'table' AND name = 'enderecos'),
+                        (SELECT valor FROM dataset_meta WHERE chave = 'geracao')
+                """).fetchone()
+                if assinatura is None:
+                    assinatura = tuple(atual)
+                elif tuple(atual) != assinatura:
+                    raise RuntimeError("Os dados foram alterados durante a exportação; exporte novamente")
+
+                rows = conn.execute(query, (ultimo_id, *filtros.values(), tamanho_bloco)).fetchall()
+
+            if not rows:
+                return
+            ultimo_id = rows[-1]['id']
+            bloco = []
+            for row in rows:
+                endereco = dict(row)
+                del endereco['id']
+                bloco.append(endereco)
+            yield bloco
+
+    @medir_banco("busca_texto")
+    def buscar_enderecos(
+        self,
+        texto: str,
+        numero: Optional[str] = None,
+        municipio: Optional[str] = None,
+        limite: int = 10
+    ) -> List[Dict[str, Any]]:
+        """
+        Busca logradouros por texto e, com o número, resolve os endereços.
+
+        Args:
+            texto: Texto da busca (logradouro, bairro, localidade, município)
+            numero: Número da fachada (opcional)
+            municipio: Município ou localidade (opcional)
+            limite: Máximo de logradouros retornados
+
+        Raises:
+            RuntimeError: Se o SQLite não tiver FTS5
+
+        Returns:
+            Lista de trechos de logradouro (ver ``search.buscar_logradouros``);
+            com o número, cada um traz ``endereco`` (ou None) com o registro
+            de ``enderecos`` daquele número no trecho
+        """
+        with self.read_connection() as conn:
+            if not search.fts_disponivel(conn):
+                raise RuntimeError("Busca por texto indisponível: SQLite sem suporte a FTS5")
+
+            trechos = search.buscar_logradouros(conn, texto, municipio, limite)
+            if numero is not None:
+                n_fachada = str(numero).strip()
+                for trecho in trechos:
+                    # Índice (cep, n_fachada), filtrando o logradouro do trecho
+                    row = conn.execute(f"""
+                        SELECT {COLUNAS_ENDERECO}
+                        FROM enderecos
+                        WHERE cep = ? AND n_fachada = ? AND cod_logradouro IS ?
+                        LIMIT 1
+                    """, (trecho['cep'], n_fachada, trecho['cod_logradouro'])).fetchone()
+                    trecho['endereco'] = dict(row) if row else None
+            return trechos
+
+    @medir_banco("diagnostico")
+    def diagnosticar_consulta(self, cep: str, n_fachada: str) -> Dict[str, Any]:
+        """
+        Executa as queries de diagnóstico de uma consulta e registra no log.
+
+        Útil para investigar consultas que não encontram resultado, como
+        divergências de formato na fachada ("144" vs "144.0"). Faz varreduras
+        completas da tabela, por isso só deve rodar no modo de rastreamento.
+
+        Args:
+            cep: CEP (com ou sem hífen)
+            n_fachada: Número da fachada
+
+        Returns:
+            Dicionário com os dados do diagnóstico
+        """
+        cep_normalizado = cep.replace('-', '').replace('.', '').strip()
+        n_fachada_normalizado = str(n_fachada).strip()
+
         logger.info(f"[DB] Consultando: CEP={cep_normalizado}, N_FACHADA={n_fachada_normalizado}")
 
-        with self.get_connection() as conn:
+        with self.read_connection() as conn:
             cursor = conn.cursor()
 
             # Verificar total de registros no banco
@@ -170,101 +1142,308 @@ class Database:
             count_num = cursor.fetchone()['count']
             logger.info(f"[DB] Registros com N_FACHADA {n_fachada_normalizado}: {count_num}")
 
-            # DEBUG: Mostrar alguns registros com esse CEP
+            # Mostrar alguns registros com esse CEP
             cursor.execute("""
                 SELECT n_fachada, logradouro, municipio
                 FROM enderecos
                 WHERE cep = ?
                 LIMIT 5
             """, (cep_normalizado,))
-            exemplos = cursor.fetchall()
+            exemplos = [dict(ex) for ex in cursor.fetchall()]
             logger.info(f"[DB] DEBUG - Exemplos de n_fachada para CEP {cep_normalizado}:")
             for ex in exemplos:
                 n_fach = ex['n_fachada']
                 logger.info(f"[DB]   n_fachada='{n_fach}' | len={len(str(n_fach))} | logradouro={ex['logradouro']}")
 
-            query = """
-                SELECT
-                    viabilidade_atual,
-                    uf,
-                    municipio,
-                    localidade,
-                    bairro,
-                    logradouro,
-                    cod_logradouro,
-                    n_fachada,
-                    comp_1,
-                    comp_2,
-                    comp_3,
-                    regiao,
-                    cep,
-                    total_hps
-                FROM enderecos
-                WHERE cep = ? AND n_fachada = ?
-                LIMIT 1
+            return {
+                'total_registros': total,
+                'registros_cep': count_cep,
+                'registros_fachada': count_num,
+                'exemplos_cep': exemplos
+            }
+
+    @staticmethod
+    def _gravar_estatisticas(conn: sqlite3.Connection, contagens: Dict[Tuple[str, str], int]):
+        """Soma as contagens (dimensão, valor) às estatísticas e atualiza a data."""
+        conn.executemany(
             """
+            INSERT INTO estatisticas (dimensao, valor, registros) VALUES (?, ?, ?)
+            ON CONFLICT(dimensao, valor) DO UPDATE SET registros = registros + excluded.registros
+            """,
+            [(dimensao, valor, registros) for (dimensao, valor), registros in contagens.items()]
+        )
+        conn.execute("DELETE FROM estatisticas WHERE registros = 0 AND dimensao != 'total'")
+        conn.execute("""
+            INSERT OR REPLACE INTO dataset_meta (chave, valor)
+            VALUES ('estatisticas_em', strftime('%Y-%m-%dT%H:%M:%SZ', 'now'))
+        """)
 
-            cursor.execute(query, (cep_normalizado, n_fachada_normalizado))
-            row = cursor.fetchone()
+    def _recalcular_estatisticas(self, conn: sqlite3.Connection) -> int:
+        """
+        Recalcula as estatísticas materializadas a partir de ``enderecos``, sem fazer commit.
+
+        Chamado dentro da transação de cada carga, então as estatísticas
+        mudam junto com os dados. Uma única varredura da tabela.
+
+        Returns:
+            Total de registros
+        """
+        contagens: Dict[Tuple[str, str], int] = defaultdict(int)
+        contagens[('total', '')] = 0
+        for viabilidade, municipio, registros in conn.execute("""
+            SELECT viabilidade_atual, municipio, COUNT(*)
+            FROM enderecos
+            GROUP BY viabilidade_atual, municipio
+        """):
+            contagens[('total', '')] += registros
+            contagens[('viabilidade', viabilidade or '')] += registros
+            contagens[('municipio', municipio or '')] += registros
 
-            if row:
-                logger.info(f"[DB] ✅ Registro encontrado!")
-                return dict(row)
+        conn.execute("DELETE FROM estatisticas")
+        self._gravar_estatisticas(conn, contagens)
+        return contagens[('total', '')]
 
-            logger.warning(f"[DB] ❌ Nenhum registro encontrado com CEP={cep_normalizado} e N_FACHADA={n_fachada_normalizado}")
-            return None
+    def _atualizar_derivados(self, conn: sqlite3.Connection) -> int:
+        """
+        Atualiza as tabelas derivadas de ``enderecos`` (estatísticas, layout
+        compacto e índice de busca), na transação da carga.
 
+        Returns:
+            Total de registros
+        """
+        total = self._recalcular_estatisticas(conn)
+        self.compacto.reconstruir(conn)
+        search.reconstruir_indice(conn)
+        return total
+
+    def _atualizar_derivados_alterados(
+        self,
+        conn: sqlite3.Connection,
+        antes: List[sqlite3.Row],
+        depois: List[sqlite3.Row]
+    ):
+        """
+        Atualiza as tabelas derivadas só com os endereços alterados, na transação da carga.
+
+        O custo depende do tamanho da mudança, não do conjunto de dados: as
+        estatísticas recebem a diferença das contagens, e o layout compacto e
+        o índice de busca refazem só as chaves e os trechos tocados.
+
+        Args:
+            conn: Conexão de escrita, com a transação aberta
+            antes: Endereços removidos e a versão anterior dos atualizados
+                (colunas de ``_COLUNAS_DERIVADAS``)
+            depois: Endereços inseridos e a versão nova dos atualizados
+        """
+        contagens: Dict[Tuple[str, str], int] = defaultdict(int)
+        for linhas, sinal in ((antes, -1), (depois, 1)):
+            for row in linhas:
+                contagens[('total', '')] += sinal
+                contagens[('viabilidade', row['viabilidade_atual'] or '')] += sinal
+                contagens[('municipio', row['municipio'] or '')] += sinal
+        self._gravar_estatisticas(conn, contagens)
+
+        linhas = antes + depois
+        self.compacto.atualizar_chaves(conn, {(row['cep'], row['n_fachada']) for row in linhas})
+        search.atualizar_trechos(conn, {
+            (row['cep'], row['cod_logradouro'], row['logradouro'], row['bairro'],
+             row['localidade'], row['municipio'], row['uf'])
+            for row in linhas if row['logradouro'] is not None
+        })
+
+    @staticmethod
+    def _linhas_por_id(conn: sqlite3.Connection, ids: List[int]) -> List[sqlite3.Row]:
+        """Lê as colunas de ``_COLUNAS_DERIVADAS`` dos endereços informados."""
+        linhas: List[sqlite3.Row] = []
+        for i in range(0, len(ids), 500):
+            lote = ids[i:i + 500]
+            linhas += conn.execute(
+                f"SELECT {_COLUNAS_DERIVADAS} FROM enderecos WHERE id IN ({', '.join('?' * len(lote))})",
+                lote
+            ).fetchall()
+        return linhas
+
+    def _somar_estatisticas(self, conn: sqlite3.Connection, enderecos: List[Dict[str, Any]]):
+        """Soma às estatísticas os endereços inseridos, sem recalcular a tabela inteira."""
+        contagens: Dict[Tuple[str, str], int] = defaultdict(int)
+        for e in enderecos:
+            contagens[('total', '')] += 1
+            contagens[('viabilidade', e.get('viabilidade_atual') or '')] += 1
+            contagens[('municipio', e.get('municipio') or '')] += 1
+        self._gravar_estatisticas(conn, contagens)
+
+    def contar_registros(self) -> int:
+        """
+        Retorna o total de endereços, lido das estatísticas materializadas.
+
+        Returns:
+            Total de registros (consulta por chave primária, sem varrer a tabela)
+        """
+        with self.read_connection() as conn:
+            row = conn.execute(
+                "SELECT registros FROM estatisticas WHERE dimensao = 'total' AND valor = ''"
+            ).fetchone()
+        return row['registros'] if row else 0
+
+    @medir_banco("estatisticas")
     def get_stats(self) -> Dict[str, Any]:
         """
         Retorna estatísticas sobre os dados no banco.
 
+        As contagens vêm da tabela ``estatisticas``, mantida a cada carga;
+        nenhuma agregação é feita sobre ``enderecos``.
+
         Returns:
             Dicionário com estatísticas
         """
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
+        with self.read_connection() as conn:
+            rows = conn.execute("""
+                SELECT dimensao, valor, registros
+                FROM estatisticas
+                ORDER BY dimensao, registros DESC, valor
+            """).fetchall()
+            atualizadas_em = conn.execute(
+                "SELECT valor FROM dataset_meta WHERE chave = 'estatisticas_em'"
+            ).fetchone()
 
-            # Total de registros
-            cursor.execute("SELECT COUNT(*) as total FROM enderecos")
-            total = cursor.fetchone()['total']
+        total = 0
+        viabilidade_counts: Dict[str, int] = {}
+        municipio_counts: Dict[str, int] = {}
+        for row in rows:
+            if row['dimensao'] == 'total':
+                total = row['registros']
+            elif row['dimensao'] == 'viabilidade':
+                viabilidade_counts[row['valor']] = row['registros']
+            elif row['dimensao'] == 'municipio':
+                municipio_counts[row['valor']] = row['registros']
 
-            # Contagem por viabilidade
-            cursor.execute("""
-                SELECT viabilidade_atual, COUNT(*) as count
-                FROM enderecos
-                GROUP BY viabilidade_atual
-            """)
-            viabilidade_counts = {
-                row['viabilidade_atual']: row['count']
-                for row in cursor.fetchall()
-            }
+        return {
+            'total_registros': total,
+            'por_viabilidade': viabilidade_counts,
+            'por_municipio': municipio_counts,
+            'atualizadas_em': atualizadas_em['valor'] if atualizadas_em else None,
+            'geracao': self.get_generation()
+        }
 
-            # Contagem por município
-            cursor.execute("""
-                SELECT municipio, COUNT(*) as count
-                FROM enderecos
-                GROUP BY municipio
-                ORDER BY count DESC
-            """)
-            municipio_counts = {
-                row['municipio']: row['count']
-                for row in cursor.fetchall()
-            }
+    def verificar_conexao(self) -> bool:
+        """
+        Verifica se o banco responde, sem ler a tabela de endereços.
 
-            return {
-                'total_registros': total,
-                'por_viabilidade': viabilidade_counts,
-                'por_municipio': municipio_counts
-            }
+        Returns:
+            True se uma conexão do pool executou uma consulta trivial
+        """
+        with self.read_connection() as conn:
+            conn.execute("SELECT 1").fetchone()
+        return True
 
+    @medir_banco("limpeza")
     def clear_all(self):
         """Limpa todos os dados da tabela de endereços."""
-        with self.get_connection() as conn:
+        with self.write_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM enderecos")
+            cursor.execute("DELETE FROM planilha_abas")
+            self._atualizar_derivados(conn)
+            self._avancar_geracao(conn)
             conn.commit()
             logger.info("Banco de dados limpo com sucesso")
 
+    @staticmethod
+    def _garantir_versao_id(conn: sqlite3.Connection) -> str:
+        """
+        Lê o identificador aleatório da versão dos dados, criando-o se não existir.
+
+        Junto com a geração, distingue conjuntos de dados de bancos diferentes
+        que estejam na mesma geração (ex.: um arquivo ``.db`` substituído no deploy).
+        """
+        row = conn.execute(
+            "SELECT valor FROM dataset_meta WHERE chave = 'versao_id'"
+        ).fetchone()
+        if row:
+            return row['valor']
+        versao_id = secrets.token_hex(4)
+        conn.execute(
+            "INSERT INTO dataset_meta (chave, valor) VALUES ('versao_id', ?)", (versao_id,)
+        )
+        conn.commit()
+        return versao_id
+
+    def get_generation(self) -> int:
+        """
+        Retorna a geração atual do conjunto de dados.
+
+        A geração muda a cada transação que altera os endereços (carga,
+        carga incremental, rollback, limpeza), feita por este ou por outro
+        processo; resultados guardados de gerações anteriores são inválidos.
+
+        Returns:
+            Número da geração
+        """
+        return self._conferir_versao()[0]
+
+    def get_dataset_version(self) -> str:
+        """
+        Retorna o identificador da versão do conjunto de dados.
+
+        Muda junto com a geração; usado como ETag das respostas HTTP (ver
+        app/http_cache.py).
+
+        Returns:
+            Versão no formato "<geração>-<identificador aleatório>"
+        """
+        geracao, versao_id = self._conferir_versao()
+        return f"{geracao}-{versao_id}"
+
+    def _conferir_versao(self) -> Tuple[int, str]:
+        """
+        Retorna a geração e o identificador da versão, relendo-os se o banco mudou.
+
+        ``PRAGMA data_version`` muda quando outra conexão grava no banco,
+        inclusive as de outros processos (outro worker do uvicorn,
+        scripts/load_excel.py), e não lê nenhuma página: quando nada mudou, a
+        conferência não acessa o disco. Por isso a conexão usada aqui é
+        exclusiva e nunca grava (gravações dela mesma não mudariam o valor).
+
+        Returns:
+            Tupla (geração, identificador aleatório)
+        """
+        if not self._inicializado:
+            self.inicializar()
+        with self._lock_versao:
+            if self._conn_versao is None:
+                self._conn_versao = conectar(
+                    self.db_path, read_only=settings.sqlite_read_only_queries
+                )
+            data_version = self._conn_versao.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self._data_version:
+                # Um único SELECT: geração e identificador do mesmo snapshot
+                meta = dict(self._conn_versao.execute(
+                    "SELECT chave, valor FROM dataset_meta WHERE chave IN ('geracao', 'versao_id')"
+                ).fetchall())
+                versao = (int(meta.get('geracao', 0)), meta.get('versao_id', ""))
+                if versao != self._versao:
+                    logger.info(f"Geração do conjunto de dados: {versao[0]}")
+                self._versao = versao
+                self._data_version = data_version
+            return self._versao
+
+    @staticmethod
+    def _avancar_geracao(conn: sqlite3.Connection):
+        """
+        Avança a geração e troca o identificador da versão, sem fazer commit.
+
+        Chamado dentro da transação que altera os endereços: a geração nova
+        fica visível junto com os dados, para este e para os demais processos.
+        """
+        conn.execute("""
+            INSERT INTO dataset_meta (chave, valor) VALUES ('geracao', '1')
+            ON CONFLICT(chave) DO UPDATE SET valor = CAST(valor AS INTEGER) + 1
+        """)
+        conn.execute(
+            "INSERT OR REPLACE INTO dataset_meta (chave, valor) VALUES ('versao_id', ?)",
+            (secrets.token_hex(4),)
+        )
+
     def database_exists(self) -> bool:
         """
         Verifica se o banco de dados existe e tem dados.
@@ -274,12 +1453,7 @@ class Database:
         """
         if not self.db_path.exists():
             return False
-
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) as count FROM enderecos")
-            count = cursor.fetchone()['count']
-            return count > 0
+        return self.contar_registros() > 0
 
 
 # Instância global do banco de dados
@@ -0,0 +1,69 @@
+"""
+Cálculo das diferenças da carga incremental.
+
+A carga incremental compara cada aba alterada da planilha com os endereços
+vindos da mesma aba no banco, pela chave natural do endereço (CEP, número
+da fachada e complementos). O resultado é a lista de inserções,
+atualizações e remoções a aplicar, proporcional ao tamanho da mudança.
+"""
+from collections import defaultdict
+from typing import Any, Dict, List, Tuple
+
+from .utils import COLUNAS_PLANILHA
+
+# Chave natural de um endereço
+CHAVE_NATURAL = ('cep', 'n_fachada', 'comp_1', 'comp_2', 'comp_3')
+
+
+def _chave(endereco: Dict[str, Any]) -> Tuple[Any, ...]:
+    return tuple(endereco.get(coluna) for coluna in CHAVE_NATURAL)
+
+
+def _valores(endereco: Dict[str, Any]) -> Tuple[Any, ...]:
+    return tuple(endereco.get(coluna) for coluna in COLUNAS_PLANILHA)
+
+
+def calcular_delta_aba(
+    existentes: List[Tuple[int, Dict[str, Any]]],
+    novos: List[Dict[str, Any]]
+) -> Tuple[List[Dict[str, Any]], List[Tuple[int, Dict[str, Any]]], List[int]]:
+    """
+    Compara os endereços de uma aba no banco com os lidos da planilha.
+
+    A chave natural pode se repetir na planilha; endereços com a mesma chave
+    são pareados na ordem em que aparecem (o banco na ordem de inserção).
+
+    Args:
+        existentes: Lista de (id, endereço) da aba no banco, na ordem de inserção
+        novos: Endereços da aba na planilha, na ordem da planilha
+
+    Returns:
+        Tupla (inserções, atualizações como (id, endereço), ids a remover)
+    """
+    por_chave: Dict[Tuple[Any, ...], List[Tuple[int, Dict[str, Any]]]] = defaultdict(list)
+    for id_, endereco in existentes:
+        por_chave[_chave(endereco)].append((id_, endereco))
+
+    insercoes: List[Dict[str, Any]] = []
+    atualizacoes: List[Tuple[int, Dict[str, Any]]] = []
+    usados: Dict[Tuple[Any, ...], int] = defaultdict(int)
+
+    for endereco in novos:
+        chave = _chave(endereco)
+        candidatos = por_chave.get(chave)
+        posicao = usados[chave]
+        if not candidatos or posicao >= len(candidatos):
+            insercoes.append(endereco)
+            continue
+
+        usados[chave] = posicao + 1
+        id_, atual = candidatos[posicao]
+        if _valores(atual) != _valores(endereco):
+            atualizacoes.append((id_, endereco))
+
+    remocoes = [
+        id_
+        for chave, candidatos in por_chave.items()
+        for id_, _ in candidatos[usados.get(chave, 0):]
+    ]
+    return insercoes, atualizacoes, remocoes
@@ -0,0 +1,151 @@
+"""
+Cache HTTP condicional (ETag / 304) amarrado à versão do conjunto de dados.
+
+As respostas de consulta só mudam quando os dados mudam (upload, carga
+incremental, limpeza ou rollback, que avançam a versão na mesma transação). O
+``ETagMiddleware`` usa a versão do conjunto de dados
+(``Database.get_dataset_version``, conferida no banco a cada requisição, então
+alterações feitas por outro processo também contam) como ETag fraco dos
+endpoints de leitura:
+
+- se o ``If-None-Match`` da requisição traz a versão atual, responde 304 sem
+  chamar o endpoint, ou seja, sem acessar o banco;
+- senão, acrescenta ``ETag`` e ``Cache-Control`` às respostas 200.
+
+A versão é lida no início da requisição: uma resposta calculada durante uma
+troca de dados recebe a versão anterior e é revalidada na próxima vez.
+
+Por padrão (``HTTP_CACHE_MAX_AGE=0``) as respostas saem com
+``Cache-Control: no-cache``: navegadores, proxies e CDNs podem guardá-las, mas
+revalidam a cada uso, então nunca servem viabilidade de uma versão antiga.
+Com ``HTTP_CACHE_MAX_AGE`` acima de 0, ``public, max-age=N`` troca esse
+frescor por menos requisições: por N segundos a resposta é reaproveitada sem
+consultar a API, mesmo que os dados mudem.
+Consultas rastreadas trazem diagnóstico e não são cacheadas: o endpoint marca
+a resposta com o header ``X-Consulta-Rastreada``, que o middleware troca por
+``Cache-Control: no-store``, sem ETag. Isso cobre também as rastreadas por
+amostragem (``TRACE_SAMPLE_RATE``); as que pedem o rastreamento (``?trace=true``
+ou ``X-Trace-Consulta``) também nunca recebem 304. ``/health`` fica de fora: a resposta reflete
+o estado do banco, que muda sem mudar a versão dos dados.
+"""
+from typing import Optional
+from urllib.parse import parse_qsl
+
+from .config import settings
+from .database import db
+
+# Endpoints cacheados: caminhos exatos e prefixos (com a rota correspondente)
+CAMINHOS_CACHEADOS = ('/consultar', '/estatisticas', '/buscar')
+PREFIXOS_CACHEADOS = {'/logradouros/': '/logradouros/{cod_logradouro}/enderecos'}
+
+# Header com que o endpoint marca uma resposta rastreada (removido pelo middleware)
+HEADER_RASTREADA = "X-Consulta-Rastreada"
+_HEADER_RASTREADA = HEADER_RASTREADA.lower().encode("latin-1")
+
+# Valores aceitos como verdadeiro nos parâmetros booleanos do FastAPI
+_VERDADEIRO = ('1', 'true', 'on', 'yes')
+
+
+def _cacheavel(scope) -> bool:
+    if scope["method"] not in ("GET", "HEAD"):
+        return False
+    caminho = scope["path"]
+    return caminho in CAMINHOS_CACHEADOS or caminho.startswith(tuple(PREFIXOS_CACHEADOS))
+
+
+def _rastreio_solicitado(scope) -> bool:
+    """True se a requisição pede o diagnóstico (nunca respondida com 304)."""
+    for chave, valor in parse_qsl(scope.get("query_string", b"").decode("latin-1")):
+        if chave == "trace" and valor.lower() in _VERDADEIRO:
+            return True
+    for nome, valor in scope["headers"]:
+        if nome == b"x-trace-consulta" and valor.decode("latin-1").lower() in _VERDADEIRO:
+            return True
+    return False
+
+
+def _rota(caminho: str) -> str:
+    """Caminho da rota (como em ``scope["route"].path``) de um caminho cacheado."""
+    for prefixo, rota in PREFIXOS_CACHEADOS.items():
+        if caminho.startswith(prefixo):
+            return rota
+    return caminho
+
+
+def _if_none_match(scope) -> Optional[bytes]:
+    for nome, valor in scope["headers"]:
+        if nome == b"if-none-match":
+            return valor
+    return None
+
+
+def etag_corresponde(if_none_match: bytes, etag: bytes) -> bool:
+    """
+    Compara o header ``If-None-Match`` com o ETag (comparação fraca, RFC 9110).
+
+    Args:
+        if_none_match: Valor do header (lista separada por vírgulas ou "*")
+        etag: ETag atual, com aspas
+
+    Returns:
+        True se algum dos ETags informados corresponde ao atual
+    """
+    if if_none_match.strip() == b"*":
+        return True
+    atual = etag.removeprefix(b"W/")
+    return any(
+        candidato.strip().removeprefix(b"W/") == atual
+        for candidato in if_none_match.split(b",")
+    )
+
+
+class ETagMiddleware:
+    """Middleware ASGI de ETag / 304 para os endpoints de leitura (ver o docstring do módulo)."""
+
+    def __init__(self, app):
+        self.app = app
+        self.ativo = settings.http_cache_enabled
+        max_age = int(settings.http_cache_max_age)
+        self.cache_control = (f"public, max-age={max_age}" if max_age > 0 else "no-cache").encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.ativo or not _cacheavel(scope):
+            await self.app(scope, receive, send)
+            return
+
+        etag = f'W/"{db.get_dataset_version()}"'.encode("latin-1")
+        cache_control = self.cache_control
+
+        if_none_match = _if_none_match(scope)
+        if (
+            if_none_match is not None
+            and etag_corresponde(if_none_match, etag)
+            and not _rastreio_solicitado(scope)
+        ):
+            # O 304 não passa pelo roteamento: informa a rota ao MetricsMiddleware
+            scope["rota_cache"] = _rota(scope["path"])
+            await send({
+                "type": "http.response.start",
+                "status": 304,
+                "headers": [(b"etag", etag), (b"cache-control", cache_control)],
+            })
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start" and mensagem["status"] == 200:
+                originais = mensagem.get("headers", [])
+                rastreada = any(nome.lower() == _HEADER_RASTREADA for nome, _ in originais)
+                headers = [
+                    (nome, valor) for nome, valor in originais
+                    if nome.lower() not in (b"etag", b"cache-control", _HEADER_RASTREADA)
+                ]
+                if rastreada:
+                    # Resposta com diagnóstico (rastreada por amostragem)
+                    headers.append((b"cache-control", b"no-store"))
+                else:
+                    headers += [(b"etag", etag), (b"cache-control", cache_control)]
+                mensagem = {**mensagem, "headers": headers}
+            await send(mensagem)
+
+        await self.app(scope, receive, enviar)
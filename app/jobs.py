@@ -0,0 +1,306 @@
+"""
+Cargas de planilha em segundo plano.
+
+O ``POST /upload`` só salva o arquivo e cria um job; a leitura e a troca dos
+dados rodam na thread de escrita (ver ``concurrency``), e o andamento fica
+disponível em ``/upload/jobs``. Só uma carga roda por vez. O arquivo salvo
+pertence ao job e é removido quando ele termina (concluído, com falha ou
+cancelado).
+
+Um job pode ser cancelado enquanto a planilha é lida: o cancelamento
+interrompe a leitura no próximo lote e a carga em andamento é descartada
+(a troca blue/green não chega a acontecer), então os dados atuais não mudam.
+"""
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import logging
+import threading
+import time
+import uuid
+
+from .concurrency import agendar_escrita
+from .services import endereco_service
+from .utils import estimar_linhas_planilha
+
+logger = logging.getLogger(__name__)
+
+# Número de jobs finalizados mantidos para consulta
+MAX_JOBS_HISTORICO = 20
+
+# Estados de um job
+ENFILEIRADO = "enfileirado"
+PROCESSANDO = "processando"
+CONCLUIDO = "concluido"
+FALHOU = "falhou"
+CANCELADO = "cancelado"
+ESTADOS_FINAIS = (CONCLUIDO, FALHOU, CANCELADO)
+
+
+class IngestaoEmAndamento(RuntimeError):
+    """Já existe uma carga de planilha em andamento."""
+
+
+class IngestaoCancelada(RuntimeError):
+    """A carga foi cancelada a pedido do usuário."""
+
+
+class IngestJob:
+    """Estado e progresso de uma carga de planilha."""
+
+    def __init__(
+        self,
+        arquivo: Path,
+        modo: str = "completa",
+        total_estimado: Optional[int] = None,
+        nome: Optional[str] = None
+    ):
+        """
+        Args:
+            arquivo: Planilha a ser carregada
+            modo: "completa" (substitui todos os dados) ou "incremental"
+            total_estimado: Número aproximado de linhas da planilha, se conhecido
+            nome: Nome original da planilha, exibido no estado do job
+                (padrão: nome do arquivo)
+        """
+        self.id = uuid.uuid4().hex
+        self.arquivo = arquivo
+        self.nome = nome or arquivo.name
+        self.modo = modo
+        self.estado = ENFILEIRADO
+        self.fase: Optional[str] = None
+        self.total_estimado = total_estimado
+        self.registros_lidos = 0
+        self.registros_inseridos = 0
+        self.resultado: Optional[Dict[str, Any]] = None
+        self.erro: Optional[str] = None
+        self.criado_em = datetime.now(timezone.utc).isoformat()
+        self.finalizado_em: Optional[str] = None
+        self._inicio: Optional[float] = None
+        self._fim: Optional[float] = None
+        self._cancelar = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def finalizado(self) -> bool:
+        """True se o job terminou (com sucesso, erro ou cancelado)."""
+        return self.estado in ESTADOS_FINAIS
+
+    @property
+    def cancelamento_solicitado(self) -> bool:
+        """True se o cancelamento do job foi pedido."""
+        return self._cancelar.is_set()
+
+    def solicitar_cancelamento(self) -> bool:
+        """
+        Pede o cancelamento do job.
+
+        Returns:
+            True se o pedido foi registrado, False se o job já terminou
+        """
+        if self.finalizado:
+            return False
+        self._cancelar.set()
+        return True
+
+    def definir_fase(self, fase: str):
+        """Registra a fase atual da carga."""
+        with self._lock:
+            self.fase = fase
+        logger.info(f"Job {self.id}: {fase}")
+
+    def acompanhar(self, lotes: Iterable[List[Dict[str, Any]]]) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Repassa os lotes lidos da planilha, contando as linhas e verificando o cancelamento.
+
+        Raises:
+            IngestaoCancelada: Se o cancelamento foi solicitado
+        """
+        self.definir_fase("lendo_planilha")
+        for lote in lotes:
+            if self._cancelar.is_set():
+                raise IngestaoCancelada("Carga cancelada pelo usuário")
+            with self._lock:
+                self.registros_lidos += len(lote)
+            yield lote
+        if self._cancelar.is_set():
+            raise IngestaoCancelada("Carga cancelada pelo usuário")
+        # Depois do último lote o banco cria os índices, valida e troca as cargas
+        self.definir_fase("indexando_e_validando")
+
+    def definir_total_estimado(self, total: Optional[int]):
+        """Registra o número estimado de linhas da planilha, usado no tempo restante."""
+        with self._lock:
+            self.total_estimado = total
+
+    def registrar_insercao(self, total: int):
+        """Registra o total de linhas já inseridas (callback de progresso do banco)."""
+        with self._lock:
+            self.registros_inseridos = total
+
+    def _iniciar(self):
+        with self._lock:
+            self.estado = PROCESSANDO
+            self._inicio = time.time()
+
+    def _finalizar(self, estado: str, resultado: Optional[Dict[str, Any]] = None, erro: Optional[str] = None):
+        with self._lock:
+            self.estado = estado
+            self.resultado = resultado
+            self.erro = erro
+            self.fase = None
+            self._fim = time.time()
+            self.finalizado_em = datetime.now(timezone.utc).isoformat()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Retorna o estado do job, com vazão e tempo restante estimados."""
+        with self._lock:
+            decorrido = 0.0
+            if self._inicio is not None:
+                decorrido = (self._fim or time.time()) - self._inicio
+
+            vazao = self.registros_lidos / decorrido if decorrido > 0 else 0.0
+            eta = None
+            if not self.finalizado and self.total_estimado and vazao > 0:
+                eta = round(max(self.total_estimado - self.registros_lidos, 0) / vazao, 1)
+
+            return {
+                'job_id': self.id,
+                'arquivo': self.nome,
+                'modo': self.modo,
+                'estado': self.estado,
+                'fase': self.fase,
+                'registros_lidos': self.registros_lidos,
+                'registros_inseridos': self.registros_inseridos,
+                'total_estimado': self.total_estimado,
+                'registros_por_segundo': round(vazao, 1),
+                'eta_s': eta,
+                'tempo_decorrido_s': round(decorrido, 1),
+                'cancelamento_solicitado': self.cancelamento_solicitado,
+                'criado_em': self.criado_em,
+                'finalizado_em': self.finalizado_em,
+                'resultado': self.resultado,
+                'erro': self.erro,
+            }
+
+
+class JobManager:
+    """Cria, executa e guarda os jobs de carga (um em andamento por vez)."""
+
+    def __init__(self):
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def ativo(self) -> Optional[IngestJob]:
+        """Retorna o job em andamento (ou enfileirado), se houver."""
+        with self._lock:
+            for job in self._jobs.values():
+                if not job.finalizado:
+                    return job
+        return None
+
+    def iniciar(self, arquivo: Path, modo: str = "completa", nome: Optional[str] = None) -> IngestJob:
+        """
+        Cria um job para a planilha e o agenda na thread de escrita.
+
+        O job passa a ser dono do arquivo e o remove ao terminar. Se o job
+        não for criado (exceção), o arquivo continua sendo de quem chamou.
+
+        Args:
+            arquivo: Caminho da planilha já salva em disco
+            modo: "completa" ou "incremental" (ver ``upload_planilha_delta``)
+            nome: Nome original da planilha, exibido no estado do job
+
+        Raises:
+            IngestaoEmAndamento: Se outra carga ainda não terminou
+
+        Returns:
+            Job criado
+        """
+        with self._lock:
+            for job in self._jobs.values():
+                if not job.finalizado:
+                    raise IngestaoEmAndamento(f"Já existe uma carga em andamento (job {job.id})")
+
+            job = IngestJob(arquivo, modo, nome=nome)
+            self._jobs[job.id] = job
+            self._descartar_antigos()
+
+        agendar_escrita(self._executar, job)
+        logger.info(f"Job {job.id} criado para {job.nome}")
+        return job
+
+    def _executar(self, job: IngestJob):
+        """Executa a carga (na thread de escrita), registra o resultado no job e remove o arquivo."""
+        try:
+            self._carregar(job)
+        finally:
+            try:
+                job.arquivo.unlink(missing_ok=True)
+            except OSError as e:
+                logger.warning(f"Não foi possível remover {job.arquivo}: {str(e)}")
+
+    @staticmethod
+    def _carregar(job: IngestJob):
+        if job.cancelamento_solicitado:
+            job._finalizar(CANCELADO, erro="Carga cancelada antes de iniciar")
+            return
+
+        job._iniciar()
+        # Estimativa feita já em segundo plano: abrir a planilha leva segundos
+        # e não deve atrasar a resposta do POST /upload
+        job.definir_fase("estimando_linhas")
+        try:
+            job.definir_total_estimado(estimar_linhas_planilha(job.arquivo))
+        except Exception as e:
+            logger.warning(f"Não foi possível estimar as linhas da planilha: {str(e)}")
+        try:
+            if job.modo == "incremental":
+                resposta = endereco_service.upload_planilha_delta(job.arquivo, job=job)
+            else:
+                resposta = endereco_service.upload_planilha(job.arquivo, job=job)
+        except Exception as e:
+            logger.error(f"Job {job.id} falhou: {str(e)}")
+            job._finalizar(FALHOU, erro=str(e))
+            return
+
+        if resposta.sucesso:
+            job._finalizar(CONCLUIDO, resultado=resposta.model_dump())
+        elif job.cancelamento_solicitado:
+            job._finalizar(CANCELADO, resultado=resposta.model_dump(), erro="Carga cancelada pelo usuário")
+        else:
+            job._finalizar(FALHOU, resultado=resposta.model_dump(), erro=resposta.mensagem)
+        logger.info(f"Job {job.id}: {job.estado}")
+
+    def obter(self, job_id: str) -> Optional[IngestJob]:
+        """Retorna o job pelo id, ou None se não existir."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def listar(self) -> List[Dict[str, Any]]:
+        """Lista os jobs conhecidos, do mais recente para o mais antigo."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.to_dict() for job in reversed(jobs)]
+
+    def cancelar_todos(self):
+        """Pede o cancelamento dos jobs não finalizados (usado no desligamento)."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job.solicitar_cancelamento()
+
+    def _descartar_antigos(self):
+        """Remove os jobs finalizados mais antigos além de MAX_JOBS_HISTORICO."""
+        excedentes = len(self._jobs) - MAX_JOBS_HISTORICO
+        for job_id in list(self._jobs):
+            if excedentes <= 0:
+                break
+            if self._jobs[job_id].finalizado:
+                del self._jobs[job_id]
+                excedentes -= 1
+
+
+# Instância global do gerenciador de jobs
+job_manager = JobManager()
@@ -1,20 +1,49 @@
 """
 API FastAPI para consulta de viabilidade de endereços.
 """
-from fastapi import FastAPI, UploadFile, File, Query, HTTPException
+import time
+
+# Início da importação da API (fase "importacao" da inicialização)
+_INICIO_IMPORTACAO = time.perf_counter()
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, UploadFile, File, Query, Header, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pathlib import Path
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from typing import List, Optional
+import asyncio
+import json
 import shutil
+import tempfile
 import logging
+import uuid
 
 from .models import (
+    BuscaResponse,
+    ConsultaLoteRequest,
+    ConsultaLoteResponse,
     ConsultaResponse,
-    UploadResponse,
+    JobCargaResponse,
+    ListagemLogradouroResponse,
     HealthResponse,
     ErrorResponse
 )
 from .services import endereco_service
+from .utils import ler_csv_enderecos
+from .database import db
+from .memory_index import memory_index
+from .cache import lookup_cache
+from .jobs import IngestJob, IngestaoEmAndamento, job_manager
+from .metrics import CONTENT_TYPE, FASES_INICIALIZACAO, Contador, MetricsMiddleware, metricas
+from .timing import TimingMiddleware, iniciar_serializacao
+from .http_cache import HEADER_RASTREADA, ETagMiddleware
+from .config import settings
+from .concurrency import (
+    executar_consulta,
+    executar_estatisticas,
+    executar_escrita,
+    encerrar as encerrar_executores
+)
 
 # Configurar logging
 logging.basicConfig(
@@ -23,6 +52,73 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+async def _medir_fase(fase: str, executar):
+    """Executa uma fase da inicialização e registra a duração (log e /metrics)."""
+    inicio = time.perf_counter()
+    try:
+        return await executar()
+    except Exception as e:
+        logger.error(f"Inicialização: fase '{fase}' falhou: {e}")
+        raise
+    finally:
+        duracao = time.perf_counter() - inicio
+        FASES_INICIALIZACAO.set(round(duracao, 3), fase)
+        logger.info(f"Inicialização: {fase} em {duracao:.2f}s")
+
+
+# Tarefas de inicialização em segundo plano (referência mantida até terminarem)
+_tarefas_inicializacao = set()
+
+
+def _em_segundo_plano(fase: str, executar):
+    """Roda uma fase da inicialização sem segurar o início do atendimento."""
+    async def rodar():
+        try:
+            await _medir_fase(fase, executar)
+        except Exception:
+            pass  # já registrado em _medir_fase; a API segue usando o SQLite
+
+    tarefa = asyncio.create_task(rodar())
+    _tarefas_inicializacao.add(tarefa)
+    tarefa.add_done_callback(_tarefas_inicializacao.discard)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Inicialização e finalização da API.
+
+    Importar os módulos não acessa o banco; o esquema é criado ou migrado
+    aqui, antes de a API atender a primeira requisição. O índice em memória
+    e o aquecimento do cache (``SQLITE_WARMUP``) rodam em segundo plano: até
+    terminarem, as consultas usam o SQLite normalmente. A duração de cada
+    fase vai para o log e para ``startup_phase_seconds`` em /metrics.
+    """
+    importacao = time.perf_counter() - _INICIO_IMPORTACAO
+    FASES_INICIALIZACAO.set(round(importacao, 3), "importacao")
+    logger.info(f"Inicialização: importacao em {importacao:.2f}s")
+
+    await _medir_fase("esquema", lambda: executar_escrita(db.inicializar))
+
+    if settings.sqlite_warmup:
+        _em_segundo_plano("aquecimento", lambda: executar_estatisticas(db.aquecer_cache))
+    if memory_index.ativo:
+        _em_segundo_plano(
+            "indice_memoria", lambda: executar_escrita(endereco_service.recarregar_indice_memoria)
+        )
+
+    logger.info("=== API de Consulta de Viabilidade Iniciada ===")
+    logger.info("Documentação disponível em: /docs")
+
+    yield
+
+    # Uma carga em andamento seguraria o desligamento até o fim
+    job_manager.cancelar_todos()
+    encerrar_executores()
+    db.close()
+    logger.info("=== API Finalizada ===")
+
+
 # Criar aplicação FastAPI
 app = FastAPI(
     title="API de Consulta de Viabilidade de Endereços",
@@ -44,9 +140,15 @@ app = FastAPI(
     """,
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
+# ETag / 304 dos endpoints de leitura. Registrado antes do CORS, que envolve
+# os middlewares registrados antes dele: as respostas 304 também recebem os
+# headers de CORS
+app.add_middleware(ETagMiddleware)
+
 # Configurar CORS - IMPORTANTE: deve ser o primeiro middleware
 app.add_middleware(
     CORSMiddleware,
@@ -58,6 +160,23 @@ app.add_middleware(
 )
 
 
+# Contagem e latência das requisições (/metrics)
+app.add_middleware(MetricsMiddleware)
+
+# Tempo por fase (header Server-Timing) e log de requisições lentas
+app.add_middleware(TimingMiddleware)
+
+# Valores lidos só quando /metrics é chamado
+metricas.registrar_medidor("dataset_rows", "Endereços no conjunto de dados atual", db.contar_registros)
+metricas.registrar_medidor("dataset_generation", "Geração do conjunto de dados", db.get_generation)
+metricas.registrar(Contador(
+    "lookup_cache_requests_total",
+    "Consultas ao cache de resultados, por resultado",
+    ("resultado",),
+    funcao=lambda: [(("hit",), lookup_cache.hits), (("miss",), lookup_cache.misses)]
+))
+
+
 # Handler para requisições OPTIONS (preflight)
 @app.options("/{full_path:path}")
 async def options_handler(full_path: str):
@@ -87,8 +206,15 @@ async def root():
         "documentacao": "/docs",
         "endpoints": {
             "health": "/health",
-            "consultar": "/consultar?cep=60876672&cod_logradouro=13784",
+            "estatisticas": "/estatisticas",
+            "consultar": "/consultar?cep=60876672&numero=144",
+            "listar_logradouro": "/logradouros/13784/enderecos?cep=60876672",
+            "buscar": "/buscar?q=rua sao bernardo&numero=144&municipio=fortaleza",
+            "consultar_lote": "/consultar/lote",
+            "consultar_arquivo": "/consultar/arquivo",
             "upload": "/upload",
+            "upload_jobs": "/upload/jobs",
+            "exportar": "/exportar?formato=csv",
             "limpar": "/limpar"
         }
     }
@@ -110,7 +236,77 @@ async def health_check():
     - Total de registros
     - Estatísticas por viabilidade e município
     """
-    return endereco_service.get_health()
+    return await executar_estatisticas(endereco_service.get_health)
+
+
+@app.get(
+    "/health/live",
+    tags=["Health"],
+    summary="Liveness: o processo está no ar"
+)
+async def liveness():
+    """
+    Responde sem acessar o banco. Indica apenas que o processo e o event
+    loop estão respondendo.
+    """
+    return {"status": "ok"}
+
+
+@app.get(
+    "/health/ready",
+    tags=["Health"],
+    summary="Readiness: a API pode atender consultas"
+)
+async def readiness():
+    """
+    Verifica se o banco responde, sem varrer nenhuma tabela, e retorna o
+    total de registros (das estatísticas materializadas). Responde 503 se
+    o banco estiver indisponível. É o endpoint usado pelo health check do
+    Render.
+    """
+    resultado = await executar_consulta(endereco_service.get_readiness)
+    if not resultado['pronto']:
+        return JSONResponse(status_code=503, content=resultado)
+    return resultado
+
+
+@app.get(
+    "/metrics",
+    tags=["Health"],
+    summary="Métricas no formato do Prometheus",
+    response_class=PlainTextResponse
+)
+async def metrics():
+    """
+    Métricas da API no formato de exposição de texto do Prometheus:
+
+    - `http_requests_total` e `http_request_duration_seconds`: requisições e
+      latência por endpoint (caminho da rota), método e status
+    - `db_query_duration_seconds`: duração das operações no banco, por tipo
+    - `lookups_total` e `lookup_cache_requests_total`: endereços encontrados
+      ou não, e acertos/faltas do cache de consultas
+    - `ingest_rows_total`, `ingest_duration_seconds` e
+      `ingest_last_rows_per_second`: cargas de planilha
+    - `dataset_rows` e `dataset_generation`: conjunto de dados atual
+
+    As métricas são do processo que atende a requisição.
+    """
+    conteudo = await executar_estatisticas(metricas.expor)
+    return PlainTextResponse(conteudo, media_type=CONTENT_TYPE)
+
+
+@app.get(
+    "/estatisticas",
+    tags=["Health"],
+    summary="Estatísticas dos dados carregados"
+)
+async def estatisticas():
+    """
+    Retorna o total de endereços e as contagens por viabilidade e por
+    município. As contagens são calculadas a cada carga de planilha e lidas
+    prontas, sem agregar a tabela de endereços.
+    """
+    return await executar_estatisticas(db.get_stats)
 
 
 @app.get(
@@ -120,6 +316,7 @@ async def health_check():
     summary="Consultar viabilidade de endereço"
 )
 async def consultar_viabilidade(
+    response: Response,
     cep: str = Query(
         ...,
         description="CEP do endereço (com ou sem hífen)",
@@ -129,6 +326,20 @@ async def consultar_viabilidade(
         ...,
         description="Número da fachada",
         example="144"
+    ),
+    trace: bool = Query(
+        False,
+        description="Inclui o diagnóstico da consulta na resposta (mais lento)"
+    ),
+    proximos: int = Query(
+        0,
+        ge=0,
+        le=10,
+        description="Se o número não existir, retorna até N vizinhos abaixo e acima no mesmo logradouro"
+    ),
+    x_trace_consulta: bool = Header(
+        False,
+        description="Alternativa ao parâmetro trace, via header X-Trace-Consulta"
     )
 ):
     """
@@ -137,30 +348,173 @@ async def consultar_viabilidade(
     ## Parâmetros
     - **cep**: CEP do endereço (pode ser com ou sem hífen: 60876-672 ou 60876672)
     - **numero**: Número da fachada
+    - **trace**: Ativa o modo de rastreamento (também via header `X-Trace-Consulta: true`)
+    - **proximos**: Quando o número não é encontrado, inclui em `proximos` os
+      números mais próximos (até N abaixo e N acima) no mesmo CEP e logradouro,
+      com a viabilidade de cada um
 
     ## Resposta
     - **encontrado**: Se o endereço foi encontrado
     - **viabilidade**: Status de viabilidade ("Viável", "Não viável", etc)
     - **detalhes**: Informações completas do endereço (UF, município, bairro, etc)
     - **mensagem**: Mensagem adicional
+    - **diagnostico**: Contagens e exemplos do banco (apenas no modo de rastreamento)
+    - **proximos**: Números vizinhos, ordenados pela distância (apenas com `proximos` > 0)
+
+    O modo de rastreamento também pode ser ativado por amostragem com a
+    variável `TRACE_SAMPLE_RATE`.
 
     ## Exemplo
     ```
     GET /consultar?cep=60876672&numero=144
+    GET /consultar?cep=60876672&numero=145&proximos=1
     ```
     """
     logger.info(f"Consultando viabilidade: CEP={cep}, NUMERO={numero}")
-    return endereco_service.consultar_viabilidade(cep, numero)
+    rastrear = endereco_service.deve_rastrear(trace or x_trace_consulta)
+    if rastrear:
+        # Resposta com diagnóstico: o ETagMiddleware não a deixa ser cacheada
+        response.headers[HEADER_RASTREADA] = "true"
+    resposta = await executar_consulta(
+        endereco_service.consultar_viabilidade, cep, numero, trace=rastrear, proximos=proximos
+    )
+    iniciar_serializacao()
+    return resposta
+
+
+@app.get(
+    "/logradouros/{cod_logradouro}/enderecos",
+    response_model=ListagemLogradouroResponse,
+    tags=["Consultas"],
+    summary="Listar os endereços de um logradouro"
+)
+async def listar_logradouro(
+    cod_logradouro: str,
+    cep: Optional[str] = Query(
+        None,
+        description="Lista só o trecho do logradouro neste CEP",
+        example="60876672"
+    ),
+    limite: int = Query(100, ge=1, le=1000, description="Endereços por página"),
+    cursor: Optional[str] = Query(
+        None,
+        description="Valor de proximo_cursor da página anterior"
+    )
+):
+    """
+    Lista todas as fachadas e unidades de um logradouro, com a viabilidade.
+
+    A paginação é por cursor: a resposta traz `proximo_cursor`, que deve ser
+    repassado em `cursor` para obter a página seguinte (None na última). Cada
+    página é uma busca por faixa no índice, então o tempo de resposta é o
+    mesmo na primeira e na última página, mesmo em avenidas com milhares de
+    endereços.
+
+    ## Exemplo
+    ```
+    GET /logradouros/13784/enderecos?cep=60876672&limite=100
+    GET /logradouros/13784/enderecos?cep=60876672&limite=100&cursor=<proximo_cursor>
+    ```
+    """
+    try:
+        return await executar_consulta(endereco_service.listar_logradouro, cod_logradouro, cep, limite, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get(
+    "/buscar",
+    response_model=BuscaResponse,
+    tags=["Consultas"],
+    summary="Buscar endereços por texto (autocompletar)"
+)
+async def buscar(
+    q: str = Query(
+        ...,
+        min_length=1,
+        max_length=200,
+        description="Texto: logradouro, bairro, localidade e/ou município",
+        example="rua sao bern"
+    ),
+    numero: Optional[str] = Query(
+        None,
+        description="Número da fachada: resolve o endereço em cada logradouro encontrado",
+        example="144"
+    ),
+    municipio: Optional[str] = Query(
+        None,
+        description="Restringe ao município (ou localidade)",
+        example="fortaleza"
+    ),
+    limite: int = Query(10, ge=1, le=50, description="Máximo de logradouros")
+):
+    """
+    Busca endereços sem o CEP, pelo nome do logradouro, bairro, localidade ou
+    município.
+
+    Maiúsculas e acentos são ignorados e cada palavra vale como prefixo, então
+    a busca serve para autocompletar ("av dom lu" encontra "AVENIDA DOM
+    LUÍS"). Cada resultado é um trecho de logradouro (CEP + código do
+    logradouro), do mais para o menos relevante.
+
+    Com `numero`, cada trecho traz `encontrado`, a `viabilidade` e os
+    `detalhes` do endereço com esse número, e os trechos onde o número existe
+    vêm primeiro.
+
+    ## Exemplo
+    ```
+    GET /buscar?q=rua sao bernardo&numero=144&municipio=fortaleza
+    ```
+    """
+    try:
+        return await executar_consulta(endereco_service.buscar, q, numero, municipio, limite)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@app.post(
+    "/consultar/lote",
+    response_model=ConsultaLoteResponse,
+    tags=["Consultas"],
+    summary="Consultar viabilidade de vários endereços"
+)
+async def consultar_lote(requisicao: ConsultaLoteRequest):
+    """
+    Consulta a viabilidade de uma lista de endereços em uma única requisição.
+
+    Os endereços são resolvidos em conjunto no banco, bem mais rápido do que
+    uma chamada a `/consultar` por endereço.
+
+    ## Corpo
+    ```json
+    {"itens": [{"cep": "60876672", "numero": "144"}, {"cep": "60876-672", "numero": 146}]}
+    ```
+
+    ## Resposta
+    - **total**: Número de itens consultados
+    - **encontrados**: Quantos foram encontrados
+    - **resultados**: Um resultado por item, na ordem da requisição, no mesmo
+      formato de `/consultar`
+    - **tempo_processamento**: Tempo gasto em segundos
+    """
+    logger.info(f"Consultando lote de {len(requisicao.itens)} endereços")
+    return await executar_estatisticas(endereco_service.consultar_lote, requisicao.itens)
 
 
 @app.post(
     "/upload",
-    response_model=UploadResponse,
+    response_model=JobCargaResponse,
+    status_code=202,
     tags=["Upload"],
     summary="Upload de planilha Excel"
 )
 async def upload_planilha(
-    file: UploadFile = File(..., description="Arquivo Excel (.xlsx) com os endereços")
+    file: UploadFile = File(..., description="Arquivo Excel (.xlsx) com os endereços"),
+    modo: str = Query(
+        "completa",
+        pattern="^(completa|incremental)$",
+        description="completa: substitui todos os dados; incremental: aplica só as mudanças"
+    )
 ):
     """
     Faz upload de uma planilha Excel com dados de endereços.
@@ -190,15 +544,23 @@ async def upload_planilha(
     14. TOTAL_HPS
 
     ## Comportamento
-    - Remove todos os dados antigos do banco
-    - Processa todas as abas da planilha
-    - Insere os novos dados
+    - Salva a planilha e responde na hora com o job da carga (HTTP 202);
+      a carga roda em segundo plano
+    - Acompanhe com `GET /upload/jobs/{job_id}` (ou `/eventos`, via SSE)
+      e cancele com `DELETE /upload/jobs/{job_id}`
+    - Lê todas as abas da planilha em streaming, em lotes de `INGEST_BATCH_SIZE` linhas
+    - Monta a nova carga separada da atual e troca as duas de uma vez: se a
+      planilha tiver algum erro ou a carga for cancelada, os dados anteriores
+      são mantidos
+    - Só uma carga roda por vez (HTTP 409 se já houver outra em andamento)
+    - Com `modo=incremental`, abas iguais às da última carga são ignoradas e
+      as demais são comparadas com o banco pela chave natural (CEP, número e
+      complementos); só as inserções, atualizações e remoções são aplicadas,
+      em uma única transação
 
     ## Resposta
-    - **sucesso**: Se o upload foi bem-sucedido
-    - **mensagem**: Mensagem sobre o resultado
-    - **registros_inseridos**: Quantidade de registros inseridos
-    - **tempo_processamento**: Tempo gasto em segundos
+    Estado do job: `job_id`, `estado`, `fase`, registros lidos e inseridos,
+    vazão e tempo restante estimado.
     """
     # Validar extensão do arquivo
     if not file.filename.endswith('.xlsx'):
@@ -207,37 +569,266 @@ async def upload_planilha(
             detail="Arquivo inválido. Apenas arquivos .xlsx são aceitos."
         )
 
-    # Salvar arquivo temporário
-    upload_dir = Path(__file__).parent.parent / "data" / "uploads"
+    # Recusar antes de salvar o arquivo se já houver uma carga em andamento
+    ativo = job_manager.ativo()
+    if ativo is not None:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Já existe uma carga em andamento (job {ativo.id})"
+        )
+
+    # Salvar arquivo temporário com nome único: o nome enviado pelo cliente
+    # não é usado no caminho, e uploads simultâneos não se sobrescrevem
+    upload_dir = db.db_path.parent / "uploads"
     upload_dir.mkdir(parents=True, exist_ok=True)
 
-    temp_file_path = upload_dir / file.filename
+    temp_file_path = upload_dir / f"{uuid.uuid4().hex}.xlsx"
 
-    try:
+    def salvar_e_agendar():
         logger.info(f"Salvando arquivo: {file.filename}")
 
-        # Salvar arquivo
-        with temp_file_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        logger.info(f"Arquivo salvo em: {temp_file_path}")
+        try:
+            with temp_file_path.open("wb") as buffer:
+                shutil.copyfileobj(file.file, buffer)
 
-        # Processar planilha
-        resultado = endereco_service.upload_planilha(temp_file_path)
+            logger.info(f"Arquivo salvo em: {temp_file_path}")
 
-        return resultado
+            # Processar planilha em segundo plano, na thread de escrita; o
+            # job remove o arquivo quando terminar
+            return job_manager.iniciar(temp_file_path, modo, nome=file.filename)
+        except BaseException:
+            temp_file_path.unlink(missing_ok=True)
+            raise
 
+    try:
+        job = await executar_estatisticas(salvar_e_agendar)
+    except IngestaoEmAndamento as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         logger.error(f"Erro ao fazer upload: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail=f"Erro ao processar arquivo: {str(e)}"
         )
-    finally:
-        # Limpar arquivo temporário (opcional - você pode querer manter)
-        # if temp_file_path.exists():
-        #     temp_file_path.unlink()
-        pass
+
+    return job.to_dict()
+
+
+def _obter_job(job_id: str) -> IngestJob:
+    """Retorna o job ou responde 404."""
+    job = job_manager.obter(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job não encontrado: {job_id}")
+    return job
+
+
+@app.get(
+    "/upload/jobs",
+    response_model=List[JobCargaResponse],
+    tags=["Upload"],
+    summary="Listar cargas de planilha"
+)
+async def listar_jobs():
+    """
+    Lista as cargas de planilha recentes, da mais nova para a mais antiga.
+    """
+    return job_manager.listar()
+
+
+@app.get(
+    "/upload/jobs/{job_id}",
+    response_model=JobCargaResponse,
+    tags=["Upload"],
+    summary="Progresso de uma carga de planilha"
+)
+async def status_job(job_id: str):
+    """
+    Retorna o estado de uma carga: fase, registros lidos e inseridos, vazão
+    (registros por segundo) e tempo restante estimado. Ao terminar, o campo
+    `resultado` traz o resultado da carga.
+    """
+    return _obter_job(job_id).to_dict()
+
+
+@app.get(
+    "/upload/jobs/{job_id}/eventos",
+    tags=["Upload"],
+    summary="Progresso de uma carga via Server-Sent Events",
+    response_class=StreamingResponse
+)
+async def eventos_job(
+    job_id: str,
+    intervalo: float = Query(1.0, ge=0.2, le=30, description="Intervalo entre eventos, em segundos")
+):
+    """
+    Envia o estado da carga como Server-Sent Events (`event: progresso`) a
+    cada `intervalo` segundos, terminando com `event: fim` quando a carga
+    termina.
+    """
+    job = _obter_job(job_id)
+
+    async def gerar():
+        while True:
+            estado = job.to_dict()
+            evento = "fim" if job.finalizado else "progresso"
+            yield f"event: {evento}\ndata: {json.dumps(estado, ensure_ascii=False)}\n\n"
+            if job.finalizado:
+                break
+            await asyncio.sleep(intervalo)
+
+    return StreamingResponse(
+        gerar(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
+@app.delete(
+    "/upload/jobs/{job_id}",
+    response_model=JobCargaResponse,
+    tags=["Upload"],
+    summary="Cancelar uma carga de planilha"
+)
+async def cancelar_job(job_id: str):
+    """
+    Cancela uma carga em andamento.
+
+    A leitura para no próximo lote e a carga parcial é descartada; os dados
+    atuais não mudam. Depois que a planilha foi toda lida (fases de
+    indexação e troca), a carga não pode mais ser cancelada.
+    """
+    job = _obter_job(job_id)
+    if not job.solicitar_cancelamento():
+        raise HTTPException(status_code=409, detail=f"O job já terminou ({job.estado})")
+    logger.warning(f"Cancelamento solicitado para o job {job_id}")
+    return job.to_dict()
+
+
+@app.post(
+    "/consultar/arquivo",
+    tags=["Consultas"],
+    summary="Verificar viabilidade de um arquivo CSV de endereços",
+    response_class=StreamingResponse
+)
+async def consultar_arquivo(
+    file: UploadFile = File(..., description="Arquivo CSV com as colunas cep e numero"),
+    formato: str = Query(
+        "ndjson",
+        pattern="^(ndjson|csv)$",
+        description="Formato da resposta: ndjson (um JSON por linha) ou csv"
+    )
+):
+    """
+    Verifica a viabilidade de todos os endereços de um arquivo CSV.
+
+    O arquivo é lido e consultado em blocos, e os resultados são enviados à
+    medida que ficam prontos, então arquivos com milhões de linhas não
+    ocupam mais memória do que um bloco.
+
+    ## Formato esperado do arquivo
+    - CSV em UTF-8, separado por vírgula ou ponto e vírgula
+    - Cabeçalho com as colunas `cep` e `numero` (ou `n_fachada`); as demais
+      colunas são ignoradas
+
+    ## Resposta
+    Uma linha por endereço, na ordem do arquivo, com o número da linha
+    original, o CEP e o número informados, `encontrado`, `viabilidade`, os
+    detalhes do endereço e a mensagem.
+    """
+    # O UploadFile é fechado ao fim do endpoint, antes do envio da resposta:
+    # a resposta lê de uma cópia temporária própria, em disco
+    def copiar_e_abrir():
+        copia = tempfile.TemporaryFile()
+        shutil.copyfileobj(file.file, copia)
+        copia.seek(0)
+        try:
+            return copia, ler_csv_enderecos(copia)
+        except Exception:
+            copia.close()
+            raise
+
+    try:
+        copia, linhas = await executar_estatisticas(copiar_e_abrir)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Arquivo inválido: {str(e)}")
+
+    logger.info(f"Verificando arquivo: {file.filename} (formato={formato})")
+    blocos = endereco_service.verificar_arquivo(linhas, formato)
+
+    async def gerar():
+        try:
+            # Cada bloco é lido e consultado fora do event loop
+            while True:
+                bloco = await executar_estatisticas(next, blocos, None)
+                if bloco is None:
+                    break
+                yield bloco
+        finally:
+            copia.close()
+
+    if formato == "csv":
+        return StreamingResponse(
+            gerar(),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": 'attachment; filename="viabilidade.csv"'}
+        )
+    return StreamingResponse(gerar(), media_type="application/x-ndjson")
+
+
+@app.get(
+    "/exportar",
+    tags=["Admin"],
+    summary="Exportar o conjunto de dados (CSV ou NDJSON)",
+    response_class=StreamingResponse
+)
+async def exportar(
+    formato: str = Query(
+        "csv",
+        pattern="^(ndjson|csv)$",
+        description="Formato: csv (com cabeçalho) ou ndjson (um JSON por linha)"
+    ),
+    uf: Optional[str] = Query(None, description="Exporta só esta UF", example="CE"),
+    municipio: Optional[str] = Query(None, description="Exporta só este município", example="FORTALEZA"),
+    viabilidade: Optional[str] = Query(None, description="Exporta só esta viabilidade", example="Viável")
+):
+    """
+    Exporta todos os endereços, ou o recorte filtrado por UF, município e/ou
+    viabilidade, com as mesmas colunas da planilha.
+
+    A tabela é percorrida em blocos de `EXPORT_CHUNK_SIZE` linhas, cada um em
+    uma transação de leitura curta, e cada bloco é enviado assim que lido: a
+    memória usada é constante e a exportação não atrasa as recargas. Se os
+    dados forem recarregados durante a exportação, a resposta é interrompida
+    (arquivo incompleto) e a exportação deve ser repetida.
+
+    ## Exemplo
+    ```
+    GET /exportar?formato=csv&uf=CE&viabilidade=Viável
+    ```
+    """
+    filtros = {'uf': uf, 'municipio': municipio, 'viabilidade_atual': viabilidade}
+    logger.info(f"Exportando dados (formato={formato}, filtros={filtros})")
+    blocos = endereco_service.exportar(formato, filtros)
+
+    async def gerar():
+        # Cada bloco é lido fora do event loop
+        while True:
+            bloco = await executar_estatisticas(next, blocos, None)
+            if bloco is None:
+                break
+            yield bloco
+
+    if formato == "csv":
+        return StreamingResponse(
+            gerar(),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": 'attachment; filename="enderecos.csv"'}
+        )
+    return StreamingResponse(
+        gerar(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="enderecos.ndjson"'}
+    )
 
 
 @app.delete(
@@ -254,7 +845,7 @@ async def limpar_banco():
     Use este endpoint quando quiser recarregar uma nova planilha do zero.
     """
     logger.warning("Limpando banco de dados...")
-    resultado = endereco_service.limpar_banco()
+    resultado = await executar_escrita(endereco_service.limpar_banco)
 
     if resultado["sucesso"]:
         return JSONResponse(
@@ -268,6 +859,79 @@ async def limpar_banco():
         )
 
 
+@app.get(
+    "/admin/indice-memoria",
+    tags=["Admin"],
+    summary="Status do índice em memória"
+)
+async def status_indice_memoria():
+    """
+    Retorna o estado do índice de consulta em memória.
+
+    Inclui se está ativo (`MEMORY_INDEX_ENABLED`), quantos registros foram
+    carregados e a memória ocupada. Com o índice desativado ou ainda não
+    carregado, as consultas são feitas no SQLite.
+    """
+    return memory_index.status()
+
+
+@app.get(
+    "/admin/cache",
+    tags=["Admin"],
+    summary="Estatísticas do cache de consultas"
+)
+async def status_cache():
+    """
+    Retorna os contadores do cache de consultas.
+
+    Inclui acertos (hits), faltas (misses), remoções por falta de espaço
+    (evictions), expirações e invalidações. O cache é descartado sempre que a
+    geração do conjunto de dados muda (upload ou limpeza).
+    """
+    return {
+        **lookup_cache.stats(),
+        'geracao_dataset': db.get_generation()
+    }
+
+
+@app.get(
+    "/admin/cargas",
+    tags=["Admin"],
+    summary="Carga de dados atual e anterior"
+)
+async def status_cargas():
+    """
+    Retorna o número de registros da carga atual e da anterior.
+
+    Cada upload monta a nova carga em uma tabela separada e a troca pela
+    atual de uma vez; a carga substituída é mantida até o próximo upload e
+    pode ser restaurada com `POST /admin/rollback`.
+    """
+    return await executar_estatisticas(db.info_cargas)
+
+
+@app.post(
+    "/admin/rollback",
+    tags=["Admin"],
+    summary="Restaurar a carga anterior"
+)
+async def restaurar_carga_anterior():
+    """
+    Volta para a carga de dados anterior ao último upload.
+
+    A troca é instantânea e pode ser desfeita chamando o endpoint de novo.
+    """
+    logger.warning("Restaurando carga anterior...")
+    resultado = await executar_escrita(endereco_service.restaurar_carga_anterior)
+
+    if resultado["sucesso"]:
+        return resultado
+    raise HTTPException(
+        status_code=409,
+        detail=resultado["mensagem"]
+    )
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     """
@@ -283,21 +947,6 @@ async def global_exception_handler(request, exc):
     )
 
 
-# Evento de inicialização
-@app.on_event("startup")
-async def startup_event():
-    """Executado quando a API inicia."""
-    logger.info("=== API de Consulta de Viabilidade Iniciada ===")
-    logger.info("Documentação disponível em: /docs")
-
-
-# Evento de finalização
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Executado quando a API é desligada."""
-    logger.info("=== API Finalizada ===")
-
-
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
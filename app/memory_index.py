@@ -0,0 +1,316 @@
+"""
+Índice compacto em memória para a consulta de viabilidade.
+
+Entre uploads a base é somente leitura, então a tabela ``enderecos`` pode ser
+carregada inteira em memória e consultada sem SQL. Para caber no plano
+gratuito do Render, os dados ficam em colunas ``array`` em vez de um dict por
+linha:
+
+- o CEP é guardado como inteiro, com as linhas ordenadas por CEP, e a busca
+  é uma bissecção seguida de uma varredura curta dentro do CEP;
+- as colunas de texto são codificadas por dicionário: cada linha guarda só
+  o código do valor, com o menor tipo inteiro que comporta a cardinalidade.
+
+O índice é reconstruído em paralelo e trocado de uma vez (troca de
+referência), então as consultas sempre veem um índice completo. Cada índice
+guarda a geração dos dados de que foi lido e só é usado nessa geração: depois
+de uma alteração (deste ou de outro processo), as consultas vão para o SQLite
+até o índice ser recarregado. Quando desativado ou ainda não carregado, as
+consultas também vão para o SQLite.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+import logging
+import sys
+import threading
+import time
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Colunas de texto codificadas por dicionário
+COLUNAS_TEXTO = (
+    'viabilidade_atual', 'uf', 'municipio', 'localidade', 'bairro',
+    'logradouro', 'cod_logradouro', 'n_fachada', 'comp_1', 'comp_2',
+    'comp_3', 'regiao'
+)
+
+# Sentinela para total_hps nulo
+_HPS_NULO = -2 ** 31
+
+
+def _compactar(codigos: array, cardinalidade: int) -> array:
+    """Converte um array de códigos para o menor tipo inteiro suficiente."""
+    if cardinalidade <= 0xFF:
+        tipo = 'B'
+    elif cardinalidade <= 0xFFFF:
+        tipo = 'H'
+    else:
+        return codigos
+    return array(tipo, codigos)
+
+
+class CompactIndex:
+    """Dados da tabela ``enderecos`` em formato colunar e compacto."""
+
+    __slots__ = ('ceps', 'codigos', 'valores', 'total_hps', 'codigo_fachada', 'registros', 'geracao')
+
+    def __init__(self):
+        self.ceps = array('I')
+        self.codigos: Dict[str, array] = {coluna: array('I') for coluna in COLUNAS_TEXTO}
+        # Código 0 representa None
+        self.valores: Dict[str, List[Optional[str]]] = {coluna: [None] for coluna in COLUNAS_TEXTO}
+        self.total_hps = array('i')
+        self.codigo_fachada: Dict[str, int] = {}
+        self.registros = 0
+        # Geração do conjunto de dados lido (ver Database.get_generation)
+        self.geracao = 0
+
+    @classmethod
+    def construir(cls, linhas) -> "CompactIndex":
+        """
+        Constrói o índice a partir de linhas ordenadas por (cep, n_fachada).
+
+        Linhas com CEP que não tem 8 dígitos são ignoradas, já que nunca
+        seriam encontradas por uma consulta válida.
+
+        Args:
+            linhas: Iterável de linhas com as colunas da tabela enderecos
+
+        Returns:
+            CompactIndex preenchido
+        """
+        indice = cls()
+        mapas: Dict[str, Dict[str, int]] = {coluna: {} for coluna in COLUNAS_TEXTO}
+
+        for linha in linhas:
+            cep = linha['cep']
+            if not cep or len(cep) != 8 or not cep.isdigit():
+                continue
+
+            indice.ceps.append(int(cep))
+            for coluna in COLUNAS_TEXTO:
+                valor = linha[coluna]
+                if valor is None:
+                    codigo = 0
+                else:
+                    valor = str(valor).strip() if coluna == 'n_fachada' else str(valor)
+                    mapa = mapas[coluna]
+                    codigo = mapa.get(valor)
+                    if codigo is None:
+                        codigo = len(indice.valores[coluna])
+                        mapa[valor] = codigo
+                        indice.valores[coluna].append(valor)
+                indice.codigos[coluna].append(codigo)
+
+            hps = linha['total_hps']
+            indice.total_hps.append(_HPS_NULO if hps is None else int(hps))
+
+        for coluna in COLUNAS_TEXTO:
+            indice.codigos[coluna] = _compactar(indice.codigos[coluna], len(indice.valores[coluna]))
+
+        # Só o dicionário da fachada é necessário na consulta
+        indice.codigo_fachada = mapas['n_fachada']
+        indice.registros = len(indice.ceps)
+        return indice
+
+    def _linha(self, posicao: int) -> Dict[str, Any]:
+        """Decodifica uma linha do índice para o formato da tabela."""
+        linha: Dict[str, Any] = {
+            coluna: self.valores[coluna][self.codigos[coluna][posicao]]
+            for coluna in COLUNAS_TEXTO
+        }
+        linha['cep'] = f"{self.ceps[posicao]:08d}"
+        hps = self.total_hps[posicao]
+        linha['total_hps'] = None if hps == _HPS_NULO else hps
+        return linha
+
+    def buscar(self, cep: str, n_fachada: str) -> Optional[Dict[str, Any]]:
+        """
+        Busca um endereço pelo CEP e número da fachada.
+
+        Args:
+            cep: CEP normalizado (8 dígitos)
+            n_fachada: Número da fachada normalizado
+
+        Returns:
+            Dicionário com dados do endereço ou None se não encontrado
+        """
+        if len(cep) != 8 or not cep.isdigit():
+            return None
+        codigo = self.codigo_fachada.get(n_fachada)
+        if codigo is None:
+            return None
+
+        cep_int = int(cep)
+        inicio = bisect_left(self.ceps, cep_int)
+        fim = bisect_right(self.ceps, cep_int, inicio)
+        fachadas = self.codigos['n_fachada']
+        for posicao in range(inicio, fim):
+            if fachadas[posicao] == codigo:
+                return self._linha(posicao)
+        return None
+
+    def memoria_bytes(self) -> int:
+        """Estimativa da memória ocupada pelo índice, em bytes."""
+        total = sys.getsizeof(self.ceps) + sys.getsizeof(self.total_hps)
+        for coluna in COLUNAS_TEXTO:
+            total += sys.getsizeof(self.codigos[coluna])
+            valores = self.valores[coluna]
+            total += sys.getsizeof(valores) + sum(sys.getsizeof(v) for v in valores if v is not None)
+        total += sys.getsizeof(self.codigo_fachada)
+        return total
+
+
+class MemoryIndex:
+    """Backend de consulta em memória, recarregado a cada upload."""
+
+    def __init__(self, ativo: bool = False):
+        """
+        Args:
+            ativo: Se o backend em memória está habilitado
+        """
+        self.ativo = ativo
+        self._indice: Optional[CompactIndex] = None
+        self._lock_carga = threading.Lock()
+        self._lock_agendamento = threading.Lock()
+        self._recarga_agendada = False
+        self._tempo_carga: Optional[float] = None
+        self._carregado_em: Optional[str] = None
+
+    @property
+    def carregado(self) -> bool:
+        """True se o backend está ativo e com um índice carregado."""
+        return self.ativo and self._indice is not None
+
+    def indice_da_geracao(self, geracao: int) -> Optional[CompactIndex]:
+        """
+        Índice lido na geração informada, ou None se não houver.
+
+        Quem consulta deve guardar a referência e chamar ``buscar`` nela, em
+        vez de checar ``carregado`` antes: o índice pode ser descartado ou
+        trocado entre as duas chamadas.
+
+        Args:
+            geracao: Geração atual do conjunto de dados
+
+        Returns:
+            Índice a usar, ou None se o backend está desativado, sem índice
+            ou com um índice de outra geração
+        """
+        indice = self._indice if self.ativo else None
+        if indice is None or indice.geracao != geracao:
+            return None
+        return indice
+
+    def defasado(self, geracao: int) -> bool:
+        """True se há um índice carregado, mas de uma geração diferente da informada."""
+        indice = self._indice if self.ativo else None
+        return indice is not None and indice.geracao != geracao
+
+    def descartar(self):
+        """
+        Descarta o índice carregado, liberando a memória antes de montar o novo.
+
+        As consultas vão para o SQLite até a próxima recarga.
+        """
+        self._indice = None
+
+    def agendar_recarga(self, database):
+        """
+        Descarta o índice e o recarrega em uma thread, se ainda não agendado.
+
+        Usado quando os dados foram alterados por outro processo, que não
+        recarrega o índice deste.
+
+        Args:
+            database: Instância de Database de onde ler os endereços
+        """
+        with self._lock_agendamento:
+            if self._recarga_agendada:
+                return
+            self._recarga_agendada = True
+
+        def recarregar():
+            try:
+                if self.defasado(database.get_generation()):
+                    self.descartar()
+                self.recarregar(database)
+            except Exception as e:
+                logger.error(f"Erro ao recarregar índice em memória: {str(e)}")
+            finally:
+                with self._lock_agendamento:
+                    self._recarga_agendada = False
+
+        threading.Thread(target=recarregar, name="recarga-indice", daemon=True).start()
+
+    def recarregar(self, database) -> bool:
+        """
+        Reconstrói o índice a partir do banco e o troca atomicamente.
+
+        As consultas continuam usando o índice anterior (ou o SQLite) até a
+        troca. Recargas simultâneas são serializadas, e uma recarga que
+        encontra o índice já na geração atual não lê o banco de novo.
+
+        Args:
+            database: Instância de Database de onde ler os endereços
+
+        Returns:
+            True se o índice foi recarregado, False se o backend está desativado
+        """
+        if not self.ativo:
+            return False
+
+        with self._lock_carga:
+            atual = self._indice
+            if atual is not None and atual.geracao == database.get_generation():
+                return True
+
+            inicio = time.time()
+            with database.read_connection() as conn:
+                # Geração e endereços lidos no mesmo snapshot
+                conn.execute("BEGIN")
+                geracao = conn.execute(
+                    "SELECT valor FROM dataset_meta WHERE chave = 'geracao'"
+                ).fetchone()
+                cursor = conn.execute("""
+                    SELECT viabilidade_atual, uf, municipio, localidade, bairro,
+                           logradouro, cod_logradouro, n_fachada, comp_1, comp_2,
+                           comp_3, regiao, cep, total_hps
+                    FROM enderecos
+                    ORDER BY cep, n_fachada, id
+                """)
+                novo = CompactIndex.construir(cursor)
+                novo.geracao = int(geracao['valor']) if geracao else 0
+
+            # Troca de referência: atômica para as threads de consulta
+            self._indice = novo
+            self._tempo_carga = round(time.time() - inicio, 2)
+            self._carregado_em = datetime.now(timezone.utc).isoformat()
+
+        logger.info(
+            f"Índice em memória carregado: {novo.registros} registros, "
+            f"{novo.memoria_bytes() / 1024 / 1024:.1f} MB em {self._tempo_carga}s"
+        )
+        return True
+
+    def status(self) -> Dict[str, Any]:
+        """Retorna o estado do índice e o seu consumo de memória."""
+        indice = self._indice
+        memoria = indice.memoria_bytes() if indice else 0
+        return {
+            'ativo': self.ativo,
+            'carregado': indice is not None,
+            'registros': indice.registros if indice else 0,
+            'memoria_bytes': memoria,
+            'memoria_mb': round(memoria / 1024 / 1024, 2),
+            'tempo_carga_s': self._tempo_carga,
+            'carregado_em': self._carregado_em,
+        }
+
+
+# Instância global do índice em memória
+memory_index = MemoryIndex(ativo=settings.memory_index_enabled)
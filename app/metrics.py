@@ -0,0 +1,296 @@
+"""
+Métricas da API no formato de exposição de texto do Prometheus (``/metrics``).
+
+Contadores e histogramas simples, em memória e por processo, sem dependência
+externa. Registrar uma observação custa um ``bisect`` e uma soma sob um lock,
+então as métricas podem ficar no caminho das consultas. Valores que já
+existem em outro lugar (total de registros, geração, acertos do cache) são
+lidos só quando ``/metrics`` é chamado, por funções registradas com
+``registrar_medidor``.
+
+Com vários workers (gunicorn), cada processo expõe as próprias métricas.
+"""
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import threading
+import time
+
+# Limites dos histogramas de latência, em segundos
+BUCKETS_LATENCIA = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+# Limites do histograma de duração das cargas, em segundos
+BUCKETS_CARGA = (1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1200.0, 1800.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _formatar_labels(nomes: Sequence[str], valores: Sequence[str], extra: str = "") -> str:
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _formatar_numero(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Contador:
+    """Contador monotônico, com labels, incrementado com ``inc`` ou lido de uma função."""
+
+    def __init__(
+        self,
+        nome: str,
+        ajuda: str,
+        labels: Sequence[str] = (),
+        funcao: Optional[Callable[[], Iterable[Tuple[Tuple[str, ...], float]]]] = None
+    ):
+        """
+        Args:
+            nome: Nome da métrica
+            ajuda: Descrição
+            labels: Nomes dos labels
+            funcao: Se informada, chamada a cada exposição; retorna pares
+                (valores dos labels, valor) de um contador mantido em outro lugar
+        """
+        self.nome = nome
+        self.ajuda = ajuda
+        self.labels = tuple(labels)
+        self.funcao = funcao
+        self._valores: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, valor: float = 1):
+        """Soma ``valor`` ao contador dos labels informados."""
+        with self._lock:
+            self._valores[labels] = self._valores.get(labels, 0) + valor
+
+    def expor(self) -> List[str]:
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} counter"]
+        if self.funcao is not None:
+            valores = sorted(self.funcao())
+        else:
+            with self._lock:
+                valores = sorted(self._valores.items())
+        for labels, valor in valores:
+            linhas.append(f"{self.nome}{_formatar_labels(self.labels, labels)} {_formatar_numero(valor)}")
+        return linhas
+
+
+class Histograma:
+    """Histograma com limites fixos, com labels."""
+
+    def __init__(self, nome: str, ajuda: str, labels: Sequence[str] = (), buckets: Sequence[float] = BUCKETS_LATENCIA):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [contagem por bucket (não acumulada) + excedentes, soma]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float, *labels: str):
+        """Registra uma observação nos labels informados."""
+        indice = bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(labels)
+            if serie is None:
+                serie = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][indice] += 1
+            serie[1] += valor
+
+    def expor(self) -> List[str]:
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} histogram"]
+        with self._lock:
+            series = sorted((labels, list(contagens), soma) for labels, (contagens, soma) in self._series.items())
+        for labels, contagens, soma in series:
+            acumulado = 0
+            for limite, contagem in zip(self.buckets + (float("inf"),), contagens):
+                acumulado += contagem
+                le = f'le="{_formatar_numero(limite)}"'
+                linhas.append(f"{self.nome}_bucket{_formatar_labels(self.labels, labels, le)} {acumulado}")
+            sufixo = _formatar_labels(self.labels, labels)
+            linhas.append(f"{self.nome}_sum{sufixo} {_formatar_numero(soma)}")
+            linhas.append(f"{self.nome}_count{sufixo} {acumulado}")
+        return linhas
+
+
+class Medidor:
+    """Valor instantâneo (gauge), definido com ``set`` ou lido de uma função."""
+
+    def __init__(
+        self,
+        nome: str,
+        ajuda: str,
+        labels: Sequence[str] = (),
+        funcao: Optional[Callable[[], Iterable[Tuple[Tuple[str, ...], float]]]] = None
+    ):
+        """
+        Args:
+            nome: Nome da métrica
+            ajuda: Descrição
+            labels: Nomes dos labels
+            funcao: Se informada, chamada a cada exposição; retorna pares
+                (valores dos labels, valor)
+        """
+        self.nome = nome
+        self.ajuda = ajuda
+        self.labels = tuple(labels)
+        self.funcao = funcao
+        self._valores: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, valor: float, *labels: str):
+        """Define o valor do medidor nos labels informados."""
+        with self._lock:
+            self._valores[labels] = valor
+
+    def expor(self) -> List[str]:
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} gauge"]
+        if self.funcao is not None:
+            valores = sorted(self.funcao())
+        else:
+            with self._lock:
+                valores = sorted(self._valores.items())
+        for labels, valor in valores:
+            linhas.append(f"{self.nome}{_formatar_labels(self.labels, labels)} {_formatar_numero(valor)}")
+        return linhas
+
+
+class RegistroMetricas:
+    """Conjunto das métricas expostas em ``/metrics``."""
+
+    def __init__(self):
+        self._metricas: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, metrica):
+        """Registra uma métrica (substitui outra de mesmo nome) e a retorna."""
+        with self._lock:
+            self._metricas[metrica.nome] = metrica
+        return metrica
+
+    def registrar_medidor(
+        self,
+        nome: str,
+        ajuda: str,
+        funcao: Callable[[], float],
+    ) -> Medidor:
+        """Registra um medidor sem labels cujo valor é lido de ``funcao`` a cada exposição."""
+        return self.registrar(Medidor(nome, ajuda, funcao=lambda: [((), funcao())]))
+
+    def expor(self) -> str:
+        """Texto de todas as métricas no formato de exposição do Prometheus."""
+        with self._lock:
+            metricas = list(self._metricas.values())
+        linhas: List[str] = []
+        for metrica in metricas:
+            try:
+                linhas.extend(metrica.expor())
+            except Exception:
+                # Um medidor que falha (ex.: banco indisponível) não derruba os demais
+                continue
+        return "\n".join(linhas) + "\n"
+
+
+# Registro global e métricas da aplicação
+metricas = RegistroMetricas()
+
+REQUISICOES = metricas.registrar(Contador(
+    "http_requests_total", "Requisições HTTP atendidas", ("method", "endpoint", "status")
+))
+LATENCIA_REQUISICOES = metricas.registrar(Histograma(
+    "http_request_duration_seconds", "Duração das requisições HTTP", ("method", "endpoint")
+))
+LATENCIA_BANCO = metricas.registrar(Histograma(
+    "db_query_duration_seconds", "Duração das operações no banco, por tipo", ("tipo",)
+))
+CONSULTAS = metricas.registrar(Contador(
+    "lookups_total", "Endereços consultados, por resultado", ("resultado",)
+))
+LINHAS_CARGA = metricas.registrar(Contador(
+    "ingest_rows_total", "Linhas gravadas pelas cargas de planilha", ("modo",)
+))
+DURACAO_CARGA = metricas.registrar(Histograma(
+    "ingest_duration_seconds", "Duração das cargas de planilha concluídas", ("modo",), BUCKETS_CARGA
+))
+VAZAO_CARGA = metricas.registrar(Medidor(
+    "ingest_last_rows_per_second", "Linhas por segundo da última carga concluída", ("modo",)
+))
+FASES_INICIALIZACAO = metricas.registrar(Medidor(
+    "startup_phase_seconds", "Duração das fases da inicialização do processo", ("fase",)
+))
+
+
+def medir_banco(tipo: str):
+    """
+    Decorator que registra a duração de um método do banco em ``db_query_duration_seconds``.
+
+    Args:
+        tipo: Valor do label ``tipo`` (ex.: "consulta", "carga_completa")
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                LATENCIA_BANCO.observar(time.perf_counter() - inicio, tipo)
+        return wrapper
+    return decorator
+
+
+def registrar_carga(modo: str, registros: int, duracao: float):
+    """Registra uma carga de planilha concluída (linhas, duração e vazão)."""
+    LINHAS_CARGA.inc(modo, valor=registros)
+    DURACAO_CARGA.observar(duracao, modo)
+    if duracao > 0:
+        VAZAO_CARGA.set(round(registros / duracao, 1), modo)
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que conta e mede as requisições HTTP.
+
+    O label ``endpoint`` é o caminho da rota (``/upload/jobs/{job_id}``, não
+    o caminho com o id), o que mantém o número de séries limitado. Respostas
+    304 do ``ETagMiddleware`` não passam pelo roteamento e usam a rota que ele
+    grava em ``scope["rota_cache"]``; caminhos sem rota ficam como
+    "nao_roteado". ASGI puro em vez de
+    ``BaseHTTPMiddleware``, que acrescenta uma tarefa e filas a cada requisição.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        status = [500]
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start":
+                status[0] = mensagem["status"]
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            rota = scope.get("route")
+            endpoint = getattr(rota, "path", None) or scope.get("rota_cache") or "nao_roteado"
+            metodo = scope.get("method", "")
+            REQUISICOES.inc(metodo, endpoint, str(status[0]))
+            LATENCIA_REQUISICOES.observar(time.perf_counter() - inicio, metodo, endpoint)
@@ -0,0 +1,352 @@
+"""
+Migrações versionadas do esquema do banco de dados SQLite.
+
+Cada migração tem um número de versão e é aplicada uma única vez, dentro de
+uma transação. As versões já aplicadas ficam registradas na tabela
+``schema_version``, o que permite evoluir bancos existentes (como o
+``data/enderecos.db`` publicado no deploy) sem recarregar a planilha.
+
+Para adicionar uma migração, crie uma função decorada com ``@migracao``
+usando o próximo número de versão. Nunca altere migrações já publicadas.
+"""
+import sqlite3
+from datetime import datetime, timezone
+from typing import Callable, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Migrações registradas: (versão, descrição, função)
+MIGRACOES: List[Tuple[int, str, Callable[[sqlite3.Cursor], None]]] = []
+
+
+def migracao(versao: int, descricao: str):
+    """
+    Registra uma função como migração do esquema.
+
+    Args:
+        versao: Número da versão (sequencial, começando em 1)
+        descricao: Descrição curta da mudança
+    """
+    def decorator(func: Callable[[sqlite3.Cursor], None]):
+        MIGRACOES.append((versao, descricao, func))
+        MIGRACOES.sort(key=lambda m: m[0])
+        return func
+    return decorator
+
+
+@migracao(1, "Tabela enderecos e índices iniciais")
+def _v1_esquema_inicial(cursor: sqlite3.Cursor):
+    # IF NOT EXISTS: bancos criados antes das migrações já têm essas estruturas
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS enderecos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            viabilidade_atual TEXT,
+            uf TEXT,
+            municipio TEXT,
+            localidade TEXT,
+            bairro TEXT,
+            logradouro TEXT,
+            cod_logradouro TEXT,
+            n_fachada TEXT,
+            comp_1 TEXT,
+            comp_2 TEXT,
+            comp_3 TEXT,
+            regiao TEXT,
+            cep TEXT,
+            total_hps INTEGER
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cep_cod ON enderecos(cep, cod_logradouro)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cep ON enderecos(cep)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cod_logradouro ON enderecos(cod_logradouro)")
+
+
+@migracao(2, "Índice composto (cep, n_fachada) para a consulta principal")
+def _v2_indice_consulta(cursor: sqlite3.Cursor):
+    # A consulta principal filtra por cep E n_fachada: com o índice composto
+    # a busca é uma única descida na B-tree, sem varrer as linhas do CEP.
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cep_fachada ON enderecos(cep, n_fachada)")
+
+    # idx_cep é prefixo do novo índice; os demais não são usados por nenhuma
+    # consulta e só custam espaço e tempo de carga.
+    cursor.execute("DROP INDEX IF EXISTS idx_cep")
+    cursor.execute("DROP INDEX IF EXISTS idx_cep_cod")
+    cursor.execute("DROP INDEX IF EXISTS idx_cod_logradouro")
+
+
+@migracao(3, "Tabela dataset_meta com a geração do conjunto de dados")
+def _v3_dataset_meta(cursor: sqlite3.Cursor):
+    # Metadados do conjunto de dados carregado. A geração é incrementada a
+    # cada upload/limpeza e invalida os caches derivados dos dados.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS dataset_meta (
+            chave TEXT PRIMARY KEY,
+            valor TEXT
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO dataset_meta (chave, valor) VALUES ('geracao', '0')")
+
+
+@migracao(4, "Coluna aba nos endereços e hashes das abas para a carga incremental")
+def _v4_abas_planilha(cursor: sqlite3.Cursor):
+    # Cada endereço guarda a aba de origem, para que a carga incremental
+    # compare uma aba da planilha só com os endereços vindos dela. Cargas
+    # anteriores ficam com aba NULL e exigem uma carga completa.
+    for tabela in ("enderecos", "enderecos_anterior"):
+        existe = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (tabela,)
+        ).fetchone()
+        if existe:
+            cursor.execute(f"ALTER TABLE {tabela} ADD COLUMN aba TEXT")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_aba ON enderecos(aba)")
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS planilha_abas (
+            aba TEXT PRIMARY KEY,
+            hash_bruto TEXT,
+            hash_conteudo TEXT,
+            registros INTEGER,
+            atualizada_em TEXT
+        )
+    """)
+
+
+@migracao(5, "Estatísticas materializadas do conjunto de dados")
+def _v5_estatisticas(cursor: sqlite3.Cursor):
+    # Contagens por dimensão, recalculadas a cada carga (ver
+    # Database._recalcular_estatisticas), para que /health e /estatisticas
+    # não agreguem a tabela de endereços a cada chamada.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS estatisticas (
+            dimensao TEXT NOT NULL,
+            valor TEXT NOT NULL,
+            registros INTEGER NOT NULL,
+            PRIMARY KEY (dimensao, valor)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("INSERT INTO estatisticas VALUES ('total', '', (SELECT COUNT(*) FROM enderecos))")
+    cursor.execute("""
+        INSERT INTO estatisticas
+        SELECT 'viabilidade', COALESCE(viabilidade_atual, ''), COUNT(*)
+        FROM enderecos GROUP BY 1, 2
+    """)
+    cursor.execute("""
+        INSERT INTO estatisticas
+        SELECT 'municipio', COALESCE(municipio, ''), COUNT(*)
+        FROM enderecos GROUP BY 1, 2
+    """)
+    cursor.execute("""
+        INSERT OR REPLACE INTO dataset_meta (chave, valor)
+        VALUES ('estatisticas_em', strftime('%Y-%m-%dT%H:%M:%SZ', 'now'))
+    """)
+
+
+@migracao(6, "Tabelas do layout compacto (enderecos_compacto)")
+def _v6_layout_compacto(cursor: sqlite3.Cursor):
+    # Tabela derivada de enderecos para as consultas, agrupada pela chave de
+    # consulta e com os textos repetidos codificados (ver app/compact_storage.py).
+    # Só é preenchida com COMPACT_STORAGE_ENABLED=true.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS enderecos_compacto (
+            cep INTEGER NOT NULL,
+            n_fachada TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            viabilidade_atual INTEGER,
+            uf INTEGER,
+            municipio INTEGER,
+            localidade INTEGER,
+            bairro INTEGER,
+            logradouro INTEGER,
+            cod_logradouro INTEGER,
+            comp_1 INTEGER,
+            comp_2 INTEGER,
+            comp_3 INTEGER,
+            regiao INTEGER,
+            total_hps INTEGER,
+            PRIMARY KEY (cep, n_fachada, seq)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS enderecos_compacto_valores (
+            coluna TEXT NOT NULL,
+            codigo INTEGER NOT NULL,
+            valor TEXT NOT NULL,
+            PRIMARY KEY (coluna, codigo)
+        ) WITHOUT ROWID
+    """)
+
+
+@migracao(7, "Número da fachada numérico e índice para os números próximos")
+def _v7_numero_fachada(cursor: sqlite3.Cursor):
+    # n_fachada é texto ("144", "144A", "S/N"); a coluna gerada guarda a parte
+    # numérica inicial, para que os números vizinhos de um logradouro sejam
+    # encontrados por uma busca por faixa no índice. VIRTUAL: não ocupa espaço
+    # na tabela, só no índice. Como fica no CREATE TABLE, a tabela sombra da
+    # carga blue/green já nasce com ela.
+    for tabela in ("enderecos", "enderecos_anterior"):
+        existe = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (tabela,)
+        ).fetchone()
+        if existe:
+            cursor.execute(f"""
+                ALTER TABLE {tabela} ADD COLUMN n_fachada_num INTEGER
+                GENERATED ALWAYS AS (
+                    CASE WHEN n_fachada GLOB '[0-9]*' THEN CAST(n_fachada AS INTEGER) END
+                ) VIRTUAL
+            """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_logradouro_numero
+        ON enderecos(cep, cod_logradouro, n_fachada_num)
+    """)
+
+
+@migracao(8, "Índice para a listagem de endereços por logradouro")
+def _v8_listagem_logradouro(cursor: sqlite3.Cursor):
+    # Listagem paginada por cursor (keyset): cada página é uma busca por faixa
+    # em (cod_logradouro, cep, número), sem OFFSET. Números sem parte numérica
+    # ("S/N") entram como -1, antes dos demais, para que a chave nunca seja NULL.
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_logradouro_listagem
+        ON enderecos(cod_logradouro, cep, IFNULL(n_fachada_num, -1))
+    """)
+
+
+@migracao(9, "Trechos de logradouro e índice FTS5 para a busca por texto")
+def _v9_busca_texto(cursor: sqlite3.Cursor):
+    # Derivadas de enderecos e preenchidas na inicialização e a cada carga
+    # (ver app/search.py). Sem FTS5 no SQLite, a busca fica indisponível.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS logradouros (
+            id INTEGER PRIMARY KEY,
+            cep TEXT,
+            cod_logradouro TEXT,
+            logradouro TEXT,
+            bairro TEXT,
+            localidade TEXT,
+            municipio TEXT,
+            uf TEXT,
+            registros INTEGER
+        )
+    """)
+    try:
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS logradouros_fts USING fts5(
+                logradouro, bairro, localidade, municipio,
+                content='logradouros',
+                content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        logger.warning(f"FTS5 indisponível, busca por texto desativada: {str(e)}")
+
+
+@migracao(10, "Índice dos trechos de logradouro pela chave do trecho")
+def _v10_chave_logradouros(cursor: sqlite3.Cursor):
+    # Inserções avulsas atualizam só os trechos que tocaram (ver
+    # search.atualizar_indice), procurando cada trecho pela chave
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_logradouros_chave
+        ON logradouros(cep, cod_logradouro, logradouro, bairro, localidade, municipio, uf)
+    """)
+
+
+def _criar_tabela_versao(conn: sqlite3.Connection):
+    """Cria a tabela de controle de versões se não existir."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            versao INTEGER PRIMARY KEY,
+            descricao TEXT,
+            aplicada_em TEXT
+        )
+    """)
+    conn.commit()
+
+
+def versao_atual(conn: sqlite3.Connection) -> int:
+    """
+    Retorna a versão atual do esquema.
+
+    Args:
+        conn: Conexão com o banco
+
+    Returns:
+        Maior versão aplicada (0 se nenhuma)
+    """
+    _criar_tabela_versao(conn)
+    row = conn.execute("SELECT MAX(versao) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def versao_mais_recente() -> int:
+    """Retorna a versão da última migração registrada."""
+    return MIGRACOES[-1][0] if MIGRACOES else 0
+
+
+def migracoes_pendentes(conn: sqlite3.Connection) -> List[Tuple[int, str]]:
+    """
+    Lista as migrações ainda não aplicadas.
+
+    Args:
+        conn: Conexão com o banco
+
+    Returns:
+        Lista de (versão, descrição)
+    """
+    atual = versao_atual(conn)
+    return [(versao, descricao) for versao, descricao, _ in MIGRACOES if versao > atual]
+
+
+def aplicar_migracoes(conn: sqlite3.Connection, ate: Optional[int] = None) -> List[int]:
+    """
+    Aplica as migrações pendentes, cada uma em sua própria transação.
+
+    Seguro para ser chamado em toda inicialização: se o esquema já estiver
+    atualizado, nada é feito.
+
+    Args:
+        conn: Conexão com o banco
+        ate: Versão máxima a aplicar (None aplica todas)
+
+    Returns:
+        Lista das versões aplicadas
+    """
+    atual = versao_atual(conn)
+    aplicadas = []
+
+    for versao, descricao, func in MIGRACOES:
+        if versao <= atual:
+            continue
+        if ate is not None and versao > ate:
+            break
+
+        cursor = conn.cursor()
+        # BEGIN IMMEDIATE serializa processos iniciando ao mesmo tempo;
+        # a versão é conferida de novo já com o lock de escrita
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            row = cursor.execute(
+                "SELECT 1 FROM schema_version WHERE versao = ?", (versao,)
+            ).fetchone()
+            if row:
+                conn.rollback()
+                continue
+
+            logger.info(f"Aplicando migração {versao}: {descricao}")
+            func(cursor)
+            cursor.execute(
+                "INSERT INTO schema_version (versao, descricao, aplicada_em) VALUES (?, ?, ?)",
+                (versao, descricao, datetime.now(timezone.utc).isoformat())
+            )
+            conn.commit()
+            aplicadas.append(versao)
+        except Exception:
+            conn.rollback()
+            logger.error(f"Falha ao aplicar migração {versao}: {descricao}")
+            raise
+
+    if aplicadas:
+        logger.info(f"Esquema atualizado para a versão {aplicadas[-1]}")
+    return aplicadas
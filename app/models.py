@@ -1,9 +1,11 @@
 """
 Modelos Pydantic para validação de dados da API.
 """
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Union
 from pydantic import BaseModel, Field
 
+from .config import settings
+
 
 class ConsultaRequest(BaseModel):
     """Modelo para requisição de consulta de viabilidade."""
@@ -29,12 +31,82 @@ class EnderecoDetalhes(BaseModel):
     total_hps: Optional[int] = None
 
 
+class NumeroProximo(BaseModel):
+    """Endereço vizinho retornado quando o número consultado não existe."""
+    posicao: str = Field(..., description="\"abaixo\" ou \"acima\" do número consultado")
+    distancia: int = Field(..., description="Diferença entre os números da fachada")
+    viabilidade: Optional[str] = Field(None, description="Status de viabilidade do vizinho")
+    detalhes: EnderecoDetalhes = Field(..., description="Detalhes do endereço vizinho")
+
+
 class ConsultaResponse(BaseModel):
     """Modelo para resposta de consulta de viabilidade."""
     encontrado: bool = Field(..., description="Se o endereço foi encontrado")
     viabilidade: Optional[str] = Field(None, description="Status de viabilidade (Viável, Não viável, etc)")
     detalhes: Optional[EnderecoDetalhes] = Field(None, description="Detalhes do endereço")
     mensagem: Optional[str] = Field(None, description="Mensagem adicional")
+    diagnostico: Optional[Dict[str, Any]] = Field(None, description="Diagnóstico da consulta (apenas no modo de rastreamento)")
+    proximos: Optional[List[NumeroProximo]] = Field(
+        None, description="Números mais próximos no mesmo CEP e logradouro (só quando não encontrado e pedido)"
+    )
+
+
+class ConsultaLoteItem(BaseModel):
+    """Item de uma consulta em lote."""
+    cep: str = Field(..., description="CEP do endereço (com ou sem hífen)", example="60876672")
+    numero: Union[str, int] = Field(..., description="Número da fachada", example="144")
+
+
+class ConsultaLoteRequest(BaseModel):
+    """Modelo para requisição de consulta em lote."""
+    itens: List[ConsultaLoteItem] = Field(
+        ...,
+        description="Endereços a consultar",
+        max_length=settings.batch_max_itens
+    )
+
+
+class ConsultaLoteResponse(BaseModel):
+    """Modelo para resposta de consulta em lote."""
+    total: int = Field(..., description="Número de itens consultados")
+    encontrados: int = Field(..., description="Número de endereços encontrados")
+    resultados: List[ConsultaResponse] = Field(..., description="Resultados, na ordem da requisição")
+    tempo_processamento: float = Field(0, description="Tempo de processamento em segundos")
+
+
+class ListagemLogradouroResponse(BaseModel):
+    """Modelo para resposta da listagem de endereços de um logradouro."""
+    cod_logradouro: str = Field(..., description="Código do logradouro")
+    cep: Optional[str] = Field(None, description="CEP usado como filtro, se informado")
+    quantidade: int = Field(..., description="Número de endereços nesta página")
+    enderecos: List[EnderecoDetalhes] = Field(..., description="Endereços, por ordem de CEP e número")
+    proximo_cursor: Optional[str] = Field(
+        None, description="Cursor da próxima página (None na última página)"
+    )
+
+
+class ResultadoBusca(BaseModel):
+    """Trecho de logradouro encontrado pela busca por texto."""
+    cep: Optional[str] = None
+    cod_logradouro: Optional[str] = None
+    logradouro: Optional[str] = None
+    bairro: Optional[str] = None
+    localidade: Optional[str] = None
+    municipio: Optional[str] = None
+    uf: Optional[str] = None
+    registros: int = Field(0, description="Endereços cadastrados no trecho")
+    encontrado: Optional[bool] = Field(None, description="Se o número informado existe no trecho")
+    viabilidade: Optional[str] = Field(None, description="Viabilidade do número informado")
+    detalhes: Optional[EnderecoDetalhes] = Field(None, description="Endereço do número informado")
+
+
+class BuscaResponse(BaseModel):
+    """Modelo para resposta da busca por texto."""
+    total: int = Field(..., description="Número de trechos retornados")
+    resultados: List[ResultadoBusca] = Field(
+        ..., description="Trechos de logradouro, os que têm o número informado primeiro"
+    )
+    tempo_processamento: float = Field(0, description="Tempo de processamento em segundos")
 
 
 class UploadResponse(BaseModel):
@@ -43,6 +115,32 @@ class UploadResponse(BaseModel):
     mensagem: str = Field(..., description="Mensagem sobre o resultado")
     registros_inseridos: int = Field(0, description="Número de registros inseridos")
     tempo_processamento: float = Field(0, description="Tempo de processamento em segundos")
+    abas: Optional[List[Dict[str, Any]]] = Field(
+        None, description="Registros e tempo de leitura de cada aba da planilha"
+    )
+    alteracoes: Optional[Dict[str, int]] = Field(
+        None, description="Na carga incremental: inseridos, atualizados, removidos e abas inalteradas/alteradas/removidas"
+    )
+
+
+class JobCargaResponse(BaseModel):
+    """Modelo para o estado de uma carga de planilha em segundo plano."""
+    job_id: str = Field(..., description="Identificador do job")
+    arquivo: str = Field(..., description="Nome da planilha")
+    modo: str = Field("completa", description="completa ou incremental")
+    estado: str = Field(..., description="enfileirado, processando, concluido, falhou ou cancelado")
+    fase: Optional[str] = Field(None, description="Fase atual da carga")
+    registros_lidos: int = Field(0, description="Linhas lidas da planilha")
+    registros_inseridos: int = Field(0, description="Linhas gravadas na nova carga")
+    total_estimado: Optional[int] = Field(None, description="Número aproximado de linhas da planilha")
+    registros_por_segundo: float = Field(0, description="Vazão de leitura")
+    eta_s: Optional[float] = Field(None, description="Tempo restante estimado, em segundos")
+    tempo_decorrido_s: float = Field(0, description="Tempo desde o início da carga")
+    cancelamento_solicitado: bool = Field(False, description="Se o cancelamento foi pedido")
+    criado_em: str = Field(..., description="Data/hora de criação (UTC)")
+    finalizado_em: Optional[str] = Field(None, description="Data/hora de término (UTC)")
+    resultado: Optional[UploadResponse] = Field(None, description="Resultado da carga, ao terminar")
+    erro: Optional[str] = Field(None, description="Mensagem de erro, se falhou ou foi cancelado")
 
 
 class HealthResponse(BaseModel):
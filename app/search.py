@@ -0,0 +1,244 @@
+"""
+Busca de endereços por texto, com o índice FTS5 do SQLite.
+
+A busca não indexa cada endereço, e sim cada trecho de logradouro: uma linha
+de ``logradouros`` por combinação (CEP, código do logradouro, nome, bairro,
+localidade, município, UF), com o número de endereços do trecho. O índice
+``logradouros_fts`` (tabela FTS5 de conteúdo externo sobre ``logradouros``)
+usa o tokenizador ``unicode61`` com ``remove_diacritics 2``, então maiúsculas
+e acentos são ignorados ("sao joao" encontra "SÃO JOÃO"), e guarda prefixos
+de 2 e 3 caracteres para o autocompletar.
+
+As duas tabelas são derivadas de ``enderecos`` e reconstruídas na transação
+de cada carga completa (ver ``Database._atualizar_derivados``); inserções
+avulsas e cargas incrementais só atualizam os trechos que tocaram
+(``atualizar_indice`` e ``atualizar_trechos``).
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import logging
+import re
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+# Colunas pesquisáveis, na ordem das colunas da tabela FTS
+COLUNAS_BUSCA = ('logradouro', 'bairro', 'localidade', 'municipio')
+
+# Chave de um trecho de logradouro (colunas de agrupamento de ``logradouros``)
+_COLUNAS_TRECHO = "cep, cod_logradouro, logradouro, bairro, localidade, municipio, uf"
+_FILTRO_TRECHO = " AND ".join(f"{coluna} IS ?" for coluna in _COLUNAS_TRECHO.split(", "))
+
+# Palavras da consulta: letras e dígitos (o restante separa as palavras)
+_PALAVRA = re.compile(r"\w+", re.UNICODE)
+
+
+def fts_disponivel(conn: sqlite3.Connection) -> bool:
+    """True se o índice de busca existe (o SQLite foi compilado com FTS5)."""
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'logradouros_fts'"
+    ).fetchone()
+    return row is not None
+
+
+def indice_construido(conn: sqlite3.Connection) -> bool:
+    """True se o índice de busca foi construído e está em dia com ``enderecos``."""
+    row = conn.execute(
+        "SELECT 1 FROM dataset_meta WHERE chave = 'busca_construida'"
+    ).fetchone()
+    return row is not None
+
+
+def reconstruir_indice(conn: sqlite3.Connection) -> int:
+    """
+    Reconstrói ``logradouros`` e o índice FTS a partir de ``enderecos``, sem fazer commit.
+
+    Args:
+        conn: Conexão de escrita, com a transação aberta
+
+    Returns:
+        Número de trechos de logradouro indexados
+    """
+    if not fts_disponivel(conn):
+        return 0
+
+    conn.execute("DELETE FROM logradouros")
+    total = conn.execute("""
+        INSERT INTO logradouros (cep, cod_logradouro, logradouro, bairro, localidade, municipio, uf, registros)
+        SELECT cep, cod_logradouro, logradouro, bairro, localidade, municipio, uf, COUNT(*)
+        FROM enderecos
+        WHERE logradouro IS NOT NULL
+        GROUP BY cep, cod_logradouro, logradouro, bairro, localidade, municipio, uf
+    """).rowcount
+    conn.execute("INSERT INTO logradouros_fts (logradouros_fts) VALUES ('rebuild')")
+    conn.execute(
+        "INSERT OR REPLACE INTO dataset_meta (chave, valor) VALUES ('busca_construida', '1')"
+    )
+    logger.info(f"Índice de busca reconstruído: {total} trechos de logradouro")
+    return total
+
+
+def atualizar_indice(conn: sqlite3.Connection, desde_id: int) -> int:
+    """
+    Soma ao índice os endereços com id maior que ``desde_id``, sem fazer commit.
+
+    Para inserções que só acrescentam endereços: trechos já existentes têm
+    a contagem somada e trechos novos entram em ``logradouros`` e no índice
+    FTS. Se o índice ainda não foi construído, não faz nada (a reconstrução
+    completa acontece na inicialização).
+
+    Args:
+        conn: Conexão de escrita, com a transação aberta
+        desde_id: Maior id de ``enderecos`` antes da inserção
+
+    Returns:
+        Número de trechos de logradouro novos
+    """
+    if not fts_disponivel(conn) or not indice_construido(conn):
+        return 0
+
+    grupos = conn.execute(f"""
+        SELECT {_COLUNAS_TRECHO}, COUNT(*)
+        FROM enderecos
+        WHERE id > ? AND logradouro IS NOT NULL
+        GROUP BY {_COLUNAS_TRECHO}
+    """, (desde_id,)).fetchall()
+
+    novos = 0
+    for *chave, registros in grupos:
+        row = _buscar_trecho(conn, chave)
+        if row is not None:
+            conn.execute(
+                "UPDATE logradouros SET registros = registros + ? WHERE id = ?",
+                (registros, row['id'])
+            )
+        else:
+            _inserir_trecho(conn, chave, registros)
+            novos += 1
+
+    logger.info(f"Índice de busca: {len(grupos)} trechos atualizados, {novos} novos")
+    return novos
+
+
+def atualizar_trechos(conn: sqlite3.Connection, trechos: Iterable[Tuple[Any, ...]]) -> int:
+    """
+    Recalcula a partir de ``enderecos`` só os trechos informados, sem fazer commit.
+
+    Para cargas incrementais, que inserem, alteram e removem endereços: cada
+    trecho tem a contagem refeita, entra no índice se é novo e sai dele se
+    ficou sem endereços. Se o índice ainda não foi construído, não faz nada.
+
+    Args:
+        conn: Conexão de escrita, com a transação aberta
+        trechos: Chaves (cep, cod_logradouro, logradouro, bairro, localidade,
+            municipio, uf) dos trechos que tiveram endereços alterados
+
+    Returns:
+        Número de trechos recalculados
+    """
+    if not fts_disponivel(conn) or not indice_construido(conn):
+        return 0
+
+    total = 0
+    for chave in trechos:
+        registros = conn.execute(
+            f"SELECT COUNT(*) FROM enderecos WHERE {_FILTRO_TRECHO}", tuple(chave)
+        ).fetchone()[0]
+        row = _buscar_trecho(conn, chave)
+        if row is None:
+            if registros:
+                _inserir_trecho(conn, chave, registros)
+        elif registros:
+            conn.execute("UPDATE logradouros SET registros = ? WHERE id = ?", (registros, row['id']))
+        else:
+            # Conteúdo externo: o FTS precisa dos valores antigos para remover a linha
+            conn.execute(
+                "INSERT INTO logradouros_fts (logradouros_fts, rowid, logradouro, bairro, localidade, municipio) "
+                "VALUES ('delete', ?, ?, ?, ?, ?)",
+                (row['id'], *chave[2:6])
+            )
+            conn.execute("DELETE FROM logradouros WHERE id = ?", (row['id'],))
+        total += 1
+
+    logger.info(f"Índice de busca: {total} trechos recalculados")
+    return total
+
+
+def _buscar_trecho(conn: sqlite3.Connection, chave: Sequence[Any]) -> Optional[sqlite3.Row]:
+    return conn.execute(f"SELECT id FROM logradouros WHERE {_FILTRO_TRECHO}", tuple(chave)).fetchone()
+
+
+def _inserir_trecho(conn: sqlite3.Connection, chave: Sequence[Any], registros: int):
+    cursor = conn.execute(f"""
+        INSERT INTO logradouros ({_COLUNAS_TRECHO}, registros)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, (*chave, registros))
+    conn.execute(
+        "INSERT INTO logradouros_fts (rowid, logradouro, bairro, localidade, municipio) VALUES (?, ?, ?, ?, ?)",
+        (cursor.lastrowid, *chave[2:6])
+    )
+
+
+def _termos(texto: str) -> List[str]:
+    """Palavras do texto como termos FTS5 entre aspas, com busca por prefixo."""
+    return [f'"{palavra}"*' for palavra in _PALAVRA.findall(texto)]
+
+
+def montar_consulta(texto: str, municipio: Optional[str] = None) -> Optional[str]:
+    """
+    Converte o texto digitado em uma consulta FTS5.
+
+    Todas as palavras precisam aparecer (em qualquer coluna) e cada uma vale
+    como prefixo, para o autocompletar: "av ber" encontra "AVENIDA BERNARDO
+    MANUEL". O município, se informado, restringe as colunas município e
+    localidade.
+
+    Args:
+        texto: Texto da busca
+        municipio: Município ou localidade (opcional)
+
+    Returns:
+        Consulta FTS5, ou None se o texto não tiver nenhuma palavra
+    """
+    termos = _termos(texto)
+    if not termos:
+        return None
+    consulta = " AND ".join(termos)
+    if municipio:
+        termos_municipio = _termos(municipio)
+        if termos_municipio:
+            consulta += " AND {municipio localidade} : (" + " AND ".join(termos_municipio) + ")"
+    return consulta
+
+
+def buscar_logradouros(
+    conn: sqlite3.Connection,
+    texto: str,
+    municipio: Optional[str] = None,
+    limite: int = 10
+) -> List[Dict[str, Any]]:
+    """
+    Busca trechos de logradouro pelo texto, do mais para o menos relevante.
+
+    Args:
+        conn: Conexão de leitura
+        texto: Texto da busca (nome da rua, bairro, cidade...)
+        municipio: Município ou localidade (opcional)
+        limite: Máximo de trechos retornados
+
+    Returns:
+        Lista de trechos (cep, cod_logradouro, logradouro, bairro,
+        localidade, municipio, uf, registros)
+    """
+    consulta = montar_consulta(texto, municipio)
+    if consulta is None:
+        return []
+    cursor = conn.execute("""
+        SELECT l.cep, l.cod_logradouro, l.logradouro, l.bairro, l.localidade,
+               l.municipio, l.uf, l.registros
+        FROM logradouros_fts
+        JOIN logradouros l ON l.id = logradouros_fts.rowid
+        WHERE logradouros_fts MATCH ?
+        ORDER BY logradouros_fts.rank
+        LIMIT ?
+    """, (consulta, limite))
+    return [dict(row) for row in cursor]
@@ -1,91 +1,521 @@
 """
 Serviços de lógica de negócio para a API.
 """
+from itertools import chain, islice
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import base64
+import binascii
+import csv
+import io
+import json
 import logging
+import random
 import time
 
+from . import timing
+from .config import settings
 from .database import db
-from .utils import processar_planilha_excel, normalizar_cep, validar_cep
+from .memory_index import memory_index
+from .metrics import CONSULTAS, registrar_carga
+from .cache import lookup_cache, AUSENTE
+from .delta import calcular_delta_aba
+from .utils import (
+    COLUNAS_PLANILHA,
+    hashes_brutos_abas,
+    iterar_planilha_excel,
+    iterar_planilha_excel_paralelo,
+    ler_abas_planilha,
+    normalizar_cep,
+    validar_cep
+)
 from .models import (
+    BuscaResponse,
+    ConsultaLoteItem,
+    ConsultaLoteResponse,
     ConsultaResponse,
     EnderecoDetalhes,
+    ListagemLogradouroResponse,
+    NumeroProximo,
+    ResultadoBusca,
     UploadResponse,
     HealthResponse
 )
 
 logger = logging.getLogger(__name__)
 
+# Colunas de detalhes incluídas na saída CSV da verificação de arquivo
+CAMPOS_DETALHES_CSV = (
+    'uf', 'municipio', 'localidade', 'bairro', 'logradouro', 'cod_logradouro',
+    'n_fachada', 'comp_1', 'comp_2', 'comp_3'
+)
+
+
+def _codificar_cursor(chave: Tuple[str, int, int]) -> str:
+    """Codifica a chave (cep, número, id) da paginação como um cursor opaco."""
+    return base64.urlsafe_b64encode(json.dumps(list(chave)).encode()).decode().rstrip("=")
+
+
+def _decodificar_cursor(cursor: str) -> Tuple[str, int, int]:
+    """
+    Decodifica um cursor gerado por ``_codificar_cursor``.
+
+    Raises:
+        ValueError: Se o cursor for inválido
+    """
+    try:
+        dados = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cep, numero, id_ = json.loads(dados)
+        return str(cep), int(numero), int(id_)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
+
 
 class EnderecoService:
     """Serviço para operações relacionadas a endereços."""
 
     @staticmethod
-    def consultar_viabilidade(cep: str, n_fachada: str) -> ConsultaResponse:
+    def deve_rastrear(solicitado: bool = False) -> bool:
+        """
+        Decide se uma consulta deve rodar no modo de rastreamento.
+
+        O rastreamento é ativado quando solicitado explicitamente na
+        requisição ou por amostragem (TRACE_SAMPLE_RATE, entre 0 e 1).
+
+        Args:
+            solicitado: Se a requisição pediu o rastreamento
+
+        Returns:
+            True se a consulta deve ser rastreada
+        """
+        if solicitado:
+            return True
+        taxa = settings.trace_sample_rate
+        return taxa > 0 and random.random() < taxa
+
+    @staticmethod
+    def buscar_endereco(cep: str, n_fachada: str, usar_cache: bool = True) -> Optional[dict]:
+        """
+        Busca um endereço no cache, no índice em memória ou no banco.
+
+        Args:
+            cep: CEP normalizado
+            n_fachada: Número da fachada normalizado
+            usar_cache: Se False, ignora o cache de consultas
+
+        Returns:
+            Dicionário com dados do endereço ou None se não encontrado
+        """
+        geracao = db.get_generation()
+        chave = (cep, n_fachada)
+
+        if usar_cache and lookup_cache.ativo:
+            with timing.medir("cache"):
+                resultado = lookup_cache.get(chave, geracao)
+            if resultado is not AUSENTE:
+                return resultado
+
+        indice = EnderecoService._indice_memoria(geracao)
+        if indice is not None:
+            with timing.medir("consulta"):
+                resultado = indice.buscar(cep, n_fachada)
+        else:
+            resultado = db.consultar_viabilidade(cep, n_fachada)
+
+        if usar_cache:
+            with timing.medir("cache"):
+                lookup_cache.put(chave, resultado, geracao)
+        return resultado
+
+    @staticmethod
+    def consultar_viabilidade(
+        cep: str,
+        n_fachada: str,
+        trace: bool = False,
+        proximos: int = 0
+    ) -> ConsultaResponse:
         """
         Consulta a viabilidade de um endereço.
 
         Args:
             cep: CEP do endereço
             n_fachada: Número da fachada
+            trace: Se True, inclui o diagnóstico da consulta na resposta
+            proximos: Se o endereço não for encontrado, inclui até esse número
+                de vizinhos abaixo e acima no mesmo logradouro (0 desativa)
 
         Returns:
             ConsultaResponse com o resultado da consulta
         """
-        # Validar CEP
-        if not validar_cep(cep):
-            return ConsultaResponse(
-                encontrado=False,
-                mensagem=f"CEP inválido: {cep}. Deve conter 8 dígitos."
-            )
+        with timing.medir("validacao"):
+            # Validar CEP
+            if not validar_cep(cep):
+                return ConsultaResponse(
+                    encontrado=False,
+                    mensagem=f"CEP inválido: {cep}. Deve conter 8 dígitos."
+                )
+
+            # Normalizar entradas
+            cep_normalizado = normalizar_cep(cep)
+            n_fachada_normalizado = str(n_fachada).strip()
+        timing.anotar(cep=cep_normalizado, numero=n_fachada_normalizado, trace=trace, proximos=proximos)
+
+        # Diagnóstico (apenas no modo de rastreamento)
+        diagnostico = None
+        if trace:
+            diagnostico = db.diagnosticar_consulta(cep_normalizado, n_fachada_normalizado)
+
+        # Consultar (o modo de rastreamento ignora o cache)
+        resultado = EnderecoService.buscar_endereco(
+            cep_normalizado,
+            n_fachada_normalizado,
+            usar_cache=not trace
+        )
+
+        CONSULTAS.inc("encontrado" if resultado else "nao_encontrado")
 
-        # Normalizar entradas
-        cep_normalizado = normalizar_cep(cep)
-        n_fachada_normalizado = str(n_fachada).strip()
+        # Números vizinhos no mesmo logradouro (busca por faixa indexada)
+        vizinhos = None
+        if not resultado and proximos > 0:
+            with timing.medir("proximos"):
+                vizinhos = db.numeros_proximos(cep_normalizado, n_fachada_normalizado, proximos)
 
-        # Consultar no banco
-        resultado = db.consultar_viabilidade(cep_normalizado, n_fachada_normalizado)
+        with timing.medir("montagem"):
+            return EnderecoService.montar_resposta(resultado, cep, n_fachada, diagnostico, vizinhos)
+
+    @staticmethod
+    def montar_detalhes(resultado: dict) -> EnderecoDetalhes:
+        """Converte um registro do banco em EnderecoDetalhes."""
+        return EnderecoDetalhes(
+            viabilidade_atual=resultado.get('viabilidade_atual'),
+            uf=resultado.get('uf'),
+            municipio=resultado.get('municipio'),
+            localidade=resultado.get('localidade'),
+            bairro=resultado.get('bairro'),
+            logradouro=resultado.get('logradouro'),
+            n_fachada=resultado.get('n_fachada'),
+            comp_1=resultado.get('comp_1'),
+            comp_2=resultado.get('comp_2'),
+            comp_3=resultado.get('comp_3'),
+            regiao=resultado.get('regiao'),
+            cep=resultado.get('cep'),
+            cod_logradouro=resultado.get('cod_logradouro'),
+            total_hps=resultado.get('total_hps')
+        )
+
+    @staticmethod
+    def montar_resposta(
+        resultado: Optional[dict],
+        cep: str,
+        n_fachada: str,
+        diagnostico: Optional[dict] = None,
+        vizinhos: Optional[List[dict]] = None
+    ) -> ConsultaResponse:
+        """
+        Monta a resposta de uma consulta a partir do registro encontrado.
+
+        Args:
+            resultado: Dicionário com dados do endereço ou None
+            cep: CEP como informado na requisição
+            n_fachada: Número da fachada como informado na requisição
+            diagnostico: Diagnóstico da consulta (modo de rastreamento)
+            vizinhos: Números próximos (ver ``Database.numeros_proximos``), se pedidos
 
+        Returns:
+            ConsultaResponse com o resultado da consulta
+        """
         if resultado:
             # Endereço encontrado
-            detalhes = EnderecoDetalhes(
-                viabilidade_atual=resultado.get('viabilidade_atual'),
-                uf=resultado.get('uf'),
-                municipio=resultado.get('municipio'),
-                localidade=resultado.get('localidade'),
-                bairro=resultado.get('bairro'),
-                logradouro=resultado.get('logradouro'),
-                n_fachada=resultado.get('n_fachada'),
-                comp_1=resultado.get('comp_1'),
-                comp_2=resultado.get('comp_2'),
-                comp_3=resultado.get('comp_3'),
-                regiao=resultado.get('regiao'),
-                cep=resultado.get('cep'),
-                cod_logradouro=resultado.get('cod_logradouro'),
-                total_hps=resultado.get('total_hps')
-            )
-
             return ConsultaResponse(
                 encontrado=True,
                 viabilidade=resultado.get('viabilidade_atual'),
-                detalhes=detalhes,
-                mensagem="Endereço encontrado com sucesso"
+                detalhes=EnderecoService.montar_detalhes(resultado),
+                mensagem="Endereço encontrado com sucesso",
+                diagnostico=diagnostico
             )
+
+        # Endereço não encontrado
+        mensagem = f"Endereço não encontrado para CEP {cep} e Número {n_fachada}"
+        proximos = None
+        if vizinhos is not None:
+            proximos = [
+                NumeroProximo(
+                    posicao=vizinho['posicao'],
+                    distancia=vizinho['distancia'],
+                    viabilidade=vizinho.get('viabilidade_atual'),
+                    detalhes=EnderecoService.montar_detalhes(vizinho)
+                )
+                for vizinho in vizinhos
+            ]
+            if proximos:
+                mensagem += f" ({len(proximos)} número(s) próximo(s) no mesmo logradouro)"
+        return ConsultaResponse(
+            encontrado=False,
+            mensagem=mensagem,
+            diagnostico=diagnostico,
+            proximos=proximos
+        )
+
+    @staticmethod
+    def resolver_pares(pares: List[Tuple[str, str]]) -> List[ConsultaResponse]:
+        """
+        Resolve uma lista de pares (cep, número) de uma vez.
+
+        Os pares válidos distintos são consultados com uma única junção no
+        banco (ou no índice em memória, se carregado).
+
+        Args:
+            pares: Lista de (cep, número) como informados
+
+        Returns:
+            Lista de ConsultaResponse na ordem da entrada
+        """
+        # Validar e normalizar as entradas
+        chaves: List[Optional[Tuple[str, str]]] = []
+        for cep, numero in pares:
+            if validar_cep(cep):
+                chaves.append((normalizar_cep(cep), numero.strip()))
+            else:
+                chaves.append(None)
+
+        # Consultar apenas as chaves válidas distintas
+        distintas = list(dict.fromkeys(chave for chave in chaves if chave))
+        indice = EnderecoService._indice_memoria(db.get_generation())
+        if indice is not None:
+            encontrados = {chave: indice.buscar(*chave) for chave in distintas}
         else:
-            # Endereço não encontrado
-            return ConsultaResponse(
-                encontrado=False,
-                mensagem=f"Endereço não encontrado para CEP {cep} e Número {n_fachada}"
-            )
+            encontrados = dict(zip(distintas, db.consultar_lote(distintas)))
+
+        encontrados_total = sum(1 for chave in chaves if chave and encontrados.get(chave))
+        CONSULTAS.inc("encontrado", valor=encontrados_total)
+        CONSULTAS.inc("nao_encontrado", valor=len(pares) - encontrados_total)
+
+        resultados = []
+        for (cep, numero), chave in zip(pares, chaves):
+            if chave is None:
+                resultados.append(ConsultaResponse(
+                    encontrado=False,
+                    mensagem=f"CEP inválido: {cep}. Deve conter 8 dígitos."
+                ))
+            else:
+                resultados.append(EnderecoService.montar_resposta(
+                    encontrados.get(chave), cep, numero
+                ))
+        return resultados
+
+    @staticmethod
+    def verificar_arquivo(linhas: Iterator[Tuple[int, str, str]], formato: str = "ndjson") -> Iterator[str]:
+        """
+        Verifica a viabilidade de um arquivo de endereços, em blocos.
+
+        Lê as linhas sob demanda, consulta cada bloco de uma vez e devolve o
+        texto já formatado de cada bloco, então a memória usada não depende
+        do tamanho do arquivo.
+
+        Args:
+            linhas: Iterador de (número da linha, cep, número), ver ``ler_csv_enderecos``
+            formato: "ndjson" (um JSON por linha) ou "csv"
+
+        Yields:
+            Texto formatado de cada bloco de resultados
+        """
+        tamanho_bloco = settings.bulk_chunk_size
+
+        if formato == "csv":
+            saida = io.StringIO()
+            escritor = csv.writer(saida)
+            escritor.writerow(["linha", "cep", "numero", "encontrado", "viabilidade", *CAMPOS_DETALHES_CSV, "mensagem"])
+            yield saida.getvalue()
+
+        for bloco in iter(lambda: list(islice(linhas, tamanho_bloco)), []):
+            resultados = EnderecoService.resolver_pares([(cep, numero) for _, cep, numero in bloco])
+
+            if formato == "csv":
+                saida = io.StringIO()
+                escritor = csv.writer(saida)
+                for (linha, cep, numero), resultado in zip(bloco, resultados):
+                    detalhes = resultado.detalhes.model_dump() if resultado.detalhes else {}
+                    escritor.writerow([
+                        linha, cep, numero, resultado.encontrado, resultado.viabilidade or "",
+                        *(detalhes.get(campo) or "" for campo in CAMPOS_DETALHES_CSV),
+                        resultado.mensagem
+                    ])
+                yield saida.getvalue()
+            else:
+                yield "".join(
+                    json.dumps({
+                        "linha": linha,
+                        "cep": cep,
+                        "numero": numero,
+                        **resultado.model_dump(exclude={"diagnostico"})
+                    }, ensure_ascii=False) + "\n"
+                    for (linha, cep, numero), resultado in zip(bloco, resultados)
+                )
+
+    @staticmethod
+    def buscar(
+        texto: str,
+        numero: Optional[str] = None,
+        municipio: Optional[str] = None,
+        limite: int = 10
+    ) -> BuscaResponse:
+        """
+        Busca endereços por texto (autocompletar de logradouros).
+
+        Args:
+            texto: Texto da busca (prefixos das palavras bastam)
+            numero: Número da fachada, para resolver o endereço em cada trecho
+            municipio: Município ou localidade (opcional)
+            limite: Máximo de trechos retornados
+
+        Raises:
+            RuntimeError: Se a busca por texto não estiver disponível
+
+        Returns:
+            BuscaResponse com os trechos encontrados
+        """
+        inicio = time.time()
+        trechos = db.buscar_enderecos(texto, numero, municipio, limite)
+
+        resultados = []
+        for trecho in trechos:
+            endereco = trecho.pop('endereco', None)
+            resultado = ResultadoBusca(**trecho)
+            if numero is not None:
+                resultado.encontrado = endereco is not None
+                if endereco:
+                    resultado.viabilidade = endereco.get('viabilidade_atual')
+                    resultado.detalhes = EnderecoService.montar_detalhes(endereco)
+            resultados.append(resultado)
+
+        # Trechos com o número primeiro, mantendo a ordem de relevância
+        resultados.sort(key=lambda r: not r.encontrado)
+        return BuscaResponse(
+            total=len(resultados),
+            resultados=resultados,
+            tempo_processamento=round(time.time() - inicio, 4)
+        )
+
+    @staticmethod
+    def exportar(
+        formato: str = "csv",
+        filtros: Optional[Dict[str, str]] = None,
+        tamanho_bloco: Optional[int] = None
+    ) -> Iterator[str]:
+        """
+        Exporta o conjunto de dados (ou um recorte), em blocos.
+
+        Args:
+            formato: "csv" (com cabeçalho) ou "ndjson" (um JSON por linha)
+            filtros: Igualdades por uf, municipio e/ou viabilidade_atual
+            tamanho_bloco: Linhas por bloco (padrão: EXPORT_CHUNK_SIZE)
+
+        Raises:
+            RuntimeError: Se os dados mudarem durante a exportação
+
+        Yields:
+            Texto formatado de cada bloco, com as colunas da planilha
+        """
+        blocos = db.exportar_enderecos(filtros, tamanho_bloco or settings.export_chunk_size)
+
+        if formato == "csv":
+            saida = io.StringIO()
+            csv.writer(saida).writerow(COLUNAS_PLANILHA)
+            yield saida.getvalue()
+
+        for bloco in blocos:
+            if formato == "csv":
+                saida = io.StringIO()
+                escritor = csv.writer(saida)
+                for endereco in bloco:
+                    escritor.writerow([
+                        "" if endereco[coluna] is None else endereco[coluna]
+                        for coluna in COLUNAS_PLANILHA
+                    ])
+                yield saida.getvalue()
+            else:
+                yield "".join(
+                    json.dumps({coluna: endereco[coluna] for coluna in COLUNAS_PLANILHA}, ensure_ascii=False) + "\n"
+                    for endereco in bloco
+                )
+
+    @staticmethod
+    def consultar_lote(itens: List[ConsultaLoteItem]) -> ConsultaLoteResponse:
+        """
+        Consulta a viabilidade de vários endereços de uma vez.
+
+        Os itens válidos são resolvidos com uma única junção no banco (ou no
+        índice em memória, se carregado), em vez de uma consulta por item.
+
+        Args:
+            itens: Lista de pares CEP/número
+
+        Returns:
+            ConsultaLoteResponse com os resultados na ordem da entrada
+        """
+        inicio = time.time()
+
+        resultados = EnderecoService.resolver_pares(
+            [(str(item.cep), str(item.numero)) for item in itens]
+        )
+
+        return ConsultaLoteResponse(
+            total=len(resultados),
+            encontrados=sum(1 for r in resultados if r.encontrado),
+            resultados=resultados,
+            tempo_processamento=round(time.time() - inicio, 3)
+        )
+
+    @staticmethod
+    def listar_logradouro(
+        cod_logradouro: str,
+        cep: Optional[str] = None,
+        limite: int = 100,
+        cursor: Optional[str] = None
+    ) -> ListagemLogradouroResponse:
+        """
+        Lista os endereços de um logradouro, uma página por vez.
+
+        Args:
+            cod_logradouro: Código do logradouro
+            cep: CEP do trecho a listar (opcional)
+            limite: Máximo de endereços na página
+            cursor: ``proximo_cursor`` da página anterior (None na primeira)
+
+        Raises:
+            ValueError: Se o CEP ou o cursor forem inválidos
+
+        Returns:
+            ListagemLogradouroResponse com a página e o cursor da próxima
+        """
+        cod_logradouro = cod_logradouro.strip()
+        cep_normalizado = None
+        if cep:
+            if not validar_cep(cep):
+                raise ValueError(f"CEP inválido: {cep}. Deve conter 8 dígitos.")
+            cep_normalizado = normalizar_cep(cep)
+
+        apos = _decodificar_cursor(cursor) if cursor else None
+        if apos and cep_normalizado and apos[0] != cep_normalizado:
+            raise ValueError("O cursor não pertence a esta listagem (CEP diferente)")
+
+        enderecos, proxima = db.listar_logradouro(cod_logradouro, cep_normalizado, limite, apos)
+        return ListagemLogradouroResponse(
+            cod_logradouro=cod_logradouro,
+            cep=cep_normalizado,
+            quantidade=len(enderecos),
+            enderecos=[EnderecoService.montar_detalhes(e) for e in enderecos],
+            proximo_cursor=_codificar_cursor(proxima) if proxima else None
+        )
 
     @staticmethod
-    def upload_planilha(file_path: Path) -> UploadResponse:
+    def upload_planilha(file_path: Path, job=None) -> UploadResponse:
         """
         Processa e carrega uma planilha Excel no banco de dados.
 
         Args:
             file_path: Caminho para o arquivo Excel
+            job: IngestJob que acompanha o progresso e o cancelamento (opcional)
 
         Returns:
             UploadResponse com o resultado do upload
@@ -103,39 +533,55 @@ class EnderecoService:
                     tempo_processamento=time.time() - inicio
                 )
 
-            # Processar a planilha
+            # Ler a planilha em streaming, lote a lote
             logger.info("Processando planilha...")
-            enderecos = processar_planilha_excel(file_path)
+            abas: List[Dict[str, Any]] = []
+            if settings.ingest_workers > 1:
+                # Uma aba por processo: o parsing do openpyxl é limitado pela CPU
+                lotes = iterar_planilha_excel_paralelo(
+                    file_path,
+                    workers=settings.ingest_workers,
+                    tamanho_lote=settings.ingest_batch_size,
+                    relatorio=abas
+                )
+            else:
+                lotes = iterar_planilha_excel(
+                    file_path, tamanho_lote=settings.ingest_batch_size, relatorio=abas
+                )
+            if job is not None:
+                lotes = job.acompanhar(lotes)
+            primeiro_lote = next(lotes, None)
 
-            if not enderecos:
+            if not primeiro_lote:
                 return UploadResponse(
                     sucesso=False,
                     mensagem="Nenhum registro encontrado na planilha",
                     tempo_processamento=time.time() - inicio
                 )
 
-            # Limpar dados antigos
-            logger.info("Limpando banco de dados...")
-            db.clear_all()
-
-            # Inserir novos dados em lotes
-            logger.info(f"Inserindo {len(enderecos)} registros no banco...")
-            batch_size = 5000
-            total_inseridos = 0
+            # Montar a nova carga separada e trocá-la pela atual de uma vez: se
+            # a leitura falhar no meio, os dados anteriores permanecem. Os
+            # hashes das abas são gravados para a próxima carga incremental.
+            logger.info("Inserindo registros no banco...")
+            hashes_brutos = hashes_brutos_abas(file_path)
+            total_inseridos = db.replace_all(
+                chain([primeiro_lote], lotes),
+                progresso=lambda total: EnderecoService._registrar_progresso(total, job),
+                abas=lambda: [{**aba, 'hash_bruto': hashes_brutos.get(aba['aba'])} for aba in abas]
+            )
 
-            for i in range(0, len(enderecos), batch_size):
-                batch = enderecos[i:i + batch_size]
-                inseridos = db.insert_enderecos(batch)
-                total_inseridos += inseridos
-                logger.info(f"Progresso: {total_inseridos}/{len(enderecos)} registros")
+            # Publicar a nova versão dos dados e recarregar o índice em memória
+            EnderecoService.publicar_nova_versao(job)
 
             tempo_total = time.time() - inicio
+            registrar_carga("completa", total_inseridos, tempo_total)
 
             return UploadResponse(
                 sucesso=True,
                 mensagem=f"Planilha processada com sucesso! {total_inseridos} registros inseridos.",
                 registros_inseridos=total_inseridos,
-                tempo_processamento=round(tempo_total, 2)
+                tempo_processamento=round(tempo_total, 2),
+                abas=abas
             )
 
         except Exception as e:
@@ -146,20 +592,159 @@ class EnderecoService:
                 tempo_processamento=time.time() - inicio
             )
 
+    @staticmethod
+    def upload_planilha_delta(file_path: Path, job=None) -> UploadResponse:
+        """
+        Aplica uma planilha como carga incremental: só as mudanças vão para o banco.
+
+        Abas com o mesmo hash da última carga são ignoradas sem serem lidas.
+        As demais são lidas e comparadas com os endereços da mesma aba no
+        banco (ver ``delta.calcular_delta_aba``); abas que saíram da planilha
+        têm os endereços removidos. Todas as mudanças são aplicadas em uma
+        única transação.
+
+        Args:
+            file_path: Caminho para o arquivo Excel
+            job: IngestJob que acompanha o progresso e o cancelamento (opcional)
+
+        Returns:
+            UploadResponse com o número de inserções, atualizações e remoções
+        """
+        inicio = time.time()
+
+        try:
+            logger.info(f"Iniciando carga incremental da planilha: {file_path}")
+
+            if not file_path.exists():
+                return UploadResponse(
+                    sucesso=False,
+                    mensagem=f"Arquivo não encontrado: {file_path}",
+                    tempo_processamento=time.time() - inicio
+                )
+
+            if db.possui_enderecos_sem_aba():
+                return UploadResponse(
+                    sucesso=False,
+                    mensagem=(
+                        "Os dados atuais foram carregados sem a aba de origem; "
+                        "faça uma carga completa antes de usar a carga incremental"
+                    ),
+                    tempo_processamento=time.time() - inicio
+                )
+
+            hashes_brutos = hashes_brutos_abas(file_path)
+            anteriores = db.hashes_abas()
+            abas: List[Dict[str, Any]] = []
+
+            # Abas com o mesmo hash da última carga nem são lidas; as demais
+            # são lidas abrindo a planilha uma única vez
+            a_ler = [
+                aba for aba, hash_bruto in hashes_brutos.items()
+                if not (anteriores.get(aba) and anteriores[aba]['hash_bruto'] == hash_bruto)
+            ]
+            inalteradas = len(hashes_brutos) - len(a_ler)
+
+            def ler_abas_alteradas() -> Iterator[List[Dict[str, Any]]]:
+                if not a_ler:
+                    return
+                for aba, linhas, hash_conteudo in ler_abas_planilha(file_path, a_ler):
+                    anterior = anteriores.get(aba)
+                    hash_bruto = hashes_brutos[aba]
+                    abas.append({
+                        'aba': aba,
+                        'registros': len(linhas),
+                        'hash_bruto': hash_bruto,
+                        'hash_conteudo': hash_conteudo,
+                        # Arquivo salvo de novo, mas com o mesmo conteúdo
+                        'alterada': not (anterior and anterior['hash_conteudo'] == hash_conteudo)
+                    })
+                    yield linhas
+
+            insercoes: List[Dict[str, Any]] = []
+            atualizacoes: List[Tuple[int, Dict[str, Any]]] = []
+            remocoes: List[int] = []
+
+            abas_lidas = ler_abas_alteradas()
+            if job is not None:
+                abas_lidas = job.acompanhar(abas_lidas)
+            for linhas in abas_lidas:
+                aba = abas[-1]
+                if not aba['alterada']:
+                    continue
+                novas, alteradas, removidas = calcular_delta_aba(db.enderecos_da_aba(aba['aba']), linhas)
+                insercoes.extend(novas)
+                atualizacoes.extend(alteradas)
+                remocoes.extend(removidas)
+                logger.info(
+                    f"Aba '{aba['aba']}': {len(novas)} inseridos, "
+                    f"{len(alteradas)} atualizados, {len(removidas)} removidos"
+                )
+
+            abas_removidas = [aba for aba in db.abas_carregadas() if aba not in hashes_brutos]
+
+            if job is not None:
+                job.definir_fase("aplicando_alteracoes")
+            removidos_abas = db.aplicar_delta(insercoes, atualizacoes, remocoes, abas_removidas, abas)
+
+            alteracoes = {
+                'inseridos': len(insercoes),
+                'atualizados': len(atualizacoes),
+                'removidos': len(remocoes) + removidos_abas,
+                'abas_inalteradas': inalteradas,
+                'abas_alteradas': sum(1 for aba in abas if aba['alterada']),
+                'abas_removidas': len(abas_removidas),
+            }
+            if insercoes or atualizacoes or remocoes or removidos_abas:
+                EnderecoService.publicar_nova_versao(job)
+
+            registrar_carga(
+                "incremental",
+                len(insercoes) + len(atualizacoes) + len(remocoes) + removidos_abas,
+                time.time() - inicio
+            )
+            return UploadResponse(
+                sucesso=True,
+                mensagem=(
+                    f"Carga incremental concluída: {alteracoes['inseridos']} inseridos, "
+                    f"{alteracoes['atualizados']} atualizados, {alteracoes['removidos']} removidos "
+                    f"({inalteradas} abas inalteradas)."
+                ),
+                registros_inseridos=len(insercoes),
+                tempo_processamento=round(time.time() - inicio, 2),
+                abas=[{k: v for k, v in aba.items() if k != 'hash_bruto'} for aba in abas],
+                alteracoes=alteracoes
+            )
+
+        except Exception as e:
+            logger.error(f"Erro na carga incremental: {str(e)}")
+            return UploadResponse(
+                sucesso=False,
+                mensagem=f"Erro na carga incremental: {str(e)}",
+                tempo_processamento=time.time() - inicio
+            )
+
+    @staticmethod
+    def _registrar_progresso(total: int, job=None):
+        """Registra no log (e no job, se houver) o total de registros inseridos."""
+        logger.info(f"Progresso: {total} registros inseridos")
+        if job is not None:
+            job.registrar_insercao(total)
+
     @staticmethod
     def get_health() -> HealthResponse:
         """
         Retorna informações de saúde da API.
 
+        As estatísticas são as materializadas a cada carga: nenhuma
+        agregação é feita sobre a tabela de endereços.
+
         Returns:
             HealthResponse com status da API
         """
         try:
-            # Verificar se há dados no banco
-            tem_dados = db.database_exists()
+            stats = db.get_stats()
 
-            if tem_dados:
-                stats = db.get_stats()
+            if stats['total_registros'] > 0:
                 return HealthResponse(
                     status="healthy",
                     banco_de_dados="conectado",
@@ -183,6 +768,78 @@ class EnderecoService:
                 estatisticas={"erro": str(e)}
             )
 
+    @staticmethod
+    def get_readiness() -> Dict[str, Any]:
+        """
+        Verifica se a API está pronta para atender (probe de readiness).
+
+        Só faz uma consulta trivial e uma leitura por chave primária, sem
+        varrer tabelas.
+
+        Returns:
+            Dicionário com ``pronto``, o total de registros e a geração dos dados
+        """
+        try:
+            db.verificar_conexao()
+            return {
+                'pronto': True,
+                'total_registros': db.contar_registros(),
+                'geracao': db.get_generation(),
+                'indice_memoria_carregado': memory_index.carregado,
+            }
+        except Exception as e:
+            logger.error(f"Banco indisponível: {str(e)}")
+            return {'pronto': False, 'erro': str(e)}
+
+    @staticmethod
+    def recarregar_indice_memoria() -> bool:
+        """
+        Recarrega o índice em memória a partir do banco, se estiver ativo.
+
+        Falhas são registradas no log sem interromper a operação: enquanto
+        o índice não for recarregado, as consultas usam o SQLite.
+
+        Returns:
+            True se o índice foi recarregado
+        """
+        try:
+            return memory_index.recarregar(db)
+        except Exception as e:
+            logger.error(f"Erro ao recarregar índice em memória: {str(e)}")
+            return False
+
+    @staticmethod
+    def _indice_memoria(geracao: int):
+        """
+        Retorna o índice em memória da geração informada, ou None para usar o SQLite.
+
+        Se o índice carregado for de outra geração (dados alterados por outro
+        processo), agenda a sua recarga.
+        """
+        indice = memory_index.indice_da_geracao(geracao)
+        if indice is None and memory_index.defasado(geracao):
+            memory_index.agendar_recarga(db)
+        return indice
+
+    @staticmethod
+    def publicar_nova_versao(job=None):
+        """
+        Recarrega o índice em memória depois de uma troca de dados já gravada.
+
+        A geração já avançou na transação da troca (invalidando o cache de
+        consultas e o ETag), e o índice antigo deixou de ser usado por ser de
+        outra geração: as consultas vão para o SQLite até a recarga. O índice
+        antigo é descartado antes, para não manter os dois em memória.
+
+        Args:
+            job: Job do upload, para registrar a fase (opcional)
+        """
+        if memory_index.ativo:
+            memory_index.descartar()
+            if job is not None:
+                job.definir_fase("recarregando_indice")
+            EnderecoService.recarregar_indice_memoria()
+
     @staticmethod
     def limpar_banco() -> dict:
         """
@@ -193,6 +850,7 @@ class EnderecoService:
         """
         try:
             db.clear_all()
+            EnderecoService.publicar_nova_versao()
             return {
                 "sucesso": True,
                 "mensagem": "Banco de dados limpo com sucesso"
@@ -204,6 +862,34 @@ class EnderecoService:
                 "mensagem": f"Erro ao limpar banco: {str(e)}"
             }
 
+    @staticmethod
+    def restaurar_carga_anterior() -> dict:
+        """
+        Volta para a carga de dados anterior ao último upload.
+
+        Returns:
+            Dicionário com o resultado da operação
+        """
+        try:
+            total = db.rollback_dataset()
+            EnderecoService.publicar_nova_versao()
+            return {
+                "sucesso": True,
+                "mensagem": f"Carga anterior restaurada: {total} registros",
+                "registros": total
+            }
+        except ValueError as e:
+            return {
+                "sucesso": False,
+                "mensagem": str(e)
+            }
+        except Exception as e:
+            logger.error(f"Erro ao restaurar carga anterior: {str(e)}")
+            return {
+                "sucesso": False,
+                "mensagem": f"Erro ao restaurar carga anterior: {str(e)}"
+            }
+
 
 # Instância global do serviço
 endereco_service = EnderecoService()
@@ -0,0 +1,150 @@
+"""
+Tempo de cada fase de uma requisição: header ``Server-Timing`` e log de requisições lentas.
+
+O ``TimingMiddleware`` abre, para cada requisição, um registro de fases em
+uma ``ContextVar``. O código do serviço e do banco marca as fases com
+``medir("fase")`` (ou ``registrar``) sem receber nada por parâmetro: fora de
+uma requisição, ou com o recurso desligado, as marcações não fazem nada.
+Os executores de ``app/concurrency.py`` copiam o contexto para a thread, então
+as fases medidas no SQLite entram no registro da requisição.
+
+Fases marcadas em /consultar:
+
+- ``validacao``: validação e normalização do CEP e do número;
+- ``cache``: leitura e gravação no cache de consultas;
+- ``fila``: espera por uma thread livre do executor;
+- ``conexao``: espera por uma conexão do pool;
+- ``consulta``: execução da consulta (SQLite ou índice em memória);
+- ``montagem``: montagem do modelo de resposta;
+- ``serializacao``: validação e conversão da resposta em JSON pelo FastAPI.
+
+O header é lido pelas ferramentas de desenvolvedor do navegador (aba
+Network > Timing); ``Timing-Allow-Origin`` libera a leitura para o frontend
+em outra origem. Requisições acima de ``SLOW_REQUEST_MS`` vão para o logger
+``app.timing`` como uma linha JSON, com as fases e os parâmetros normalizados.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+from urllib.parse import parse_qsl
+import json
+import logging
+import time
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Registro da requisição atual: {'fases': {fase: segundos}, 'parametros': {...}}
+_registro: ContextVar[Optional[Dict[str, Any]]] = ContextVar("registro_tempos", default=None)
+
+
+def registrar(fase: str, duracao: float):
+    """Soma ``duracao`` (segundos) à fase na requisição atual, se houver uma."""
+    registro = _registro.get()
+    if registro is not None:
+        fases = registro['fases']
+        fases[fase] = fases.get(fase, 0.0) + duracao
+
+
+@contextmanager
+def medir(fase: str) -> Iterator[None]:
+    """
+    Mede o bloco ``with`` como uma fase da requisição atual.
+
+    Usage:
+        with medir("consulta"):
+            ...
+    """
+    if _registro.get() is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar(fase, time.perf_counter() - inicio)
+
+
+def anotar(**parametros: Any):
+    """Guarda parâmetros normalizados da requisição atual para o log de requisições lentas."""
+    registro = _registro.get()
+    if registro is not None:
+        registro['parametros'].update(parametros)
+
+
+def iniciar_serializacao():
+    """
+    Marca o fim do endpoint: o tempo até o início da resposta conta como
+    ``serializacao`` (validação do ``response_model`` e geração do JSON).
+    """
+    registro = _registro.get()
+    if registro is not None:
+        registro['inicio_serializacao'] = time.perf_counter()
+
+
+def _formatar_header(fases: Dict[str, float], total: float) -> bytes:
+    itens = [f"{fase};dur={duracao * 1000:.3f}" for fase, duracao in fases.items()]
+    itens.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(itens).encode("latin-1")
+
+
+class TimingMiddleware:
+    """
+    Middleware ASGI que mede as fases de cada requisição.
+
+    Acrescenta ``Server-Timing`` (com ``SERVER_TIMING_ENABLED``) e registra
+    as requisições mais lentas que ``SLOW_REQUEST_MS`` (0 desativa o log).
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.header = settings.server_timing_enabled
+        self.limite_lento = settings.slow_request_ms / 1000
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (self.header or self.limite_lento > 0):
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        registro = {'fases': {}, 'parametros': {}}
+        token = _registro.set(registro)
+        status = [500]
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start":
+                status[0] = mensagem["status"]
+                agora = time.perf_counter()
+                inicio_serializacao = registro.pop('inicio_serializacao', None)
+                if inicio_serializacao is not None:
+                    registrar("serializacao", agora - inicio_serializacao)
+                if self.header:
+                    headers = list(mensagem.get("headers", []))
+                    headers.append((b"server-timing", _formatar_header(registro['fases'], agora - inicio)))
+                    headers.append((b"timing-allow-origin", b"*"))
+                    mensagem = {**mensagem, "headers": headers}
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _registro.reset(token)
+            total = time.perf_counter() - inicio
+            if self.limite_lento > 0 and total >= self.limite_lento:
+                self._registrar_lenta(scope, status[0], total, registro)
+
+    @staticmethod
+    def _registrar_lenta(scope, status: int, total: float, registro: Dict[str, Any]):
+        rota = scope.get("route")
+        # Sem parâmetros anotados pelo serviço: os da query string, como vieram
+        parametros = registro['parametros'] or dict(parse_qsl(scope.get("query_string", b"").decode("latin-1")))
+        logger.warning(json.dumps({
+            'evento': 'requisicao_lenta',
+            'metodo': scope.get("method"),
+            'endpoint': getattr(rota, "path", None) or scope.get("path"),
+            'status': status,
+            'total_ms': round(total * 1000, 3),
+            'fases_ms': {fase: round(duracao * 1000, 3) for fase, duracao in registro['fases'].items()},
+            'parametros': parametros,
+        }, ensure_ascii=False, default=str))
@@ -1,10 +1,17 @@
 """
 Funções utilitárias para processamento de dados.
 """
-import pandas as pd
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import BinaryIO, Dict, Any, Iterator, List, Optional, Tuple
+from itertools import islice
+from xml.etree import ElementTree
+import csv
+import hashlib
+import io
 import logging
+import re
+import time
+import zipfile
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +34,10 @@ def processar_planilha_excel(file_path: Path) -> List[Dict[str, Any]]:
     Raises:
         Exception: Se houver erro ao processar a planilha
     """
+    # Importado aqui: o pandas leva centenas de milissegundos para carregar e
+    # só é usado por esta função
+    import pandas as pd
+
     logger.info(f"Processando planilha: {file_path}")
 
     try:
@@ -99,6 +110,440 @@ def processar_planilha_excel(file_path: Path) -> List[Dict[str, Any]]:
         raise
 
 
+# Nomes aceitos para as colunas de um CSV de endereços a verificar
+COLUNAS_CSV_CEP = ('cep',)
+COLUNAS_CSV_NUMERO = ('numero', 'número', 'n_fachada', 'num', 'nro')
+
+
+def ler_csv_enderecos(arquivo: BinaryIO) -> Iterator[Tuple[int, str, str]]:
+    """
+    Lê um CSV de endereços (CEP e número) de forma incremental.
+
+    A primeira linha deve ser o cabeçalho, com uma coluna ``cep`` e uma de
+    número (``numero``, ``n_fachada``...). O separador (vírgula ou ponto e
+    vírgula) é detectado pelo cabeçalho. O cabeçalho é validado já na
+    chamada; as linhas de dados são lidas sob demanda.
+
+    Args:
+        arquivo: Arquivo binário (UTF-8, com ou sem BOM)
+
+    Returns:
+        Iterador de (número da linha no arquivo, cep, número)
+
+    Raises:
+        ValueError: Se o cabeçalho não tiver as colunas esperadas
+    """
+    texto = io.TextIOWrapper(arquivo, encoding='utf-8-sig', newline='')
+    cabecalho_bruto = texto.readline()
+    delimitador = ';' if cabecalho_bruto.count(';') > cabecalho_bruto.count(',') else ','
+    cabecalho = [c.strip().lower() for c in next(csv.reader([cabecalho_bruto], delimiter=delimitador), [])]
+
+    idx_cep = next((i for i, c in enumerate(cabecalho) if c in COLUNAS_CSV_CEP), None)
+    idx_numero = next((i for i, c in enumerate(cabecalho) if c in COLUNAS_CSV_NUMERO), None)
+    if idx_cep is None or idx_numero is None:
+        raise ValueError(
+            "O CSV deve ter um cabeçalho com as colunas 'cep' e 'numero' "
+            f"(encontrado: {', '.join(cabecalho) or 'vazio'})"
+        )
+
+    def linhas() -> Iterator[Tuple[int, str, str]]:
+        for n_linha, row in enumerate(csv.reader(texto, delimiter=delimitador), start=2):
+            if not any(campo.strip() for campo in row):
+                continue
+            cep = row[idx_cep].strip() if idx_cep < len(row) else ''
+            numero = row[idx_numero].strip() if idx_numero < len(row) else ''
+            yield n_linha, cep, numero
+
+    return linhas()
+
+
+# Colunas da planilha, na ordem em que aparecem (a partir da coluna A)
+COLUNAS_PLANILHA = (
+    'viabilidade_atual', 'uf', 'municipio', 'localidade', 'bairro',
+    'logradouro', 'cod_logradouro', 'n_fachada', 'comp_1', 'comp_2',
+    'comp_3', 'regiao', 'cep', 'total_hps'
+)
+
+
+def _valor_texto(valor: Any) -> Any:
+    """Converte números inteiros vindos como float (144.0) para int."""
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    return valor
+
+
+def normalizar_linha_planilha(valores: Tuple[Any, ...]) -> Optional[Dict[str, Any]]:
+    """
+    Converte uma linha da planilha em um dicionário de endereço normalizado.
+
+    Aplica as mesmas regras de ``processar_planilha_excel``: CEP sem hífen
+    ou pontos, código do logradouro como texto, total de HPs como inteiro
+    (0 se vazio) e descarte de linhas sem viabilidade ou com o header
+    repetido. Números inteiros lidos como float (144.0) viram "144".
+
+    Args:
+        valores: Valores das células da linha, a partir da coluna A
+
+    Returns:
+        Dicionário com os dados do endereço, ou None se a linha deve ser ignorada
+    """
+    if len(valores) < len(COLUNAS_PLANILHA):
+        valores = tuple(valores) + (None,) * (len(COLUNAS_PLANILHA) - len(valores))
+
+    viabilidade = valores[0]
+    if viabilidade is None or viabilidade == 'VIABILIDADE_ATUAL':
+        return None
+
+    endereco = {
+        coluna: _valor_texto(valor)
+        for coluna, valor in zip(COLUNAS_PLANILHA, valores)
+    }
+
+    cep = endereco['cep']
+    if cep is not None:
+        cep = str(cep).replace('-', '').replace('.', '').strip()
+        endereco['cep'] = cep.zfill(8) if isinstance(endereco['cep'], int) else cep
+
+    for coluna in ('cod_logradouro', 'n_fachada'):
+        if endereco[coluna] is not None:
+            endereco[coluna] = str(endereco[coluna]).strip()
+
+    try:
+        endereco['total_hps'] = int(float(endereco['total_hps']))
+    except (TypeError, ValueError):
+        endereco['total_hps'] = 0
+
+    return endereco
+
+
+def _linhas_aba(ws) -> Iterator[Dict[str, Any]]:
+    """Percorre os endereços normalizados de uma aba (dados a partir da linha 3)."""
+    # Linha 1: vazia; linha 2: headers; dados a partir da linha 3
+    for valores in ws.iter_rows(min_row=3, max_col=len(COLUNAS_PLANILHA), values_only=True):
+        endereco = normalizar_linha_planilha(valores)
+        if endereco is not None:
+            endereco['aba'] = ws.title
+            yield endereco
+
+
+def _bytes_hash(linha: Tuple[Any, ...]) -> bytes:
+    """Representação estável de uma linha (na ordem de COLUNAS_PLANILHA) para o hash da aba."""
+    return repr(linha).encode('utf-8') + b'\n'
+
+
+def iterar_planilha_excel(
+    file_path: Path,
+    tamanho_lote: int = 5000,
+    relatorio: Optional[List[Dict[str, Any]]] = None
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Lê a planilha Excel em modo streaming, em lotes de endereços normalizados.
+
+    Usa o modo somente leitura do openpyxl, que lê as linhas sob demanda:
+    a memória usada depende do tamanho do lote, não do tamanho da planilha.
+    A estrutura esperada é a mesma de ``processar_planilha_excel``.
+
+    Args:
+        file_path: Caminho para o arquivo Excel
+        tamanho_lote: Número de endereços por lote
+        relatorio: Lista que recebe, por aba, o nome, os registros, o tempo de
+            leitura e o hash do conteúdo normalizado
+
+    Yields:
+        Listas de dicionários com os dados dos endereços
+    """
+    from openpyxl import load_workbook
+
+    logger.info(f"Processando planilha (streaming): {file_path}")
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        logger.info(f"Abas encontradas: {wb.sheetnames}")
+        lote: List[Dict[str, Any]] = []
+        total = 0
+
+        for ws in wb.worksheets:
+            registros_aba = 0
+            conteudo = hashlib.sha256()
+            # Tempo de leitura da aba, sem contar o tempo fora do gerador
+            tempo_aba = 0.0
+            inicio = time.perf_counter()
+
+            for endereco in _linhas_aba(ws):
+                lote.append(endereco)
+                registros_aba += 1
+                conteudo.update(_bytes_hash(tuple(endereco[coluna] for coluna in COLUNAS_PLANILHA)))
+                if len(lote) >= tamanho_lote:
+                    tempo_aba += time.perf_counter() - inicio
+                    yield lote
+                    lote = []
+                    inicio = time.perf_counter()
+
+            tempo_aba += time.perf_counter() - inicio
+            total += registros_aba
+            _registrar_aba(relatorio, ws.title, registros_aba, tempo_aba, conteudo.hexdigest())
+
+        if lote:
+            yield lote
+        logger.info(f"Total de registros processados: {total}")
+    finally:
+        wb.close()
+
+
+def estimar_linhas_planilha(file_path: Path) -> Optional[int]:
+    """
+    Estima o número de linhas de dados da planilha, sem lê-la.
+
+    Usa as dimensões gravadas em cada aba (podem incluir linhas vazias no
+    final), descontando as duas linhas de cabeçalho.
+
+    Args:
+        file_path: Caminho para o arquivo Excel
+
+    Returns:
+        Número aproximado de linhas, ou None se alguma aba não informa as dimensões
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(file_path, read_only=True)
+    try:
+        total = 0
+        for ws in wb.worksheets:
+            if ws.max_row is None:
+                return None
+            total += max(ws.max_row - 2, 0)
+        return total
+    finally:
+        wb.close()
+
+
+def _registrar_aba(
+    relatorio: Optional[List[Dict[str, Any]]],
+    aba: str,
+    registros: int,
+    tempo: float,
+    hash_conteudo: str
+):
+    """Registra no log (e no relatório, se informado) o resultado de uma aba."""
+    logger.info(f"Aba '{aba}': {registros} registros processados em {tempo:.2f}s")
+    if relatorio is not None:
+        relatorio.append({
+            'aba': aba,
+            'registros': registros,
+            'tempo_s': round(tempo, 3),
+            'hash_conteudo': hash_conteudo
+        })
+
+
+def _ler_aba(ws) -> Tuple[List[Tuple[Any, ...]], float, str]:
+    """
+    Lê e normaliza uma aba inteira de uma planilha já aberta.
+
+    Returns:
+        Linhas como tuplas (na ordem de COLUNAS_PLANILHA), tempo gasto e
+        hash do conteúdo normalizado
+    """
+    inicio = time.perf_counter()
+    # Tuplas são mais baratas de enviar entre processos do que dicionários
+    linhas = [
+        tuple(endereco[coluna] for coluna in COLUNAS_PLANILHA)
+        for endereco in _linhas_aba(ws)
+    ]
+    conteudo = hashlib.sha256()
+    for linha in linhas:
+        conteudo.update(_bytes_hash(linha))
+    return linhas, time.perf_counter() - inicio, conteudo.hexdigest()
+
+
+# Planilha aberta em cada processo do pool de leitura paralela
+_planilha_processo = None
+
+
+def _abrir_planilha_processo(file_path: str):
+    """Abre a planilha uma única vez por processo do pool (inicializador do pool)."""
+    from openpyxl import load_workbook
+
+    global _planilha_processo
+    _planilha_processo = load_workbook(file_path, read_only=True, data_only=True)
+
+
+def _processar_aba(aba: str) -> Tuple[str, List[Tuple[Any, ...]], float, str]:
+    """
+    Lê e normaliza uma aba inteira (executado em um processo do pool).
+
+    Returns:
+        Nome da aba, linhas como tuplas (na ordem de COLUNAS_PLANILHA), tempo
+        gasto e hash do conteúdo normalizado
+    """
+    return (aba, *_ler_aba(_planilha_processo[aba]))
+
+
+def nomes_abas(file_path: Path) -> List[str]:
+    """Lista as abas da planilha, na ordem do arquivo, lendo só ``xl/workbook.xml``."""
+    ns_main = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+    with zipfile.ZipFile(file_path) as arquivo:
+        workbook = ElementTree.fromstring(arquivo.read('xl/workbook.xml'))
+    return [sheet.get('name') for sheet in workbook.iter(f'{ns_main}sheet')]
+
+
+def iterar_planilha_excel_paralelo(
+    file_path: Path,
+    workers: int,
+    tamanho_lote: int = 5000,
+    relatorio: Optional[List[Dict[str, Any]]] = None
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Lê a planilha Excel processando várias abas em paralelo.
+
+    Cada processo abre a planilha uma vez e lê e normaliza as abas que
+    receber; os lotes são entregues na ordem das abas, então o resultado é
+    idêntico, linha a linha, ao de ``iterar_planilha_excel``. No máximo
+    ``workers + 1`` abas ficam em memória ao mesmo tempo.
+
+    Abrir a planilha (principalmente a tabela de textos compartilhados) tem
+    um custo fixo pago em cada processo, então o ganho depende de haver
+    núcleos livres e abas grandes o bastante para compensá-lo.
+
+    Args:
+        file_path: Caminho para o arquivo Excel
+        workers: Número de processos
+        tamanho_lote: Número de endereços por lote
+        relatorio: Lista que recebe, por aba, o nome, os registros, o tempo de
+            leitura e o hash do conteúdo normalizado
+
+    Yields:
+        Listas de dicionários com os dados dos endereços
+    """
+    import multiprocessing
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+
+    abas = nomes_abas(file_path)
+    logger.info(f"Processando planilha ({workers} processos): {file_path}")
+    logger.info(f"Abas encontradas: {abas}")
+
+    # spawn: os processos não herdam threads nem conexões da API
+    contexto = multiprocessing.get_context("spawn")
+    total = 0
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=contexto,
+        initializer=_abrir_planilha_processo,
+        initargs=(str(file_path),)
+    ) as executor:
+        pendentes = deque()
+        proximas = iter(abas)
+
+        for aba in islice(proximas, workers + 1):
+            pendentes.append(executor.submit(_processar_aba, aba))
+
+        try:
+            while pendentes:
+                aba, linhas, tempo, hash_conteudo = pendentes.popleft().result()
+                for aba_seguinte in islice(proximas, 1):
+                    pendentes.append(executor.submit(_processar_aba, aba_seguinte))
+
+                total += len(linhas)
+                _registrar_aba(relatorio, aba, len(linhas), tempo, hash_conteudo)
+
+                for i in range(0, len(linhas), tamanho_lote):
+                    yield [dict(zip(COLUNAS_PLANILHA, linha), aba=aba) for linha in linhas[i:i + tamanho_lote]]
+                del linhas
+        finally:
+            for futuro in pendentes:
+                futuro.cancel()
+
+    logger.info(f"Total de registros processados: {total}")
+
+
+def ler_abas_planilha(file_path: Path, abas: List[str]) -> Iterator[Tuple[str, List[Dict[str, Any]], str]]:
+    """
+    Lê e normaliza só as abas informadas, abrindo a planilha uma única vez.
+
+    Args:
+        file_path: Caminho para o arquivo Excel
+        abas: Nomes das abas, na ordem em que devem ser lidas
+
+    Yields:
+        Nome da aba, endereços da aba e hash do conteúdo normalizado (o mesmo
+        calculado por ``iterar_planilha_excel``)
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for aba in abas:
+            linhas, tempo, hash_conteudo = _ler_aba(wb[aba])
+            logger.info(f"Aba '{aba}': {len(linhas)} registros processados em {tempo:.2f}s")
+            yield aba, [dict(zip(COLUNAS_PLANILHA, linha), aba=aba) for linha in linhas], hash_conteudo
+    finally:
+        wb.close()
+
+
+# Células com texto compartilhado (t="s") e o índice do texto, no XML de uma aba
+_CELULA_TEXTO = re.compile(rb'<(?:\w+:)?c\b[^>]*\bt="s"[^>]*>\s*<(?:\w+:)?v>(\d+)</(?:\w+:)?v>')
+
+
+def hashes_brutos_abas(file_path: Path) -> Dict[str, str]:
+    """
+    Calcula um hash de cada aba a partir do XML gravado no arquivo, sem ler as células.
+
+    O hash cobre o XML da aba e os textos compartilhados que ela usa (as
+    células de texto guardam só o índice do texto). Textos novos em outras
+    abas não mudam o hash. É muito mais rápido que ler a planilha, mas pode
+    mudar sem que o conteúdo mude (a planilha foi salva de novo e os textos
+    foram renumerados, por exemplo); por isso o conteúdo normalizado tem um
+    hash próprio.
+
+    Args:
+        file_path: Caminho para o arquivo Excel
+
+    Returns:
+        Dicionário {nome da aba: hash}
+    """
+    ns_main = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+    ns_rel = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+    ns_pkg = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+    with zipfile.ZipFile(file_path) as arquivo:
+        nomes = set(arquivo.namelist())
+        workbook = ElementTree.fromstring(arquivo.read('xl/workbook.xml'))
+        relacoes = ElementTree.fromstring(arquivo.read('xl/_rels/workbook.xml.rels'))
+        destinos = {
+            rel.get('Id'): rel.get('Target')
+            for rel in relacoes.iter(f'{ns_pkg}Relationship')
+        }
+
+        textos: List[bytes] = []
+        if 'xl/sharedStrings.xml' in nomes:
+            for _, elemento in ElementTree.iterparse(arquivo.open('xl/sharedStrings.xml')):
+                if elemento.tag == f'{ns_main}si':
+                    # Texto simples (<t>) ou formatado (vários <r><t>)
+                    textos.append(''.join(elemento.itertext()).encode('utf-8'))
+                    elemento.clear()
+
+        hashes = {}
+        for sheet in workbook.iter(f'{ns_main}sheet'):
+            destino = destinos[sheet.get(f'{ns_rel}id')]
+            caminho = destino.lstrip('/') if destino.startswith('/') else f'xl/{destino}'
+            aba = hashlib.sha256()
+            indices = set()
+            resto = b''
+            with arquivo.open(caminho) as xml:
+                for bloco in iter(lambda: xml.read(1 << 20), b''):
+                    aba.update(bloco)
+                    # Procura só até o fim da última célula completa do bloco
+                    dados = resto + bloco
+                    corte = dados.rfind(b'c>') + 2
+                    indices.update(_CELULA_TEXTO.findall(dados, 0, corte))
+                    resto = dados[corte:]
+            indices.update(_CELULA_TEXTO.findall(resto))
+            for indice in sorted({int(m) for m in indices}):
+                texto = textos[indice] if indice < len(textos) else b''
+                aba.update(b'%d:%d:' % (indice, len(texto)) + texto)
+            hashes[sheet.get('name')] = aba.hexdigest()
+    return hashes
+
+
 def normalizar_cep(cep: str) -> str:
     """
     Normaliza o CEP removendo hífen, pontos e espaços.
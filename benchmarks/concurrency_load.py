@@ -0,0 +1,209 @@
+"""
+Teste de carga: latência das consultas enquanto um upload e o /health rodam.
+
+Cria um banco sintético em um diretório temporário, dispara consultas
+concorrentes em /consultar (in-process, via ASGI) e mede a latência em duas
+fases: sem carga e com um /upload e chamadas a /health em paralelo. Com o
+acesso ao banco fora do event loop, a latência das consultas deve continuar
+na mesma ordem de grandeza durante o upload.
+
+Usage:
+    python benchmarks/concurrency_load.py [--registros N] [--linhas-upload N]
+                                          [--concorrencia N] [--duracao S]
+                                          [--max-p95-ms MS]
+
+Example:
+    python benchmarks/concurrency_load.py --registros 200000 --concorrencia 16
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Adicionar o diretório pai ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+COLUNAS = [
+    'VIABILIDADE_ATUAL', 'UF', 'MUNICIPIO', 'LOCALIDADE', 'BAIRRO', 'LOGRADOURO',
+    'COD_LOGRADOURO', 'N_FACHADA', 'COMP_1', 'COMP_2', 'COMP_3', 'REGIAO', 'CEP',
+    'TOTAL_HPS'
+]
+
+
+def gerar_endereco(i: int) -> dict:
+    """Gera um endereço sintético determinístico a partir de um índice."""
+    cod = 10000 + i // 50
+    return {
+        'viabilidade_atual': 'Viável' if i % 5 else 'Não viável',
+        'uf': 'CE',
+        'municipio': f'MUNICIPIO {i % 40}',
+        'localidade': f'MUNICIPIO {i % 40}',
+        'bairro': f'BAIRRO {i % 300}',
+        'logradouro': f'RUA {cod}',
+        'cod_logradouro': str(cod),
+        'n_fachada': str(i % 50 + 1),
+        'comp_1': None,
+        'comp_2': None,
+        'comp_3': None,
+        'regiao': 'NORDESTE',
+        'cep': f'{60000000 + cod:08d}',
+        'total_hps': 1,
+    }
+
+
+def gerar_planilha(caminho: Path, linhas: int):
+    """Gera uma planilha .xlsx no formato esperado pelo /upload."""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("FORTALEZA")
+    ws.append([])
+    ws.append(COLUNAS)
+    for i in range(linhas):
+        e = gerar_endereco(i)
+        ws.append([e[c.lower()] for c in COLUNAS])
+    wb.save(caminho)
+
+
+def percentis(latencias: list) -> dict:
+    """Resume uma lista de latências (em segundos) em milissegundos."""
+    if not latencias:
+        return {'requisicoes': 0}
+    ordenadas = sorted(latencias)
+
+    def p(q):
+        return round(ordenadas[min(len(ordenadas) - 1, int(q * len(ordenadas)))] * 1000, 3)
+
+    return {
+        'requisicoes': len(ordenadas),
+        'p50_ms': p(0.50),
+        'p95_ms': p(0.95),
+        'p99_ms': p(0.99),
+        'max_ms': round(ordenadas[-1] * 1000, 3),
+        'media_ms': round(statistics.fmean(ordenadas) * 1000, 3),
+    }
+
+
+async def consultas(client, registros: int, duracao: float, latencias: list):
+    """Dispara consultas em sequência até o fim da duração."""
+    rnd = random.Random()
+    fim = time.perf_counter() + duracao
+    while time.perf_counter() < fim:
+        e = gerar_endereco(rnd.randrange(registros))
+        inicio = time.perf_counter()
+        resp = await client.get('/consultar', params={'cep': e['cep'], 'numero': e['n_fachada']})
+        latencias.append(time.perf_counter() - inicio)
+        resp.raise_for_status()
+
+
+async def fase(client, registros: int, concorrencia: int, duracao: float) -> list:
+    """Roda ``concorrencia`` clientes de consulta durante ``duracao`` segundos."""
+    latencias: list = []
+    await asyncio.gather(*(
+        consultas(client, registros, duracao, latencias) for _ in range(concorrencia)
+    ))
+    return latencias
+
+
+async def carga_de_fundo(client, planilha: Path, parar: asyncio.Event) -> dict:
+    """Faz um upload e chama /health repetidamente até ``parar`` ser sinalizado."""
+    resultado = {'health_chamadas': 0}
+
+    async def upload():
+        inicio = time.perf_counter()
+        with planilha.open('rb') as f:
+            resp = await client.post('/upload', files={'file': (planilha.name, f)})
+        resultado['upload_status'] = resp.status_code
+        # O upload roda em segundo plano: aguardar o job terminar
+        if resp.status_code == 202:
+            job = resp.json()
+            while job['estado'] in ('enfileirado', 'processando'):
+                await asyncio.sleep(0.2)
+                job = (await client.get(f"/upload/jobs/{job['job_id']}")).json()
+            resultado['upload_estado'] = job['estado']
+        resultado['upload_s'] = round(time.perf_counter() - inicio, 3)
+
+    async def health():
+        while not parar.is_set():
+            await client.get('/health')
+            resultado['health_chamadas'] += 1
+
+    await asyncio.gather(upload(), health())
+    return resultado
+
+
+async def executar(args, planilha: Path) -> dict:
+    import httpx
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://teste', timeout=None) as client:
+        base = await fase(client, args.registros, args.concorrencia, args.duracao)
+
+        parar = asyncio.Event()
+        fundo = asyncio.create_task(carga_de_fundo(client, planilha, parar))
+        # Espera o upload começar antes de medir
+        await asyncio.sleep(0.2)
+        sob_carga = await fase(client, args.registros, args.concorrencia, args.duracao)
+        parar.set()
+        info_fundo = await fundo
+
+    return {
+        'registros': args.registros,
+        'concorrencia': args.concorrencia,
+        'duracao_s': args.duracao,
+        'sem_carga': percentis(base),
+        'com_upload_e_health': percentis(sob_carga),
+        'carga_de_fundo': info_fundo,
+    }
+
+
+def main():
+    """Função principal do script."""
+    parser = argparse.ArgumentParser(description="Latência das consultas sob carga de upload/health")
+    parser.add_argument('--registros', type=int, default=200000)
+    parser.add_argument('--linhas-upload', type=int, default=20000)
+    parser.add_argument('--concorrencia', type=int, default=16)
+    parser.add_argument('--duracao', type=float, default=5.0)
+    parser.add_argument('--max-p95-ms', type=float, default=None,
+                        help="Falha (código 1) se o p95 com carga passar deste valor")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        # Precisa ser definido antes de importar o app
+        os.environ['DATABASE_PATH'] = str(tmp_path / 'enderecos.db')
+        # A planilha do upload é menor que o banco sintético: sem a verificação
+        # de tamanho mínimo da nova carga, o upload faz a troca completa
+        os.environ['RELOAD_MIN_RATIO'] = '0'
+
+        from app.database import db
+
+        print(f"Gerando banco com {args.registros:,} registros...", file=sys.stderr)
+        lote = 10000
+        for inicio in range(0, args.registros, lote):
+            db.insert_enderecos([gerar_endereco(i) for i in range(inicio, min(inicio + lote, args.registros))])
+
+        planilha = tmp_path / 'upload.xlsx'
+        print(f"Gerando planilha com {args.linhas_upload:,} linhas...", file=sys.stderr)
+        gerar_planilha(planilha, args.linhas_upload)
+
+        resultado = asyncio.run(executar(args, planilha))
+        db.close()
+
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+
+    if args.max_p95_ms is not None and resultado['com_upload_e_health']['p95_ms'] > args.max_p95_ms:
+        print(f"[FALHA] p95 com carga acima de {args.max_p95_ms} ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+"""
+Gerador determinístico de bancos ``enderecos`` sintéticos do Nordeste.
+
+Os endereços seguem distribuições parecidas com as da planilha real:
+
+- UFs e municípios do Nordeste com pesos desiguais (as capitais concentram
+  a maior parte dos endereços), cada município com sua faixa de CEP;
+- logradouros divididos em um ou mais trechos de CEP, com o número de
+  fachadas por trecho em cauda longa (a maioria das ruas é curta, poucas
+  avenidas têm centenas de números);
+- números crescentes por trecho, prédios com várias unidades (``comp_1``)
+  e alguns "S/N";
+- a viabilidade é sorteada por trecho, com algumas exceções por endereço.
+
+A mesma semente e o mesmo número de registros geram sempre o mesmo banco, o
+que permite comparar resultados de benchmarks entre commits. Junto com o
+banco é gravado ``<banco>.json``, com uma amostra de chaves (cep, número)
+existentes para os testes de carga.
+
+Usage:
+    python benchmarks/dataset.py --registros N [--saida CAMINHO] [--semente S]
+
+Example:
+    python benchmarks/dataset.py --registros 1000000
+    python benchmarks/dataset.py --registros 10000000 --saida /tmp/nordeste_10m.db
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Adicionar o diretório pai ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Bancos gerados ficam aqui por padrão (fora do controle de versão)
+DIRETORIO_DADOS = Path(__file__).parent / "data"
+
+# Tamanhos pré-definidos
+TAMANHOS = {'100k': 100_000, '1m': 1_000_000, '10m': 10_000_000}
+
+# Chaves existentes guardadas no arquivo de amostra
+TAMANHO_AMOSTRA = 20000
+
+# UF -> (início da faixa de CEP (5 dígitos), fim, [(município, peso)])
+UFS = {
+    'CE': (60000, 63999, [('FORTALEZA', 40), ('CAUCAIA', 8), ('JUAZEIRO DO NORTE', 6),
+                          ('MARACANAÚ', 6), ('SOBRAL', 5), ('CRATO', 3)]),
+    'PE': (50000, 56999, [('RECIFE', 35), ('JABOATÃO DOS GUARARAPES', 15), ('OLINDA', 8),
+                          ('CARUARU', 7), ('PETROLINA', 7)]),
+    'BA': (40000, 48999, [('SALVADOR', 40), ('FEIRA DE SANTANA', 10),
+                          ('VITÓRIA DA CONQUISTA', 6), ('CAMAÇARI', 5)]),
+    'RN': (59000, 59999, [('NATAL', 20), ('MOSSORÓ', 6), ('PARNAMIRIM', 6)]),
+    'PB': (58000, 58999, [('JOÃO PESSOA', 18), ('CAMPINA GRANDE', 8)]),
+    'AL': (57000, 57999, [('MACEIÓ', 20), ('ARAPIRACA', 5)]),
+    'SE': (49000, 49999, [('ARACAJU', 15), ('NOSSA SENHORA DO SOCORRO', 4)]),
+    'PI': (64000, 64999, [('TERESINA', 18), ('PARNAÍBA', 4)]),
+    'MA': (65000, 65999, [('SÃO LUÍS', 20), ('IMPERATRIZ', 6)]),
+}
+
+TIPOS_LOGRADOURO = [('RUA', 70), ('AVENIDA', 12), ('TRAVESSA', 10), ('VILA', 4), ('ALAMEDA', 4)]
+NOMES = [
+    'SÃO JOÃO', 'JOSÉ DE ALENCAR', 'DOM LUÍS', 'PADRE CÍCERO', 'BARÃO DE STUDART',
+    'SANTOS DUMONT', 'TREZE DE MAIO', 'SETE DE SETEMBRO', 'RIO BRANCO', 'DUQUE DE CAXIAS',
+    'GENERAL SAMPAIO', 'MONSENHOR TABOSA', 'IRACEMA', 'BEIRA MAR', 'TIRADENTES',
+    'FLORIANO PEIXOTO', 'CASTRO ALVES', 'RUI BARBOSA', 'PEDRO II', 'JOAQUIM NABUCO',
+    'FREI CANECA', 'BOA VIAGEM', 'DAS FLORES', 'DO SOL', 'DA PAZ', 'SÃO FRANCISCO',
+    'SANTO ANTÔNIO', 'NOSSA SENHORA DE FÁTIMA', 'CORONEL JUCÁ', 'ANTÔNIO SALES',
+]
+BAIRROS = [
+    'CENTRO', 'ALDEOTA', 'MEIRELES', 'JANGURUSSU', 'MESSEJANA', 'BOA VISTA', 'SÃO JOSÉ',
+    'JARDIM AMÉRICA', 'CIDADE NOVA', 'PLANALTO', 'BOM JARDIM', 'VILA NOVA', 'CONJUNTO CEARÁ',
+    'BARRA', 'PIEDADE', 'CANDEIAS', 'PONTA VERDE', 'CRUZ DAS ALMAS', 'LIBERDADE', 'MONTESE',
+]
+VIABILIDADES = [('Viável', 70), ('Não viável', 22), ('Em análise', 8)]
+
+
+def _sortear(rnd: random.Random, opcoes: List[Tuple[str, int]]) -> str:
+    return rnd.choices([o for o, _ in opcoes], weights=[p for _, p in opcoes])[0]
+
+
+def _municipios() -> List[Tuple[str, str, int, int, int]]:
+    """(uf, município, início da faixa de CEP, tamanho da faixa, peso) de cada município."""
+    municipios = []
+    for uf, (inicio, fim, lista) in UFS.items():
+        total_pesos = sum(peso for _, peso in lista)
+        posicao = inicio
+        for nome, peso in lista:
+            tamanho = max(1, (fim - inicio + 1) * peso // total_pesos)
+            municipios.append((uf, nome, posicao, tamanho, peso))
+            posicao += tamanho
+    return municipios
+
+
+def gerar_enderecos(registros: int, semente: int = 42) -> Iterator[Dict]:
+    """
+    Gera ``registros`` endereços sintéticos, sempre na mesma ordem para a mesma semente.
+
+    Args:
+        registros: Número de endereços
+        semente: Semente do gerador pseudoaleatório
+
+    Yields:
+        Endereços no formato de ``enderecos`` (mesmas chaves de COLUNAS_PLANILHA)
+    """
+    rnd = random.Random(semente)
+    municipios = _municipios()
+    pesos = [m[4] for m in municipios]
+    cod_logradouro = 10000
+    gerados = 0
+
+    while gerados < registros:
+        uf, municipio, cep_inicio, cep_faixa, _ = rnd.choices(municipios, weights=pesos)[0]
+        cod_logradouro += 1
+        logradouro = f"{_sortear(rnd, TIPOS_LOGRADOURO)} {rnd.choice(NOMES)}"
+        bairro = rnd.choice(BAIRROS)
+
+        # Um logradouro tem de 1 a 3 trechos, cada um com seu CEP
+        for _ in range(rnd.choices((1, 2, 3), weights=(75, 18, 7))[0]):
+            cep = f"{cep_inicio + rnd.randrange(cep_faixa):05d}{rnd.randrange(1000):03d}"
+            viabilidade = _sortear(rnd, VIABILIDADES)
+            # Fachadas por trecho em cauda longa (mediana ~12, poucas com centenas)
+            fachadas = min(400, int(rnd.paretovariate(1.3) * 8))
+            numero = rnd.randint(1, 30)
+
+            for _ in range(fachadas):
+                numero += rnd.choice((2, 2, 2, 4, 6, 10))
+                n_fachada = "S/N" if rnd.random() < 0.01 else str(numero)
+                # ~8% das fachadas são prédios com várias unidades
+                unidades = rnd.randint(2, 40) if rnd.random() < 0.08 else 1
+
+                for unidade in range(unidades):
+                    yield {
+                        'viabilidade_atual': viabilidade if rnd.random() > 0.03 else _sortear(rnd, VIABILIDADES),
+                        'uf': uf,
+                        'municipio': municipio,
+                        'localidade': municipio,
+                        'bairro': bairro,
+                        'logradouro': logradouro,
+                        'cod_logradouro': str(cod_logradouro),
+                        'n_fachada': n_fachada,
+                        'comp_1': f"AP {unidade + 101}" if unidades > 1 else None,
+                        'comp_2': None,
+                        'comp_3': None,
+                        'regiao': 'NORDESTE',
+                        'cep': cep,
+                        'total_hps': 1,
+                    }
+                    gerados += 1
+                    if gerados >= registros:
+                        return
+
+
+def caminho_padrao(registros: int, semente: int = 42) -> Path:
+    """Caminho do banco gerado para um tamanho e semente (em benchmarks/data)."""
+    return DIRETORIO_DADOS / f"nordeste_{registros}_s{semente}.db"
+
+
+def ler_amostra(caminho: Path) -> Dict:
+    """Lê o arquivo de amostra (``<banco>.json``) gravado junto com o banco."""
+    return json.loads(Path(f"{caminho}.json").read_text(encoding="utf-8"))
+
+
+def construir_banco(caminho: Path, registros: int, semente: int = 42, lote: int = 10000) -> Dict:
+    """
+    Gera o banco sintético e o arquivo de amostra de chaves.
+
+    O banco é carregado pelo mesmo caminho de uma carga completa
+    (``Database.replace_all``), com índices, estatísticas e índice de busca.
+
+    Args:
+        caminho: Arquivo do banco (será substituído)
+        registros: Número de endereços
+        semente: Semente do gerador
+        lote: Endereços por lote de inserção
+
+    Returns:
+        Conteúdo do arquivo de amostra
+    """
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    for sufixo in ("", "-wal", "-shm", ".json"):
+        Path(f"{caminho}{sufixo}").unlink(missing_ok=True)
+
+    # Sem a verificação de tamanho mínimo: o banco novo começa vazio
+    os.environ.setdefault('RELOAD_MIN_RATIO', '0')
+    from app.database import Database
+
+    rnd = random.Random(semente + 1)
+    amostra: List[Tuple[str, str]] = []
+    ceps = set()
+
+    def lotes() -> Iterator[List[Dict]]:
+        atual: List[Dict] = []
+        for i, e in enumerate(gerar_enderecos(registros, semente)):
+            ceps.add(e['cep'])
+            # Amostragem por reservatório das chaves existentes
+            if len(amostra) < TAMANHO_AMOSTRA:
+                amostra.append((e['cep'], e['n_fachada']))
+            else:
+                j = rnd.randrange(i + 1)
+                if j < TAMANHO_AMOSTRA:
+                    amostra[j] = (e['cep'], e['n_fachada'])
+            atual.append(e)
+            if len(atual) >= lote:
+                yield atual
+                atual = []
+        if atual:
+            yield atual
+
+    inicio = time.time()
+    banco = Database(caminho, compacto=False)
+    try:
+        banco.replace_all(lotes())
+        banco.descartar_anterior()
+        banco.checkpoint()
+    finally:
+        banco.close()
+
+    info = {
+        'registros': registros,
+        'semente': semente,
+        'ceps': len(ceps),
+        'tempo_geracao_s': round(time.time() - inicio, 1),
+        'chaves': amostra,
+    }
+    Path(f"{caminho}.json").write_text(json.dumps(info, ensure_ascii=False), encoding="utf-8")
+    return info
+
+
+def obter_banco(registros: int, semente: int = 42, caminho: Optional[Path] = None) -> Path:
+    """Retorna o banco sintético do tamanho pedido, gerando-o se ainda não existir."""
+    caminho = Path(caminho) if caminho else caminho_padrao(registros, semente)
+    if not caminho.exists() or not Path(f"{caminho}.json").exists():
+        print(f"Gerando banco com {registros:,} registros em {caminho}...", file=sys.stderr)
+        construir_banco(caminho, registros, semente)
+    return caminho
+
+
+def main():
+    """Função principal do script."""
+    parser = argparse.ArgumentParser(description="Gera um banco sintético de endereços do Nordeste")
+    parser.add_argument('--registros', default='100k',
+                        help=f"Número de registros ou um dos tamanhos {', '.join(TAMANHOS)}")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--saida', type=Path, default=None,
+                        help="Arquivo do banco (padrão: benchmarks/data/nordeste_<N>_s<semente>.db)")
+    args = parser.parse_args()
+
+    registros = TAMANHOS.get(str(args.registros).lower()) or int(args.registros)
+    caminho = args.saida or caminho_padrao(registros, args.semente)
+    # Precisa ser definido antes de importar o app
+    os.environ['DATABASE_PATH'] = str(caminho)
+
+    info = construir_banco(caminho, registros, args.semente)
+    resumo = {k: v for k, v in info.items() if k != 'chaves'}
+    resumo['banco'] = str(caminho)
+    resumo['tamanho_mb'] = round(caminho.stat().st_size / 1024 / 1024, 1)
+    print(json.dumps(resumo, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,299 @@
+"""
+Benchmark da carga completa de planilhas: tempo por etapa, vazão e pico de memória.
+
+Gera planilhas .xlsx sintéticas no formato esperado (linha 1 vazia, header
+na linha 2, 14 colunas, uma aba por município) com os endereços de
+benchmarks/dataset.py, em vários tamanhos, e carrega cada uma com
+``EnderecoService.upload_planilha`` em um banco vazio, do começo ao fim.
+
+Cada tamanho roda em um processo separado, para que o pico de memória (RSS)
+seja só o da carga. O tempo é dividido nas etapas:
+
+- ``leitura``: parsing do .xlsx pelo openpyxl;
+- ``normalizacao``: ``normalizar_linha_planilha`` (com ``INGEST_WORKERS`` > 1
+  a normalização roda nos processos de leitura e fica somada à leitura);
+- ``insercao``: INSERTs na tabela sombra;
+- ``indexacao``: criação dos índices, validação e tabelas derivadas
+  (estatísticas, layout compacto, índice de busca);
+- ``outros``: o restante (hashes das abas, troca das tabelas, commits).
+
+As planilhas geradas ficam em benchmarks/data/ e são reaproveitadas.
+
+O resultado é comparado com a linha de base versionada
+(benchmarks/ingest_load_baseline.json, ou outra com ``--comparar``), e o
+script falha (código 1) se a vazão cair ou o pico de memória subir mais que
+``--max-regressao`` por cento em algum tamanho presente nas duas. Os números
+dependem da máquina: ao mudar de máquina (ou de runner no CI), ou depois de
+uma melhora intencional, grave a linha de base de novo com
+``--atualizar-baseline``.
+
+Usage:
+    python benchmarks/ingest_load.py [--tamanhos N,N,...] [--workers N] [--saida ARQUIVO]
+                                     [--comparar ARQUIVO | --sem-comparacao | --atualizar-baseline]
+                                     [--max-regressao PCT]
+
+Example:
+    python benchmarks/ingest_load.py
+    python benchmarks/ingest_load.py --atualizar-baseline
+    python benchmarks/ingest_load.py --tamanhos 10k,100k,500k --sem-comparacao --saida ingest.json
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+# Adicionar o diretório pai ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.concurrency_load import COLUNAS
+from benchmarks.dataset import DIRETORIO_DADOS, gerar_enderecos
+from benchmarks.lookup_load import ambiente
+
+ETAPAS = ('leitura', 'normalizacao', 'insercao', 'indexacao', 'outros')
+
+# Linha de base versionada, usada na comparação por padrão
+BASELINE = Path(__file__).parent / "ingest_load_baseline.json"
+
+
+def interpretar_tamanho(texto: str) -> int:
+    """Converte "10k", "1m" ou "25000" em número de linhas."""
+    texto = texto.strip().lower()
+    multiplicador = {'k': 1_000, 'm': 1_000_000}.get(texto[-1:], 1)
+    return int(float(texto.rstrip('km')) * multiplicador)
+
+
+def gerar_planilha(caminho: Path, linhas: int, semente: int = 42):
+    """
+    Gera uma planilha com uma aba por município, no formato do /upload.
+
+    CEP, código do logradouro, número e total de HPs são gravados como
+    números quando possível, como no arquivo real.
+    """
+    from openpyxl import Workbook
+
+    def celula(valor):
+        return int(valor) if isinstance(valor, str) and valor.isdigit() else valor
+
+    wb = Workbook(write_only=True)
+    abas = {}
+    for e in gerar_enderecos(linhas, semente):
+        ws = abas.get(e['municipio'])
+        if ws is None:
+            ws = abas[e['municipio']] = wb.create_sheet(e['municipio'][:31])
+            ws.append([])
+            ws.append(COLUNAS)
+        ws.append([celula(e[c.lower()]) for c in COLUNAS])
+    wb.save(caminho)
+
+
+def obter_planilha(linhas: int, semente: int) -> Path:
+    """Retorna a planilha sintética do tamanho pedido, gerando-a se ainda não existir."""
+    caminho = DIRETORIO_DADOS / f"planilha_{linhas}_s{semente}.xlsx"
+    if not caminho.exists():
+        DIRETORIO_DADOS.mkdir(parents=True, exist_ok=True)
+        print(f"Gerando planilha com {linhas:,} linhas em {caminho}...", file=sys.stderr)
+        temporario = caminho.with_suffix('.tmp.xlsx')
+        gerar_planilha(temporario, linhas, semente)
+        temporario.replace(caminho)
+    return caminho
+
+
+class Cronometro:
+    """Acumula o tempo gasto em funções e métodos, substituindo-os por versões medidas."""
+
+    def __init__(self):
+        self.tempos: Dict[str, float] = defaultdict(float)
+        self._originais: List[tuple] = []
+
+    def medir(self, alvo, nome: str, etapa: str):
+        """Passa a medir ``alvo.nome`` (função de módulo ou método de classe) na etapa."""
+        original = getattr(alvo, nome)
+        tempos = self.tempos
+
+        def medido(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                tempos[etapa] += time.perf_counter() - inicio
+
+        self._originais.append((alvo, nome, original))
+        setattr(alvo, nome, medido)
+
+    def medir_iterador(self, alvo, nome: str, etapa: str):
+        """Passa a medir o tempo gasto dentro do gerador retornado por ``alvo.nome``."""
+        original = getattr(alvo, nome)
+        tempos = self.tempos
+
+        def medido(*args, **kwargs):
+            iterador = iter(original(*args, **kwargs))
+            while True:
+                inicio = time.perf_counter()
+                try:
+                    item = next(iterador)
+                except StopIteration:
+                    return
+                finally:
+                    tempos[etapa] += time.perf_counter() - inicio
+                yield item
+
+        self._originais.append((alvo, nome, original))
+        setattr(alvo, nome, medido)
+
+    def restaurar(self):
+        for alvo, nome, original in reversed(self._originais):
+            setattr(alvo, nome, original)
+        self._originais.clear()
+
+
+def executar_carga(planilha: Path) -> dict:
+    """Carrega a planilha em um banco temporário vazio (executado no processo filho)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        # Precisa ser definido antes de importar o app
+        os.environ['DATABASE_PATH'] = str(Path(tmp) / 'enderecos.db')
+
+        from app import services, utils
+        from app.config import settings
+        from app.database import Database, db
+
+        cronometro = Cronometro()
+        # Tempo dentro dos geradores de lotes = leitura + normalização
+        cronometro.medir_iterador(services, 'iterar_planilha_excel', 'leitura_total')
+        cronometro.medir_iterador(services, 'iterar_planilha_excel_paralelo', 'leitura_total')
+        cronometro.medir(utils, 'normalizar_linha_planilha', 'normalizacao')
+        cronometro.medir(Database, '_inserir', 'insercao')
+        for metodo in ('_criar_indices_tabela_nova', '_validar_tabela_nova', '_atualizar_derivados'):
+            cronometro.medir(Database, metodo, 'indexacao')
+
+        inicio = time.perf_counter()
+        try:
+            resposta = services.EnderecoService.upload_planilha(planilha)
+        finally:
+            total = time.perf_counter() - inicio
+            cronometro.restaurar()
+            db.close()
+
+    if not resposta.sucesso:
+        raise RuntimeError(resposta.mensagem)
+
+    tempos = cronometro.tempos
+    etapas = {
+        'leitura': tempos['leitura_total'] - tempos['normalizacao'],
+        'normalizacao': tempos['normalizacao'],
+        'insercao': tempos['insercao'],
+        'indexacao': tempos['indexacao'],
+    }
+    etapas['outros'] = max(total - sum(etapas.values()), 0.0)
+
+    # ru_maxrss em KB no Linux
+    proprio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    filhos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return {
+        'linhas': resposta.registros_inseridos,
+        'abas': len(resposta.abas or []),
+        'workers': settings.ingest_workers,
+        'tempo_total_s': round(total, 3),
+        'etapas_s': {etapa: round(etapas[etapa], 3) for etapa in ETAPAS},
+        'linhas_por_s': round(resposta.registros_inseridos / total, 1),
+        'pico_rss_mb': round(proprio, 1),
+        'pico_rss_workers_mb': round(filhos, 1) if settings.ingest_workers > 1 else None,
+    }
+
+
+def medir_tamanho(planilha: Path, workers: int) -> dict:
+    """Roda a carga de uma planilha em um processo novo e retorna o resultado."""
+    env = os.environ.copy()
+    env['INGEST_WORKERS'] = str(workers)
+    processo = subprocess.run(
+        [sys.executable, __file__, '--executar', str(planilha)],
+        env=env, capture_output=True, text=True
+    )
+    if processo.returncode != 0:
+        raise RuntimeError(f"Carga de {planilha.name} falhou:\n{processo.stderr[-2000:]}")
+    return json.loads(processo.stdout.strip().splitlines()[-1])
+
+
+def comparar(atual: dict, anterior: dict, max_regressao: float) -> List[str]:
+    """
+    Compara com uma execução anterior, tamanho a tamanho.
+
+    Returns:
+        Descrição das regressões acima de ``max_regressao`` por cento
+    """
+    regressoes = []
+    for linhas, resultado in atual['resultados'].items():
+        base = anterior.get('resultados', {}).get(linhas)
+        if not base:
+            continue
+        if base.get('workers') != resultado['workers']:
+            print(f"[AVISO] {linhas} linhas: execução anterior com {base.get('workers')} workers, ignorada",
+                  file=sys.stderr)
+            continue
+        if resultado['linhas_por_s'] < base['linhas_por_s'] * (1 - max_regressao / 100):
+            regressoes.append(f"{linhas} linhas, linhas_por_s: {base['linhas_por_s']} -> {resultado['linhas_por_s']}")
+        if resultado['pico_rss_mb'] > base['pico_rss_mb'] * (1 + max_regressao / 100):
+            regressoes.append(f"{linhas} linhas, pico_rss_mb: {base['pico_rss_mb']} -> {resultado['pico_rss_mb']}")
+    return regressoes
+
+
+def main():
+    """Função principal do script."""
+    parser = argparse.ArgumentParser(description="Tempo por etapa, vazão e memória da carga de planilhas")
+    parser.add_argument('--tamanhos', default='10k,100k', help="Linhas de cada planilha, separadas por vírgula")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=1, help="INGEST_WORKERS usado nas cargas")
+    parser.add_argument('--saida', type=Path, default=None, help="Grava o resultado em JSON")
+    parser.add_argument('--comparar', type=Path, default=BASELINE,
+                        help="Resultado anterior (JSON) para comparação (padrão: a linha de base versionada)")
+    parser.add_argument('--sem-comparacao', action='store_true', help="Não compara com nenhum resultado anterior")
+    parser.add_argument('--atualizar-baseline', action='store_true',
+                        help="Grava o resultado como a nova linha de base, sem comparar")
+    parser.add_argument('--max-regressao', type=float, default=15.0,
+                        help="Piora máxima aceita em relação à linha de base, em %%")
+    parser.add_argument('--executar', type=Path, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.executar:
+        # Processo filho: uma carga, resultado na última linha da saída
+        print(json.dumps(executar_carga(args.executar)))
+        return 0
+
+    resultados = {}
+    for linhas in (interpretar_tamanho(t) for t in args.tamanhos.split(',')):
+        planilha = obter_planilha(linhas, args.semente)
+        print(f"Carregando {planilha.name}...", file=sys.stderr)
+        resultados[str(linhas)] = medir_tamanho(planilha, args.workers)
+
+    resultado = {'ambiente': ambiente(), 'semente': args.semente, 'resultados': resultados}
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    print(texto)
+    if args.saida:
+        args.saida.write_text(texto + "\n", encoding="utf-8")
+
+    if args.atualizar_baseline:
+        BASELINE.write_text(texto + "\n", encoding="utf-8")
+        print(f"Linha de base gravada em {BASELINE}", file=sys.stderr)
+        return 0
+
+    if args.sem_comparacao:
+        return 0
+    if args.comparar == BASELINE and not BASELINE.exists():
+        print(f"[AVISO] Sem linha de base em {BASELINE}; grave uma com --atualizar-baseline", file=sys.stderr)
+        return 0
+
+    regressoes = comparar(resultado, json.loads(args.comparar.read_text(encoding="utf-8")), args.max_regressao)
+    if regressoes:
+        print(f"[FALHA] Regressão acima de {args.max_regressao}%: " + "; ".join(regressoes), file=sys.stderr)
+        return 1
+    print(f"[OK] Sem regressão em relação a {args.comparar.name}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
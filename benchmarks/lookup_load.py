@@ -0,0 +1,310 @@
+"""
+Benchmark de latência e vazão de /consultar sobre o banco sintético do Nordeste.
+
+Usa um banco gerado por benchmarks/dataset.py (gerado na primeira execução
+e reaproveitado depois) e dispara consultas concorrentes com uma mistura
+configurável de acertos e falhas:
+
+- acertos: chaves (cep, número) sorteadas da amostra gravada com o banco;
+- falhas: número inexistente em um CEP existente, ou um CEP fora das faixas
+  do Nordeste.
+
+A sequência de chaves é determinística (``--semente``), então duas execuções
+fazem as mesmas consultas. Dois modos:
+
+- ``inprocess``: chama o app via ASGI, sem rede; mede a aplicação e o banco;
+- ``uvicorn``: sobe ``uvicorn app.main:app`` em uma porta local (com
+  ``--workers`` processos) e mede por HTTP, como em produção.
+
+O resultado (p50/p95/p99, vazão, erros e informações do ambiente) sai em
+JSON e pode ser gravado com ``--saida``. Com ``--comparar`` o resultado é
+comparado a uma execução anterior e o script falha (código 1) se os percentis ou a
+vazão piorarem mais que ``--max-regressao`` por cento.
+
+Usage:
+    python benchmarks/lookup_load.py [--registros N | --banco CAMINHO]
+                                     [--modo inprocess|uvicorn] [--workers N]
+                                     [--concorrencia N] [--duracao S] [--aquecimento S]
+                                     [--taxa-acerto F] [--sem-cache]
+                                     [--saida ARQUIVO] [--comparar ARQUIVO] [--max-regressao PCT]
+
+Example:
+    python benchmarks/lookup_load.py --registros 1m --concorrencia 32 --saida resultado.json
+    python benchmarks/lookup_load.py --registros 1m --modo uvicorn --workers 4 --comparar resultado.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Tuple
+
+# Adicionar o diretório pai ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.concurrency_load import percentis
+from benchmarks.dataset import TAMANHOS, caminho_padrao, ler_amostra
+
+RAIZ = Path(__file__).parent.parent
+
+# Tamanho da sequência de chaves percorrida (em ciclo) pelos clientes
+TAMANHO_SEQUENCIA = 50000
+
+
+def preparar_banco(registros: int, semente: int) -> Path:
+    """Gera o banco sintético em um processo separado, se ainda não existir."""
+    caminho = caminho_padrao(registros, semente)
+    if not caminho.exists() or not Path(f"{caminho}.json").exists():
+        print(f"Gerando banco com {registros:,} registros em {caminho}...", file=sys.stderr)
+        subprocess.run(
+            [sys.executable, str(RAIZ / 'benchmarks' / 'dataset.py'),
+             '--registros', str(registros), '--semente', str(semente), '--saida', str(caminho)],
+            check=True, stdout=subprocess.DEVNULL
+        )
+    return caminho
+
+
+def gerar_chaves(amostra: dict, taxa_acerto: float, semente: int) -> List[Tuple[str, str, bool]]:
+    """
+    Sequência determinística de consultas (cep, número, esperado_encontrado).
+
+    Args:
+        amostra: Conteúdo do arquivo de amostra do banco
+        taxa_acerto: Fração das consultas com chave existente
+        semente: Semente do sorteio
+    """
+    rnd = random.Random(semente)
+    chaves = amostra['chaves']
+    sequencia = []
+    for _ in range(TAMANHO_SEQUENCIA):
+        cep, numero = rnd.choice(chaves)
+        if rnd.random() < taxa_acerto:
+            sequencia.append((cep, numero, True))
+        elif rnd.random() < 0.5:
+            # CEP existente, número que o gerador nunca produz
+            sequencia.append((cep, str(90000 + rnd.randrange(10000)), False))
+        else:
+            # CEP fora das faixas do Nordeste
+            sequencia.append((f"0{rnd.randrange(10 ** 7):07d}", numero, False))
+    return sequencia
+
+
+async def cliente(client, sequencia: list, inicio_seq: int, fim: float, resultado: dict):
+    """Dispara consultas em sequência até ``fim``, acumulando latências e contagens."""
+    i = inicio_seq
+    while time.perf_counter() < fim:
+        cep, numero, _ = sequencia[i % len(sequencia)]
+        i += 1
+        inicio = time.perf_counter()
+        try:
+            resp = await client.get('/consultar', params={'cep': cep, 'numero': numero})
+        except Exception:
+            resultado['erros'] += 1
+            continue
+        resultado['latencias'].append(time.perf_counter() - inicio)
+        if resp.status_code != 200:
+            resultado['erros'] += 1
+        elif resp.json().get('encontrado'):
+            resultado['encontrados'] += 1
+        else:
+            resultado['nao_encontrados'] += 1
+
+
+async def fase(client, sequencia: list, concorrencia: int, duracao: float) -> dict:
+    """Roda ``concorrencia`` clientes durante ``duracao`` segundos."""
+    resultado = {'latencias': [], 'erros': 0, 'encontrados': 0, 'nao_encontrados': 0}
+    fim = time.perf_counter() + duracao
+    passo = len(sequencia) // max(1, concorrencia)
+    inicio = time.perf_counter()
+    await asyncio.gather(*(
+        cliente(client, sequencia, n * passo, fim, resultado) for n in range(concorrencia)
+    ))
+    resultado['duracao_s'] = time.perf_counter() - inicio
+    return resultado
+
+
+async def medir(client, args, sequencia: list) -> dict:
+    """Aquecimento seguido da fase medida."""
+    if args.aquecimento > 0:
+        await fase(client, sequencia, args.concorrencia, args.aquecimento)
+    return await fase(client, sequencia, args.concorrencia, args.duracao)
+
+
+async def executar_inprocess(args, sequencia: list) -> dict:
+    import httpx
+    from app.main import app
+    from app.database import db
+
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url='http://teste', timeout=None) as client:
+            return await medir(client, args, sequencia)
+    finally:
+        db.close()
+
+
+def porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+async def executar_uvicorn(args, sequencia: list) -> dict:
+    import httpx
+
+    porta = porta_livre()
+    processo = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'app.main:app', '--host', '127.0.0.1',
+         '--port', str(porta), '--workers', str(args.workers), '--log-level', 'warning',
+         '--no-access-log'],
+        cwd=RAIZ, env=os.environ.copy()
+    )
+    base_url = f'http://127.0.0.1:{porta}'
+    limites = httpx.Limits(max_connections=args.concorrencia, max_keepalive_connections=args.concorrencia)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=30, limits=limites) as client:
+            limite = time.perf_counter() + 60
+            while True:
+                try:
+                    if (await client.get('/health/live')).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if processo.poll() is not None or time.perf_counter() > limite:
+                    raise RuntimeError("uvicorn não respondeu em /health/live")
+                await asyncio.sleep(0.2)
+            return await medir(client, args, sequencia)
+    finally:
+        processo.terminate()
+        try:
+            processo.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            processo.kill()
+
+
+def ambiente() -> dict:
+    """Informações para comparar execuções entre commits e máquinas."""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'data': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def comparar(atual: dict, anterior: dict, max_regressao: float) -> List[str]:
+    """
+    Compara com uma execução anterior.
+
+    Returns:
+        Descrição das regressões acima de ``max_regressao`` por cento
+    """
+    regressoes = []
+    for metrica in ('p50_ms', 'p95_ms', 'p99_ms'):
+        antes, agora = anterior['latencia'].get(metrica), atual['latencia'].get(metrica)
+        if antes and agora is not None and agora > antes * (1 + max_regressao / 100):
+            regressoes.append(f"{metrica}: {antes} -> {agora}")
+    antes, agora = anterior.get('vazao_rps'), atual.get('vazao_rps')
+    if antes and agora is not None and agora < antes * (1 - max_regressao / 100):
+        regressoes.append(f"vazao_rps: {antes} -> {agora}")
+    return regressoes
+
+
+def main():
+    """Função principal do script."""
+    parser = argparse.ArgumentParser(description="Latência e vazão de /consultar no banco sintético")
+    parser.add_argument('--registros', default='100k',
+                        help=f"Tamanho do banco sintético: número ou um dos tamanhos {', '.join(TAMANHOS)}")
+    parser.add_argument('--banco', type=Path, default=None,
+                        help="Banco já gerado por benchmarks/dataset.py (em vez de --registros)")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--modo', choices=('inprocess', 'uvicorn'), default='inprocess')
+    parser.add_argument('--workers', type=int, default=1, help="Processos do uvicorn (modo uvicorn)")
+    parser.add_argument('--concorrencia', type=int, default=16)
+    parser.add_argument('--duracao', type=float, default=10.0)
+    parser.add_argument('--aquecimento', type=float, default=2.0)
+    parser.add_argument('--taxa-acerto', type=float, default=0.9,
+                        help="Fração das consultas com endereço existente")
+    parser.add_argument('--sem-cache', action='store_true', help="Desliga o cache de consultas")
+    parser.add_argument('--saida', type=Path, default=None, help="Grava o resultado em JSON")
+    parser.add_argument('--comparar', type=Path, default=None, help="Resultado anterior (JSON) para comparação")
+    parser.add_argument('--max-regressao', type=float, default=10.0,
+                        help="Piora máxima aceita em relação a --comparar, em %%")
+    args = parser.parse_args()
+
+    # Uma linha de log por requisição do cliente atrapalharia a saída
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+
+    if args.banco:
+        banco = args.banco
+    else:
+        registros = TAMANHOS.get(str(args.registros).lower()) or int(args.registros)
+        banco = preparar_banco(registros, args.semente)
+    amostra = ler_amostra(banco)
+    sequencia = gerar_chaves(amostra, args.taxa_acerto, args.semente)
+
+    # Precisa ser definido antes de importar o app (e é herdado pelo uvicorn)
+    os.environ['DATABASE_PATH'] = str(Path(banco).resolve())
+    if args.sem_cache:
+        os.environ['LOOKUP_CACHE_SIZE'] = '0'
+
+    executar = executar_uvicorn if args.modo == 'uvicorn' else executar_inprocess
+    medicao = asyncio.run(executar(args, sequencia))
+
+    resultado = {
+        'ambiente': ambiente(),
+        'configuracao': {
+            'banco': str(banco),
+            'registros': amostra['registros'],
+            'semente': args.semente,
+            'modo': args.modo,
+            'workers': args.workers if args.modo == 'uvicorn' else None,
+            'concorrencia': args.concorrencia,
+            'duracao_s': args.duracao,
+            'taxa_acerto': args.taxa_acerto,
+            'cache': not args.sem_cache,
+        },
+        'latencia': percentis(medicao['latencias']),
+        'vazao_rps': round(len(medicao['latencias']) / medicao['duracao_s'], 1),
+        'erros': medicao['erros'],
+        'encontrados': medicao['encontrados'],
+        'nao_encontrados': medicao['nao_encontrados'],
+    }
+
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    print(texto)
+    if args.saida:
+        args.saida.write_text(texto + "\n", encoding="utf-8")
+
+    if medicao['erros']:
+        print(f"[FALHA] {medicao['erros']} requisições com erro", file=sys.stderr)
+        return 1
+    if args.comparar:
+        regressoes = comparar(resultado, json.loads(args.comparar.read_text(encoding="utf-8")), args.max_regressao)
+        if regressoes:
+            print(f"[FALHA] Regressão acima de {args.max_regressao}%: " + "; ".join(regressoes), file=sys.stderr)
+            return 1
+        print("[OK] Sem regressão em relação à execução anterior", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
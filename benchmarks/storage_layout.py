@@ -0,0 +1,178 @@
+"""
+Comparação entre o layout padrão e o layout compacto de armazenamento.
+
+Gera o mesmo conjunto de endereços sintéticos em dois bancos temporários,
+um com o layout padrão (tabela ``enderecos`` + índice (cep, n_fachada)) e
+outro com ``enderecos_compacto`` (ver app/compact_storage.py), e mede:
+
+- tamanho do arquivo (e de cada tabela/índice, se o SQLite tiver ``dbstat``);
+  o banco com o layout compacto guarda as duas tabelas, então é maior;
+- latência das consultas com o cache aquecido e com o cache de páginas do
+  SQLite reduzido ao mínimo (cada consulta relê as páginas do arquivo);
+- se as duas versões retornam os mesmos endereços.
+
+Usage:
+    python benchmarks/storage_layout.py [--registros N] [--consultas N]
+
+Example:
+    python benchmarks/storage_layout.py --registros 365000
+"""
+import argparse
+import json
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Adicionar o diretório pai ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.concurrency_load import gerar_endereco, percentis
+
+
+def construir(caminho: Path, registros: int, compacto: bool):
+    """Cria um banco com os registros sintéticos e o deixa compactado (VACUUM)."""
+    from app.database import Database
+
+    banco = Database(caminho, compacto=compacto)
+    lote = 10000
+    banco.replace_all(
+        [gerar_endereco(i) for i in range(inicio, min(inicio + lote, registros))]
+        for inicio in range(0, registros, lote)
+    )
+    banco.descartar_anterior(compactar=True)
+    banco.checkpoint()
+    return banco
+
+
+def tamanhos_tabelas(caminho: Path) -> dict:
+    """Tamanho de cada tabela e índice em MB (requer a extensão dbstat)."""
+    conn = sqlite3.connect(caminho)
+    try:
+        rows = conn.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name").fetchall()
+    except sqlite3.OperationalError:
+        return {}
+    finally:
+        conn.close()
+    return {
+        nome: round(tamanho / 1024 / 1024, 2)
+        for nome, tamanho in sorted(rows, key=lambda r: -r[1])
+        if tamanho >= 64 * 1024
+    }
+
+
+def chaves_de_teste(registros: int, quantidade: int) -> list:
+    """Pares (cep, n_fachada) aleatórios; ~10% não existem no banco."""
+    rnd = random.Random(42)
+    chaves = []
+    for _ in range(quantidade):
+        e = gerar_endereco(rnd.randrange(registros))
+        numero = e['n_fachada'] if rnd.random() > 0.1 else '9999'
+        chaves.append((e['cep'], numero))
+    return chaves
+
+
+def medir(consultar, chaves: list) -> dict:
+    """Executa as consultas e resume as latências."""
+    latencias = []
+    for cep, numero in chaves:
+        inicio = time.perf_counter()
+        consultar(cep, numero)
+        latencias.append(time.perf_counter() - inicio)
+    return percentis(latencias)
+
+
+def conexao_fria(caminho: Path) -> sqlite3.Connection:
+    """Conexão sem mmap e com o menor cache de páginas possível."""
+    conn = sqlite3.connect(f"{caminho.resolve().as_uri()}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA mmap_size = 0")
+    conn.execute("PRAGMA cache_size = 1")
+    return conn
+
+
+def main():
+    """Função principal do script."""
+    parser = argparse.ArgumentParser(description="Comparação entre os layouts padrão e compacto")
+    parser.add_argument('--registros', type=int, default=365000)
+    parser.add_argument('--consultas', type=int, default=20000)
+    args = parser.parse_args()
+
+    from app.database import COLUNAS_ENDERECO
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        caminho_padrao = tmp_path / 'padrao.db'
+        caminho_compacto = tmp_path / 'compacto.db'
+
+        print(f"Gerando bancos com {args.registros:,} registros...", file=sys.stderr)
+        padrao = construir(caminho_padrao, args.registros, compacto=False)
+        compacto = construir(caminho_compacto, args.registros, compacto=True)
+
+        chaves = chaves_de_teste(args.registros, args.consultas)
+
+        # Mesmos resultados nos dois layouts (consulta individual e em lote)
+        divergencias = sum(
+            padrao.consultar_viabilidade(cep, numero) != compacto.consultar_viabilidade(cep, numero)
+            for cep, numero in chaves
+        )
+        divergencias_lote = sum(
+            a != b
+            for a, b in zip(padrao.consultar_lote(chaves), compacto.consultar_lote(chaves))
+        )
+
+        # Cache aquecido: pool de conexões da API, com mmap e cache de páginas
+        for banco in (padrao, compacto):
+            medir(banco.consultar_viabilidade, chaves[:1000])
+        quente_padrao = medir(padrao.consultar_viabilidade, chaves)
+        quente_compacto = medir(compacto.consultar_viabilidade, chaves)
+
+        # Cache mínimo: cada consulta relê do arquivo as páginas da B-tree
+        conn_padrao = conexao_fria(caminho_padrao)
+        conn_compacto = conexao_fria(caminho_compacto)
+        consulta_padrao = f"SELECT {COLUNAS_ENDERECO} FROM enderecos WHERE cep = ? AND n_fachada = ? LIMIT 1"
+        frio_padrao = medir(
+            lambda cep, numero: dict(conn_padrao.execute(consulta_padrao, (cep, numero)).fetchone() or {}),
+            chaves
+        )
+        frio_compacto = medir(
+            lambda cep, numero: compacto.compacto.consultar(conn_compacto, cep, numero),
+            chaves
+        )
+        conn_padrao.close()
+        conn_compacto.close()
+
+        padrao.close()
+        compacto.close()
+
+        resultado = {
+            'registros': args.registros,
+            'consultas': args.consultas,
+            'divergencias': divergencias,
+            'divergencias_lote': divergencias_lote,
+            'tamanho_mb': {
+                'padrao': round(caminho_padrao.stat().st_size / 1024 / 1024, 2),
+                'padrao_mais_compacto': round(caminho_compacto.stat().st_size / 1024 / 1024, 2),
+            },
+            'tabelas_mb': {
+                'padrao': tamanhos_tabelas(caminho_padrao),
+                'compacto': tamanhos_tabelas(caminho_compacto),
+            },
+            'latencia_cache_quente': {
+                'padrao': quente_padrao,
+                'compacto': quente_compacto,
+            },
+            'latencia_cache_minimo': {
+                'padrao': frio_padrao,
+                'compacto': frio_compacto,
+            },
+        }
+
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+    return 1 if divergencias or divergencias_lote else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
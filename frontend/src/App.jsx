@@ -16,6 +16,7 @@ function App() {
   const [erroUpload, setErroUpload] = useState('');
   const [sucessoUpload, setSucessoUpload] = useState('');
   const [tempoUpload, setTempoUpload] = useState(0);
+  const [progressoUpload, setProgressoUpload] = useState(null);
   const [intervalId, setIntervalId] = useState(null);
 
   // Estados para Modal de Confirmação
@@ -155,10 +156,11 @@ function App() {
     setLoadingUpload(true);
     setErroUpload('');
     setSucessoUpload('');
+    setProgressoUpload(null);
     iniciarTimer();
 
     try {
-      const dados = await uploadPlanilha(arquivoSelecionado);
+      const dados = await uploadPlanilha(arquivoSelecionado, setProgressoUpload);
       setSucessoUpload(dados.mensagem || 'Upload realizado com sucesso!');
       setArquivoSelecionado(null);
       // Limpar o input file
@@ -167,6 +169,7 @@ function App() {
       setErroUpload(error.message || 'Erro ao fazer upload');
     } finally {
       setLoadingUpload(false);
+      setProgressoUpload(null);
       pararTimer();
     }
   };
@@ -317,7 +320,10 @@ function App() {
                   <div className="progress-bar-fill"></div>
                 </div>
                 <p className="texto-progresso">
-                  Processando... isso pode levar até 9 minutos
+                  {progressoUpload && progressoUpload.registros_lidos > 0
+                    ? `Processando... ${progressoUpload.registros_lidos.toLocaleString('pt-BR')} registros lidos` +
+                      (progressoUpload.eta_s != null ? ` (faltam ~${formatarTempo(Math.round(progressoUpload.eta_s))})` : '')
+                    : 'Processando... isso pode levar até 9 minutos'}
                 </p>
               </div>
             )}
@@ -19,10 +19,11 @@ export const consultarViabilidade = async (cep, numero) => {
 };
 
 /**
- * Faz upload de planilha Excel
+ * Faz upload de planilha Excel e acompanha a carga até terminar
  * @param {File} file - Arquivo Excel
+ * @param {function} onProgresso - Chamada com o estado do job a cada consulta
  */
-export const uploadPlanilha = async (file) => {
+export const uploadPlanilha = async (file, onProgresso) => {
   const formData = new FormData();
   formData.append('file', file);
 
@@ -36,7 +37,24 @@ export const uploadPlanilha = async (file) => {
     throw new Error(error.detail || 'Erro ao fazer upload');
   }
 
-  return response.json();
+  // A carga roda em segundo plano: consultar o job até terminar
+  let job = await response.json();
+  while (job.estado === 'enfileirado' || job.estado === 'processando') {
+    if (onProgresso) onProgresso(job);
+    await new Promise((resolve) => setTimeout(resolve, 2000));
+
+    const status = await fetch(`${API_URL}/upload/jobs/${job.job_id}`);
+    if (!status.ok) {
+      throw new Error('Erro ao acompanhar o upload');
+    }
+    job = await status.json();
+  }
+
+  if (job.estado !== 'concluido') {
+    throw new Error(job.erro || 'Erro ao processar planilha');
+  }
+
+  return job.resultado;
 };
 
 /**
@@ -57,6 +57,11 @@ def main():
         print(f"📊 Registros inseridos: {resultado.registros_inseridos:,}")
         print(f"⏱️  Tempo: {resultado.tempo_processamento:.2f}s")
 
+        # A carga anterior (mantida para rollback) não vai para o deploy;
+        # gravar o WAL no arquivo principal antes de versionar o .db
+        db.descartar_anterior(compactar=True)
+        db.checkpoint()
+
         # Verificar arquivo gerado
         db_path = Path(__file__).parent.parent / "data" / "enderecos.db"
         if db_path.exists():
@@ -0,0 +1,61 @@
+"""
+Script para exportar os endereços do banco em CSV ou NDJSON.
+
+Percorre a tabela em blocos (ver ``Database.exportar_enderecos``), então a
+memória usada é constante e a exportação pode rodar com a API no ar.
+
+Usage:
+    python scripts/export_dataset.py [--formato csv|ndjson] [--saida ARQUIVO]
+                                     [--uf UF] [--municipio MUNICIPIO] [--viabilidade VIABILIDADE]
+
+Example:
+    python scripts/export_dataset.py --saida enderecos.csv
+    python scripts/export_dataset.py --formato ndjson --uf CE --saida ce.ndjson
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Adicionar o diretório pai ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services import endereco_service
+
+
+def main():
+    """Função principal do script."""
+    parser = argparse.ArgumentParser(description="Exportação do conjunto de dados")
+    parser.add_argument("--formato", choices=("csv", "ndjson"), default="csv")
+    parser.add_argument("--saida", type=Path, default=None, help="Arquivo de saída (padrão: saída padrão)")
+    parser.add_argument("--uf", default=None)
+    parser.add_argument("--municipio", default=None)
+    parser.add_argument("--viabilidade", default=None)
+    parser.add_argument("--bloco", type=int, default=None, help="Linhas por bloco (padrão: EXPORT_CHUNK_SIZE)")
+    args = parser.parse_args()
+
+    filtros = {'uf': args.uf, 'municipio': args.municipio, 'viabilidade_atual': args.viabilidade}
+    saida = open(args.saida, "w", encoding="utf-8", newline="") if args.saida else sys.stdout
+
+    inicio = time.time()
+    tamanho = 0
+    try:
+        for texto in endereco_service.exportar(args.formato, filtros, args.bloco):
+            saida.write(texto)
+            tamanho += len(texto)
+    except RuntimeError as e:
+        print(f"[ERRO] {e}", file=sys.stderr)
+        return 1
+    finally:
+        if args.saida:
+            saida.close()
+
+    print(
+        f"[OK] Exportação concluída: {tamanho / 1024 / 1024:.1f} MB em {time.time() - inicio:.1f}s",
+        file=sys.stderr
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,10 +2,13 @@
 Script para carregar a planilha Excel no banco de dados.
 
 Usage:
-    python scripts/load_excel.py <caminho_planilha>
+    python scripts/load_excel.py <caminho_planilha> [--delta]
 
 Example:
     python scripts/load_excel.py "D:/Alga/Enderecos Nordeste.xlsx"
+    python scripts/load_excel.py "D:/Alga/Enderecos Nordeste.xlsx" --delta
+
+Com --delta, só as mudanças em relação à última carga são aplicadas.
 """
 import sys
 import os
@@ -27,6 +30,7 @@ def main():
         sys.exit(1)
 
     planilha_path = Path(sys.argv[1])
+    incremental = "--delta" in sys.argv[2:]
 
     if not planilha_path.exists():
         print(f"[ERRO] Arquivo nao encontrado: {planilha_path}")
@@ -39,7 +43,11 @@ def main():
     print(f"Tamanho: {planilha_path.stat().st_size / 1024 / 1024:.2f} MB")
 
     # Confirmar antes de prosseguir
-    resposta = input("\n[ATENCAO] Isso ira LIMPAR todos os dados existentes. Continuar? (s/N): ")
+    if incremental:
+        aviso = "Isso ira aplicar as mudancas da planilha nos dados existentes"
+    else:
+        aviso = "Isso ira LIMPAR todos os dados existentes"
+    resposta = input(f"\n[ATENCAO] {aviso}. Continuar? (s/N): ")
     if resposta.lower() != 's':
         print("[CANCELADO] Operacao cancelada")
         sys.exit(0)
@@ -47,13 +55,18 @@ def main():
     print("\n[PROCESSANDO] Iniciando processamento...")
 
     # Processar planilha
-    resultado = endereco_service.upload_planilha(planilha_path)
+    if incremental:
+        resultado = endereco_service.upload_planilha_delta(planilha_path)
+    else:
+        resultado = endereco_service.upload_planilha(planilha_path)
 
     print("\n" + "=" * 60)
     if resultado.sucesso:
         print("[SUCESSO] Planilha processada com sucesso!")
         print(f"Registros inseridos: {resultado.registros_inseridos:,}")
         print(f"Tempo de processamento: {resultado.tempo_processamento:.2f}s")
+        if resultado.alteracoes:
+            print(f"Alteracoes: {resultado.alteracoes}")
 
         # Mostrar estatísticas
         stats = db.get_stats()
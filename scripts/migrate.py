@@ -0,0 +1,71 @@
+"""
+Script para aplicar as migrações do esquema do banco de dados.
+
+As migrações também são aplicadas automaticamente quando a API inicia;
+este script permite atualizar um banco existente sem subir a API.
+
+Usage:
+    python scripts/migrate.py [--status] [--banco CAMINHO] [--ate VERSAO]
+
+Example:
+    python scripts/migrate.py --status
+    python scripts/migrate.py --banco data/enderecos.db
+"""
+import argparse
+import sqlite3
+import sys
+from pathlib import Path
+
+# Adicionar o diretório pai ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.migrations import (
+    aplicar_migracoes,
+    migracoes_pendentes,
+    versao_atual,
+    versao_mais_recente
+)
+
+
+def main():
+    """Função principal do script."""
+    parser = argparse.ArgumentParser(description="Migrações do banco de dados")
+    parser.add_argument("--status", action="store_true", help="Apenas mostra a versão atual e as pendentes")
+    parser.add_argument("--banco", type=Path, default=None, help="Caminho do banco (padrão: DATABASE_PATH)")
+    parser.add_argument("--ate", type=int, default=None, help="Aplica as migrações até esta versão")
+    args = parser.parse_args()
+
+    db_path = settings.resolver_caminho(args.banco or settings.database_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+
+    print("=" * 60)
+    print("MIGRACOES DO BANCO DE DADOS")
+    print("=" * 60)
+    print(f"\nBanco: {db_path}")
+
+    conn = sqlite3.connect(str(db_path))
+    try:
+        print(f"Versao atual: {versao_atual(conn)} (mais recente: {versao_mais_recente()})")
+
+        pendentes = migracoes_pendentes(conn)
+        if not pendentes:
+            print("\n[OK] Esquema atualizado, nenhuma migracao pendente")
+            return 0
+
+        print("\nMigracoes pendentes:")
+        for versao, descricao in pendentes:
+            print(f"   {versao}: {descricao}")
+
+        if args.status:
+            return 0
+
+        aplicadas = aplicar_migracoes(conn, ate=args.ate)
+        print(f"\n[SUCESSO] {len(aplicadas)} migracao(oes) aplicada(s). Versao atual: {versao_atual(conn)}")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())